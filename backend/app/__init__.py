@@ -4,6 +4,26 @@ from flask_cors import CORS
 
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
+
+    # JSON: orjson si está instalado (fechas ISO, Decimal, RowSet)
+    from app.core.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    # Métricas Prometheus (GET /metrics); primero, para medir también lo que agregan los demás hooks
+    from app.core.metrics import init_metrics
+    init_metrics(app)
+
+    # Profiler por muestreo opt-in (PROFILE_RATE / X-Profile)
+    from app.core.profiler import init_profiler
+    init_profiler(app)
+
+    # Trazas por request (TRACING_EXPORTER=log|otlp)
+    from app.core.tracing import init_tracing
+    init_tracing(app)
+
+    # ETag/304 y gzip/brotli para respuestas JSON
+    from app.core.http_cache import init_http_cache
+    init_http_cache(app)
     CORS(app, supports_credentials=True)
 
     from app.routes.auth_routes import bp as auth_bp
@@ -19,6 +39,7 @@ def create_app():
     from app.routes.profile_routes import bp as profile_bp
     from app.routes.debug_mail_routes import bp as debug_mail_bp
     from app.routes.admin_jobs_routes import bp as jobs_bp  # <<--- NUEVO
+    from app.routes.admin_perf_routes import bp as perf_bp
 
     app.register_blueprint(spec_bp)
     app.register_blueprint(media_bp)
@@ -33,11 +54,62 @@ def create_app():
     app.register_blueprint(profile_bp)
     app.register_blueprint(debug_mail_bp)
     app.register_blueprint(jobs_bp)  # <<--- NUEVO
+    app.register_blueprint(perf_bp)
 
     @app.get("/health")
     def health(): 
         return {"ok": True}
 
+    # --- Pool de BD: warmup, métricas y fast-fail 503 ---
+    from app.db import open_pool, pool_stats, get_conn, POOL_BUSY_ERRORS
+    from app.config import Settings
+
+    open_pool(wait=Settings.DB_POOL_WARMUP)
+
+    # Log de SQL lenta (+ EXPLAIN muestreado) sobre los cursores del pool
+    from app.core.slow_queries import init_slow_queries
+    init_slow_queries()
+
+    # Migraciones pendientes: aviso (o aplicación) según MIGRATIONS_ON_STARTUP
+    from app.core.migrations import check_on_startup
+    check_on_startup()
+
+    @app.get("/health/db")
+    def health_db():
+        try:
+            with get_conn() as (conn, cur):
+                cur.execute("SELECT 1")
+            ok, err = True, None
+        except Exception as e:
+            ok, err = False, str(e)
+        body = {"ok": ok, "pool": pool_stats()}
+        if err:
+            body["error"] = err
+        return body, (200 if ok else 503)
+
+    def _db_busy(e):
+        app.logger.warning("Pool de BD saturado: %s", e)
+        return {"error": "Base de datos ocupada, intente nuevamente en unos segundos."}, 503, {"Retry-After": "2"}
+
+    for exc in POOL_BUSY_ERRORS:
+        app.register_error_handler(exc, _db_busy)
+
+    from app.core.passwords import PasswordBusy
+
+    @app.errorhandler(PasswordBusy)
+    def _pwd_busy(e):
+        app.logger.warning("Cola de bcrypt llena: %s", e)
+        return {"error": "Servidor ocupado, intente nuevamente en unos segundos."}, 503, {"Retry-After": "2"}
+
+    from app.core.date_range import DateRangeError
+
+    @app.errorhandler(DateRangeError)
+    def _bad_dates(e):
+        return {"error": str(e)}, 400
+
+    from app.cli import register_cli
+    register_cli(app)
+
     @app.route("/uploads/<path:filename>")
     def _uploads(filename):
         updir = os.path.join(app.instance_path, "uploads")
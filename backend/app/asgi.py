@@ -0,0 +1,300 @@
+# backend/app/asgi.py
+"""
+Modo ASGI opcional (ver backend/asgi.py).
+
+Las rutas de solo lectura más consultadas se atienden de forma nativa con modelos
+async sobre AsyncConnectionPool; todo lo demás (escrituras, uploads, admin) se
+delega a la app Flask de siempre vía asgiref (WsgiToAsgi), así que el contrato
+de la API no cambia.
+
+/api/incidencias/updates acepta además ?wait=<seg> (long-poll): la espera no
+ocupa conexión; un único vigilante consulta el tope de msg_id y despierta a
+los clientes cuando hay mensajes nuevos.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+from app.config import Settings
+from app.core.date_range import DateRangeError
+from app.core.http_cache import CACHE_CONTROL, compress, etag_matches, weak_etag
+from app.core.json_provider import dumps_bytes
+from app.core import metrics, tracing
+from app.core.security import authenticate, AuthError
+from app.db import POOL_BUSY_ERRORS
+from app.db_async import open_apool, close_apool
+from app.models.area_model import list_areas_async, list_root_areas_async
+from app.models.item_model import (
+    ITEMS_BATCH_MAX, get_item_detail_async, get_items_detail_async, list_item_types_async,
+)
+from app.models.mov_model import list_auditoria_flexible_async
+from app.models.incidencia_model import list_updates_async, max_msg_id_async
+
+log = logging.getLogger(__name__)
+
+LONGPOLL_MAX_WAIT = 30      # segundos
+WATCH_INTERVAL = 1.0        # segundos entre consultas del vigilante
+
+
+class _Request:
+    def __init__(self, scope: Dict[str, Any]):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.args = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.endpoint = ""
+        self.t0 = time.perf_counter()
+        self.trace = None
+        self.status: Optional[int] = None
+
+    def arg(self, name: str) -> Optional[str]:
+        return self.args.get(name)
+
+    def arg_int(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return default
+
+
+class _UpdatesWatcher:
+    """Mantiene el último msg_id y despierta a los long-poll cuando cambia."""
+
+    def __init__(self, interval: float = WATCH_INTERVAL):
+        self.interval = interval
+        self.last_id = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._cond = asyncio.Condition()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                top = await max_msg_id_async()
+                if top != self.last_id:
+                    self.last_id = top
+                    async with self._cond:
+                        self._cond.notify_all()
+            except Exception:
+                log.exception("Vigilante de updates: fallo al consultar el último msg_id")
+            await asyncio.sleep(self.interval)
+
+    async def wait_beyond(self, seen: int, timeout: float) -> bool:
+        async with self._cond:
+            try:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self.last_id > seen), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class AsgiApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.watcher = _UpdatesWatcher()
+        self.routes: List[Tuple[str, "re.Pattern[str]", Handler]] = [
+            ("GET", re.compile(r"^/api/areas$"), self._areas),
+            ("GET", re.compile(r"^/api/areas/roots$"), self._areas_roots),
+            ("GET", re.compile(r"^/api/item-types$"), self._item_types),
+            ("GET", re.compile(r"^/api/items/(?P<item_id>\d+)$"), self._item_detail),
+            ("GET", re.compile(r"^/api/items$"), self._items_detail),
+            ("GET", re.compile(r"^/api/movimientos$"), self._movimientos),
+            ("GET", re.compile(r"^/api/incidencias/updates$"), self._updates),
+        ]
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            for method, rx, handler in self.routes:
+                if scope["method"] == method:
+                    m = rx.match(scope["path"])
+                    if m:
+                        return await self._dispatch(scope, send, handler, m.groupdict())
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                try:
+                    await open_apool()
+                    self.watcher.start()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                await self.watcher.stop()
+                await close_apool()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _dispatch(self, scope, send, handler: Handler, params: Dict[str, str]):
+        req = _Request(scope)
+        req.endpoint = handler.__name__.lstrip("_")
+        metrics.in_flight(1)
+        req.trace = tracing.start_trace(
+            f"HTTP {req.method} asgi.{req.endpoint}", req.headers.get("traceparent"),
+            **{"http.method": req.method, "http.target": req.path},
+        )
+        try:
+            return await self._handle(req, send, handler, params)
+        finally:
+            metrics.in_flight(-1)
+            tracing.end_trace(req.trace, req.status)
+
+    async def _handle(self, req: "_Request", send, handler: Handler, params: Dict[str, str]):
+        authorization = req.headers.get("authorization", "")
+        try:
+            # caché primero; si el estado del usuario no está, se consulta en un hilo
+            claims = authenticate(authorization, fetch_user=False)
+            if claims is None:
+                claims = await asyncio.to_thread(authenticate, authorization)
+        except AuthError as e:
+            return await self._respond(send, req, 401, {"error": f"Token inválido: {e}"})
+        except POOL_BUSY_ERRORS as e:
+            return await self._db_busy(send, req, e)
+        try:
+            result = await handler(req, claims, **params)
+        except DateRangeError as e:
+            return await self._respond(send, req, 400, {"error": str(e)})
+        except POOL_BUSY_ERRORS as e:
+            return await self._db_busy(send, req, e)
+        except Exception:
+            log.exception("Error en %s %s", req.method, req.path)
+            return await self._respond(send, req, 500, {"error": "Error interno"})
+        if isinstance(result, tuple):
+            return await self._respond(send, req, result[1], result[0])
+        return await self._respond(send, req, 200, result)
+
+    async def _db_busy(self, send, req: _Request, e: Exception):
+        # mismo 503 + Retry-After que create_app para POOL_BUSY_ERRORS (pool sync o async)
+        log.warning("Pool de BD saturado: %s", e)
+        return await self._respond(send, req, 503,
+                                   {"error": "Base de datos ocupada, intente nuevamente en unos segundos."},
+                                   extra_headers=[(b"retry-after", b"2")])
+
+    async def _respond(self, send, req: _Request, status: int, data: Any,
+                       extra_headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        body = dumps_bytes(data)
+        headers = [(b"content-type", b"application/json")] + (extra_headers or [])
+        if req.trace is not None:
+            headers.append((b"x-trace-id", req.trace[0].trace.trace_id.encode()))
+        # mismo ETag/304 y compresión que app.core.http_cache en modo WSGI
+        if status == 200:
+            if Settings.HTTP_ETAGS:
+                etag = weak_etag(body)
+                headers += [(b"etag", etag.encode()), (b"cache-control", CACHE_CONTROL.encode())]
+                if etag_matches(req.headers.get("if-none-match"), etag):
+                    status, body, headers = 304, b"", headers[1:]
+            if body:
+                body, coding = compress(body, req.headers.get("accept-encoding", ""))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if coding:
+                    headers.append((b"content-encoding", coding.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        # Mismo comportamiento que flask_cors(supports_credentials=True): refleja el Origin
+        origin = req.headers.get("origin")
+        if origin:
+            headers += [
+                (b"access-control-allow-origin", origin.encode("latin-1")),
+                (b"access-control-allow-credentials", b"true"),
+                (b"vary", b"Origin"),
+            ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+        req.status = status
+        metrics.observe_request("asgi", req.endpoint, req.method, status, time.perf_counter() - req.t0)
+
+    # ---------- handlers (mismas respuestas que los blueprints) ----------
+    async def _areas(self, req: _Request, claims):
+        return await list_areas_async(claims["username"])
+
+    async def _areas_roots(self, req: _Request, claims):
+        return await list_root_areas_async(claims["username"])
+
+    async def _item_types(self, req: _Request, claims):
+        return await list_item_types_async(claims["username"], req.arg("clase"))
+
+    async def _item_detail(self, req: _Request, claims, item_id: str):
+        data = await get_item_detail_async(claims["username"], int(item_id))
+        if not data:
+            return {"error": "No encontrado"}, 404
+        return data
+
+    async def _items_detail(self, req: _Request, claims):
+        ids = []
+        for x in (req.arg("ids") or "").split(","):
+            try:
+                ids.append(int(x.strip()))
+            except ValueError:
+                pass
+        if not ids:
+            return {"error": "ids requerido (ej: ?ids=1,2,3)"}, 400
+        if len(set(ids)) > ITEMS_BATCH_MAX:
+            return {"error": f"Máximo {ITEMS_BATCH_MAX} ids por consulta"}, 400
+        return await get_items_detail_async(claims["username"], ids)
+
+    async def _movimientos(self, req: _Request, claims):
+        raw_fuente = req.arg("fuente") or req.arg("scope") or "mov"
+        fuente = {"mov": "MOV", "audit": "AUDIT", "both": "MIX"}.get(str(raw_fuente).lower(), "MOV")
+        return await list_auditoria_flexible_async(
+            claims["username"],
+            fuente=fuente,
+            page=req.arg_int("page", 1), size=req.arg_int("size", 20),
+            tipo=req.arg("tipo"), desde=req.arg("desde"), hasta=req.arg("hasta"), q=req.arg("q"),
+            item_id=req.arg_int("item_id"), equipo_id=req.arg_int("equipo_id"),
+            area_id=req.arg_int("area_id"),
+        )
+
+    async def _updates(self, req: _Request, claims):
+        username = claims["username"]
+        since_id = req.arg_int("since_id")
+        wait = min(LONGPOLL_MAX_WAIT, max(0, req.arg_int("wait", 0) or 0))
+
+        rol = claims.get("rol")
+
+        data = await list_updates_async(username, since_id, rol)
+        if data["items"] or not wait or not since_id:
+            return data
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        seen = max(int(since_id), self.watcher.last_id)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return data
+            if not await self.watcher.wait_beyond(seen, remaining):
+                return data
+            seen = self.watcher.last_id
+            data = await list_updates_async(username, since_id, rol)
+            if data["items"]:
+                return data
+
+
+def create_asgi_app() -> AsgiApp:
+    return AsgiApp(create_app())
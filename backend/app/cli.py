@@ -0,0 +1,78 @@
+# backend/app/cli.py
+"""
+Comandos de mantenimiento (`flask --app wsgi <grupo> <comando>`).
+"""
+import json
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.core import migrations
+from app.jobs import particiones_job
+
+particiones_cli = AppGroup("particiones", help="Particiones mensuales de movimientos y audit_log.")
+migraciones_cli = AppGroup("migraciones", help="Migraciones versionadas del esquema inv (backend/migrations).")
+
+
+def _echo(data):
+    click.echo(json.dumps(data, indent=2, default=str, ensure_ascii=False))
+
+
+@particiones_cli.command("listar")
+def particiones_listar():
+    _echo(particiones_job.list_partitions())
+
+
+@particiones_cli.command("crear")
+@click.option("--meses", type=int, default=None, help="meses futuros (default PARTITION_PREMAKE_MONTHS)")
+def particiones_crear(meses):
+    _echo(particiones_job.ensure_future_partitions(meses=meses))
+
+
+@particiones_cli.command("mantener")
+@click.option("--dry-run", is_flag=True, help="sólo muestra qué particiones vencieron")
+def particiones_mantener(dry_run):
+    """Crea las particiones futuras y aplica la retención (para cron)."""
+    res = particiones_job.run_maintenance(
+        particiones_job.archive_dir_for(current_app.instance_path), dry_run=dry_run
+    )
+    _echo(res)
+    if res["retencion"]["errores"]:
+        raise SystemExit(1)
+
+
+@migraciones_cli.command("estado")
+def migraciones_estado():
+    filas = migrations.status()
+    for f in filas:
+        modo = "" if f["transaccional"] in (True, None) else "  [no-transaction]"
+        click.echo(f"{f['version']}  {f['estado']:<11} {f['archivo'] or '-'}{modo}")
+    if any(f["estado"] in ("pendiente", "modificada") for f in filas):
+        raise SystemExit(1)
+
+
+@migraciones_cli.command("aplicar")
+@click.option("--hasta", default=None, help="última versión a aplicar (p.ej. 0003)")
+@click.option("--dry-run", is_flag=True, help="sólo lista las pendientes")
+def migraciones_aplicar(hasta, dry_run):
+    try:
+        res = migrations.migrate(target=hasta, dry_run=dry_run)
+    except migrations.MigrationError as e:
+        raise click.ClickException(str(e))
+    _echo(res)
+
+
+@migraciones_cli.command("marcar")
+@click.argument("version")
+def migraciones_marcar(version):
+    """Registra VERSION como aplicada sin ejecutarla (esquema creado a mano)."""
+    try:
+        click.echo(f"Marcada: {migrations.mark_applied(version)}")
+    except migrations.MigrationError as e:
+        raise click.ClickException(str(e))
+
+
+def register_cli(app):
+    app.cli.add_command(particiones_cli)
+    app.cli.add_command(migraciones_cli)
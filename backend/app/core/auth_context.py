@@ -0,0 +1,153 @@
+# backend/app/core/auth_context.py
+"""
+Cachés del contexto de autenticación (por proceso).
+
+- TokenCache: LRU acotado de token ya verificado -> claims. La clave es el sha256
+  del token (no se guarda el token en claro) y cada entrada caduca en su 'exp',
+  así un token vencido nunca sale de la caché.
+- UserCache: estado vigente del usuario (activo, rol, área, email) con TTL corto.
+  Es el chequeo de revocación: un usuario desactivado o eliminado queda fuera en
+  como mucho AUTH_USER_CACHE_TTL segundos aunque su token siga vigente. Las
+  escrituras sobre inv.usuarios llaman a invalidate_user() para no esperar el TTL.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from app.config import Settings
+from app.core.lru import LRU
+from app.core.roles import db_to_ui_role
+from app.db import get_conn
+
+
+class AuthError(Exception):
+    """Token inválido o usuario sin acceso (se responde 401)."""
+
+
+# ============================================================
+# TOKENS
+# ============================================================
+class TokenCache:
+    def __init__(self, maxsize: int):
+        self._lru = LRU(maxsize)
+
+    @staticmethod
+    def _key(tok: str) -> bytes:
+        return hashlib.sha256(tok.encode("utf-8")).digest()
+
+    def verify(self, tok: str, decoder: Callable[[str], dict]) -> dict:
+        """Claims del token; sólo llama a decoder (firma + exp) si no está en caché."""
+        key = self._key(tok)
+        claims = self._lru.get(key)
+        if claims is None:
+            claims = decoder(tok)   # lanza si la firma o el exp no son válidos
+            exp = claims.get("exp")
+            self._lru.put(key, claims, float(exp) if exp is not None else None)
+        return dict(claims)         # copia: quien la recibe puede enriquecerla
+
+    def clear(self):
+        self._lru.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._lru.stats()
+
+
+# ============================================================
+# ESTADO DEL USUARIO (revocación + enriquecimiento de claims)
+# ============================================================
+@dataclass(frozen=True)
+class UserState:
+    username: str
+    activo: bool
+    rol_db: str
+    area_id: Optional[int]
+    email: Optional[str]
+
+    @property
+    def rol_ui(self) -> str:
+        return db_to_ui_role(self.rol_db)
+
+
+_SQL_USER_STATE = """
+    SELECT COALESCE(u.usuario_activo, true), UPPER(r.rol_nombre), u.usuario_area_id, u.usuario_email
+    FROM inv.usuarios u
+    JOIN inv.roles r ON r.rol_id = u.rol_id
+    WHERE u.usuario_username = %s
+"""
+
+
+class UserCache:
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = float(ttl)
+        self._lru = LRU(maxsize)
+
+    def get(self, username: str, fetch: bool = True) -> Optional[UserState]:
+        """
+        Estado del usuario (None si no existe). Con fetch=False sólo mira la caché
+        y devuelve None si no está (el modo ASGI la usa para no bloquear el loop).
+        """
+        st = self._lru.get(username) if self.ttl > 0 else None
+        if st is not None or not fetch:
+            return st
+        st = self._fetch(username)
+        if self.ttl > 0:
+            # también se cachea el "no existe" para no golpear la BD con tokens huérfanos
+            self._lru.put(username, st, time.time() + self.ttl)
+        return st
+
+    @staticmethod
+    def _fetch(username: str) -> UserState:
+        # primario, no réplica: con lag se volvería a cachear un activo/email viejo
+        with get_conn(None) as (conn, cur):
+            cur.execute(_SQL_USER_STATE, (username,), prepare=True)
+            r = cur.fetchone()
+        if not r:
+            return UserState(username=username, activo=False, rol_db="", area_id=None, email=None)
+        return UserState(
+            username=username,
+            activo=bool(r[0]),
+            rol_db=(r[1] or ""),
+            area_id=int(r[2]) if r[2] is not None else None,
+            email=r[3] or None,
+        )
+
+    def invalidate(self, usernames: Optional[Iterable[Optional[str]]] = None):
+        if usernames is None:
+            self._lru.clear()
+            return
+        for u in usernames:
+            if u:
+                self._lru.pop(u)
+
+    def stats(self) -> Dict[str, int]:
+        return self._lru.stats()
+
+
+tokens = TokenCache(Settings.AUTH_TOKEN_CACHE_SIZE)
+users = UserCache(Settings.AUTH_USER_CACHE_TTL, Settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def enrich_claims(claims: dict, st: UserState) -> dict:
+    """
+    Valida que el usuario siga activo y reemplaza rol/área del token por los
+    vigentes, así un cambio de rol no espera a que el token expire.
+    """
+    if not st.activo:
+        raise AuthError("Usuario desactivado")
+    claims["rol"] = st.rol_ui
+    claims["area_id"] = st.area_id
+    return claims
+
+
+def user_state(username: str) -> UserState:
+    return users.get(username)
+
+
+def invalidate_user(*usernames: Optional[str]):
+    """Llamar tras escribir en inv.usuarios (sin argumentos vacía la caché)."""
+    users.invalidate(usernames if usernames else None)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {"tokens": tokens.stats(), "users": users.stats()}
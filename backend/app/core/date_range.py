@@ -0,0 +1,59 @@
+# backend/app/core/date_range.py
+"""
+Filtros desde/hasta (YYYY-MM-DD) sobre columnas timestamp, sin cast en la columna.
+
+`col::date BETWEEN ...` obliga a evaluar el cast fila por fila: no usa el
+índice btree de la columna ni poda particiones. Aquí el rango se arma
+semiabierto sobre la columna tal cual:
+
+    col >= desde  AND  col < hasta + 1 día
+
+Los parámetros viajan como date; Postgres los lleva a la medianoche de la zona
+horaria de la sesión (la del servidor), igual que hacía el cast anterior.
+"""
+import datetime
+from typing import Any, List, Optional, Tuple
+
+
+class DateRangeError(ValueError):
+    """Fecha mal formada o rango invertido (se responde 400)."""
+
+
+def parse_fecha(raw: Any, campo: str = "fecha") -> Optional[datetime.date]:
+    """'YYYY-MM-DD' (o un ISO con hora; se toma la fecha) -> date; vacío -> None."""
+    if raw is None or raw == "":
+        return None
+    if isinstance(raw, datetime.datetime):
+        return raw.date()
+    if isinstance(raw, datetime.date):
+        return raw
+    try:
+        return datetime.date.fromisoformat(str(raw).strip()[:10])
+    except ValueError:
+        raise DateRangeError(f"{campo} inválida (use AAAA-MM-DD): {raw}") from None
+
+
+def date_range(col: str, desde: Any = None, hasta: Any = None) -> Tuple[List[str], List[Any]]:
+    """
+    (condiciones, parámetros) para `col` entre desde y hasta (ambos días incluidos).
+    Cualquiera de los dos puede faltar.
+    """
+    d = parse_fecha(desde, "desde")
+    h = parse_fecha(hasta, "hasta")
+    if d and h and d > h:
+        raise DateRangeError("desde es posterior a hasta")
+    conds: List[str] = []
+    params: List[Any] = []
+    if d:
+        conds.append(f"{col} >= %s")
+        params.append(d)
+    if h:
+        conds.append(f"{col} < %s")
+        params.append(h + datetime.timedelta(days=1))
+    return conds, params
+
+
+def date_range_sql(col: str, desde: Any = None, hasta: Any = None) -> Tuple[str, List[Any]]:
+    """Igual que date_range pero como fragmento ' AND ...' para concatenar a un WHERE."""
+    conds, params = date_range(col, desde, hasta)
+    return "".join(" AND " + c for c in conds), params
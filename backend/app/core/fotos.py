@@ -0,0 +1,26 @@
+# backend/app/core/fotos.py
+"""
+Formato común de las fotos de un ítem en las respuestas de la API (detalle de
+ítem, fichas y detalle de equipo).
+"""
+from typing import Any, Dict, List
+
+
+def normalize_fotos(raw_fotos: Any) -> List[Dict[str, Any]]:
+    """Normaliza fotos: acepta lista de strings o dicts con url/path."""
+    fotos_norm: List[Dict[str, Any]] = []
+    if isinstance(raw_fotos, list):
+        for f in raw_fotos:
+            if isinstance(f, str):
+                if f.strip():
+                    fotos_norm.append({"path": f.strip(), "principal": False, "orden": None})
+            elif isinstance(f, dict):
+                p = (f.get("path") or f.get("url") or "").strip()
+                if p:
+                    fotos_norm.append({
+                        "path": p,
+                        "principal": bool(f.get("principal", False)),
+                        "orden": f.get("orden"),
+                        "created_at": f.get("created_at"),
+                    })
+    return fotos_norm
@@ -0,0 +1,144 @@
+# backend/app/core/http_cache.py
+"""
+Compresión y validación condicional de respuestas JSON.
+
+- init_http_cache(app): after_request que a cada JSON 200 de un GET le pone un
+  ETag débil (hash del cuerpo) y responde 304 si coincide con If-None-Match;
+  si el cuerpo supera HTTP_COMPRESS_MIN_BYTES lo comprime con brotli (si está
+  instalado y el cliente lo acepta) o gzip.
+- @etag_version(stamp_fn): para datos de referencia (áreas, tipos). Antes de
+  ejecutar la vista pide un "sello de versión" barato a la BD; si el cliente ya
+  tiene esa versión se responde 304 sin correr la consulta completa.
+
+Las funciones puras (weak_etag, etag_matches, compress) las usa también el
+modo ASGI.
+"""
+import functools
+import gzip
+import hashlib
+from typing import Callable, Optional, Tuple
+
+from flask import make_response, request
+
+from app.config import Settings
+
+try:
+    import brotli  # type: ignore
+    HAVE_BROTLI = True
+except Exception:  # pragma: no cover - dependencia opcional
+    brotli = None
+    HAVE_BROTLI = False
+
+CACHE_CONTROL = "private, no-cache"   # el navegador guarda y siempre revalida
+
+
+def weak_etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil (RFC 9110): ignora el prefijo W/."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    ours = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == ours:
+            return True
+    return False
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in (accept_encoding or "").lower().split(","):
+        name, *params = [x.strip() for x in part.split(";")]
+        if name != coding:
+            continue
+        for prm in params:
+            if prm.startswith("q="):
+                try:
+                    return float(prm[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def compress(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """(cuerpo, content-encoding) según lo que acepte el cliente; sin cambios si es chico."""
+    if len(body) < Settings.HTTP_COMPRESS_MIN_BYTES:
+        return body, None
+    if HAVE_BROTLI and _accepts(accept_encoding, "br"):
+        return brotli.compress(body, quality=Settings.HTTP_BROTLI_QUALITY), "br"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=Settings.HTTP_GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
+
+
+# ============================================================
+# Flask
+# ============================================================
+def _after_request(response):
+    if (
+        request.method not in ("GET", "HEAD")
+        or response.status_code != 200
+        or response.mimetype != "application/json"
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    etag = response.headers.get("ETag")
+    if Settings.HTTP_ETAGS:
+        if not etag:
+            etag = weak_etag(body)
+            response.headers["ETag"] = etag
+        response.headers.setdefault("Cache-Control", CACHE_CONTROL)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return _not_modified(response)
+
+    data, coding = compress(body, request.headers.get("Accept-Encoding", ""))
+    response.vary.add("Accept-Encoding")
+    if coding:
+        response.set_data(data)
+        response.headers["Content-Encoding"] = coding
+    return response
+
+
+def _not_modified(response):
+    response.status_code = 304
+    response.set_data(b"")
+    response.headers.pop("Content-Type", None)
+    response.headers.pop("Content-Length", None)
+    return response
+
+
+def init_http_cache(app):
+    app.after_request(_after_request)
+
+
+def etag_version(stamp_fn: Callable[[str], str]):
+    """
+    Decorador (después de require_auth) para listas de referencia.
+    stamp_fn(username) devuelve un sello que cambia cuando cambian los datos
+    (p.ej. un contador que suben triggers); el ETag combina sello, ruta y query string.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not Settings.HTTP_ETAGS:
+                return fn(*args, **kwargs)
+            stamp = stamp_fn(request.claims["username"])
+            key = f"{request.path}?{request.query_string.decode('latin-1')}|{stamp}"
+            etag = 'W/"v-' + hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest() + '"'
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                return "", 304, {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            resp = make_response(fn(*args, **kwargs))
+            if resp.status_code == 200:
+                resp.headers["ETag"] = etag
+            return resp
+        return wrapper
+    return deco
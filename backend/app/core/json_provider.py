@@ -0,0 +1,127 @@
+# backend/app/core/json_provider.py
+"""
+Proveedor JSON de la app (app.json): orjson si está instalado, stdlib si no.
+
+- Mismo contrato que el proveedor por defecto de Flask para lo que devuelve la
+  API, salvo el formato de fechas: datetime/date salen en ISO 8601 (las naive
+  se consideran UTC, como hacía Flask con http_date). Decimal -> str.
+- RowSet: los modelos pueden devolver las filas tal cual vienen del cursor más
+  los nombres de columna. El dict de cada fila se sigue armando, pero recién
+  al serializar y con dict(zip(...)) en vez de una función Python por fila
+  (_row_to_mov y similares); no evita los dicts intermedios.
+- dumps_bytes() lo reutiliza también el modo ASGI.
+"""
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson  # type: ignore
+    HAVE_ORJSON = True
+except Exception:  # pragma: no cover - dependencia opcional
+    orjson = None
+    HAVE_ORJSON = False
+
+
+class RowSet:
+    """
+    Filas (tuplas) + columnas; se serializa como lista de objetos {columna: valor}.
+    to_list()/__iter__ arman un dict por fila (el serializador necesita objetos).
+    """
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: Sequence[str], rows: Sequence[Sequence[Any]]):
+        self.columns = list(columns)
+        self.rows = rows
+
+    @classmethod
+    def from_cursor(cls, cur, rows: Optional[Sequence[Sequence[Any]]] = None) -> "RowSet":
+        """Usa cur.description para los nombres (los alias del SELECT son las claves)."""
+        cols = [d.name for d in (cur.description or [])]
+        return cls(cols, cur.fetchall() if rows is None else rows)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        cols = self.columns
+        return [dict(zip(cols, r)) for r in self.rows]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        cols = self.columns
+        for r in self.rows:
+            yield dict(zip(cols, r))
+
+
+def _iso(o) -> str:
+    if isinstance(o, datetime.datetime) and o.tzinfo is None:
+        o = o.replace(tzinfo=datetime.timezone.utc)
+    return o.isoformat()
+
+
+def _default(o: Any):
+    """Tipos que no resuelve el serializador (orjson ya cubre fechas, UUID y dataclasses)."""
+    if isinstance(o, RowSet):
+        return o.to_list()
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+        return _iso(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Tipo no serializable: {type(o).__name__}")
+
+
+if HAVE_ORJSON:
+    _OPTS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTS)
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(s):
+        return json.loads(s)
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class FastJSONProvider(JSONProvider):
+    """Se registra en create_app: app.json = FastJSONProvider(app)."""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # opciones de json.dumps (indent, sort_keys...) -> stdlib
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", False)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
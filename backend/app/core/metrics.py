@@ -0,0 +1,258 @@
+# backend/app/core/metrics.py
+"""
+Métricas Prometheus (GET /metrics).
+
+- Requiere el paquete 'prometheus_client' (opcional); sin él /metrics responde
+  501 y los observe_*() no hacen nada.
+- Varios procesos (gunicorn -w N, uvicorn --workers N): con la variable
+  PROMETHEUS_MULTIPROC_DIR cada worker escribe sus valores en ese directorio y
+  /metrics los agrega, lo atienda el worker que lo atienda. backend/gunicorn.conf.py
+  la define, limpia el directorio al arrancar y marca los workers muertos
+  (child_exit). Debe estar definida antes del primer import de prometheus_client.
+
+Qué se expone (prefijo inv_):
+- http_requests_total / http_request_duration_seconds por blueprint, endpoint,
+  método (y status), http_requests_in_flight.
+- db_statements_total / db_statement_duration_seconds por tipo de sentencia
+  (observador de app.core.stmt_stats; en pipeline mode se mide el encolado).
+- db_pool{pool,stat}: psycopg_pool.get_stats() de cada worker, sumado.
+- mail_send_total{result} / mail_send_duration_seconds (send_mail_safe).
+- cache_hits_total / cache_misses_total (counters) y cache_size por caché
+  (tokens, users, spec_schema).
+- notificaciones_pendientes: count(*) en la BD, como mucho una vez cada
+  _BACKLOG_TTL seg por proceso (los scrapes seguidos reusan el valor).
+
+Los valores por proceso se sincronizan como mucho una vez por segundo, al
+terminar cada request y en cada scrape: el pool y el tamaño de las cachés van
+a gauges; aciertos/fallos suman a los counters lo que creció desde la última
+sincronización (así se agregan bien entre workers y sobreviven a reinicios).
+
+/metrics exige METRICS_TOKEN ("Authorization: Bearer <token>"); sin token
+configurado responde 403.
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import Settings
+from app.core import stmt_stats
+
+log = logging.getLogger(__name__)
+
+_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+if _MULTIPROC_DIR:
+    os.makedirs(_MULTIPROC_DIR, exist_ok=True)
+
+try:
+    from prometheus_client import (  # type: ignore
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    )
+    from prometheus_client.core import GaugeMetricFamily  # type: ignore
+    from prometheus_client import multiprocess  # type: ignore
+    HAVE_PROMETHEUS = True
+except Exception:  # pragma: no cover - dependencia opcional
+    HAVE_PROMETHEUS = False
+
+ENABLED = HAVE_PROMETHEUS and Settings.METRICS_ENABLED
+
+_HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_MAIL_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+_SYNC_INTERVAL = 1.0
+_BACKLOG_TTL = 15.0
+
+if ENABLED:
+    HTTP_REQUESTS = Counter("inv_http_requests_total", "Requests HTTP atendidos",
+                            ["blueprint", "endpoint", "method", "status"])
+    HTTP_LATENCY = Histogram("inv_http_request_duration_seconds", "Duración de los requests HTTP",
+                             ["blueprint", "endpoint", "method"], buckets=_HTTP_BUCKETS)
+    HTTP_IN_FLIGHT = Gauge("inv_http_requests_in_flight", "Requests HTTP en curso",
+                           multiprocess_mode="livesum")
+    DB_STATEMENTS = Counter("inv_db_statements_total", "Sentencias SQL ejecutadas", ["kind"])
+    DB_LATENCY = Histogram("inv_db_statement_duration_seconds", "Duración de las sentencias SQL",
+                           ["kind"], buckets=_DB_BUCKETS)
+    DB_POOL = Gauge("inv_db_pool", "psycopg_pool.get_stats() (suma de los workers)",
+                    ["pool", "stat"], multiprocess_mode="livesum")
+    MAIL_SENT = Counter("inv_mail_send_total", "Envíos de correo por resultado", ["result"])
+    MAIL_LATENCY = Histogram("inv_mail_send_duration_seconds", "Duración de send_mail_safe (SMTP)",
+                             buckets=_MAIL_BUCKETS)
+    CACHE_HITS = Counter("inv_cache_hits", "Aciertos por caché", ["cache"])
+    CACHE_MISSES = Counter("inv_cache_misses", "Fallos por caché", ["cache"])
+    CACHE_SIZE = Gauge("inv_cache_size", "Entradas por caché", ["cache"], multiprocess_mode="livesum")
+
+_sync_lock = threading.Lock()
+_synced_at = 0.0
+_cache_prev: Dict[Tuple[str, str], int] = {}
+_backlog: Optional[Tuple[float, int]] = None
+
+
+# ============================================================
+# Observaciones (no-op sin prometheus_client)
+# ============================================================
+def observe_request(blueprint: Optional[str], endpoint: Optional[str], method: str,
+                    status: int, seconds: float) -> None:
+    if not ENABLED:
+        return
+    bp, ep = blueprint or "", endpoint or "sin_ruta"
+    HTTP_REQUESTS.labels(bp, ep, method, str(status)).inc()
+    HTTP_LATENCY.labels(bp, ep, method).observe(seconds)
+    sync_process_stats()
+
+
+def in_flight(delta: int) -> None:
+    if ENABLED:
+        HTTP_IN_FLIGHT.inc(delta)
+
+
+def observe_mail(result: str, seconds: Optional[float] = None) -> None:
+    """result: ok | error | sin_config."""
+    if not ENABLED:
+        return
+    MAIL_SENT.labels(result).inc()
+    if seconds is not None:
+        MAIL_LATENCY.observe(seconds)
+
+
+def _statement_kind(cur, query) -> str:
+    text = query if isinstance(query, str) else stmt_stats.sql_text(cur, query)
+    head = text.lstrip(" \t\r\n(")[:10].split(None, 1)
+    kind = head[0].upper() if head else ""
+    return kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY") else "OTHER"
+
+
+def _on_statement(cur, query, params, ms: float, n: int) -> None:
+    kind = _statement_kind(cur, query)
+    DB_STATEMENTS.labels(kind).inc(n)
+    DB_LATENCY.labels(kind).observe(ms / 1000.0)
+
+
+def _inc_delta(counter, name: str, stat: str, total: int) -> None:
+    """Suma al counter lo que creció el acumulado de la caché desde la última vez."""
+    prev = _cache_prev.get((name, stat), 0)
+    delta = total - prev if total >= prev else total   # la caché se recreó: cuenta desde 0
+    if delta:
+        counter.labels(name).inc(delta)
+    _cache_prev[(name, stat)] = total
+
+
+def sync_process_stats(force: bool = False) -> None:
+    """Pasa a las métricas las estadísticas de este proceso (pools y cachés)."""
+    global _synced_at
+    now = time.monotonic()
+    if not force and now - _synced_at < _SYNC_INTERVAL:
+        return
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        _synced_at = now
+        from app import db
+        from app.core import auth_context, spec_schema
+
+        for p in (db.pool, db.read_pool):
+            if p is None or p.closed:
+                continue
+            for stat, value in p.get_stats().items():
+                DB_POOL.labels(p.name, stat).set(value)
+        caches = dict(auth_context.cache_stats(), spec_schema=spec_schema.cache_stats())
+        for name, st in caches.items():
+            _inc_delta(CACHE_HITS, name, "hits", st.get("hits", 0))
+            _inc_delta(CACHE_MISSES, name, "misses", st.get("misses", 0))
+            CACHE_SIZE.labels(name).set(st.get("size", 0))
+    except Exception:
+        log.exception("No se pudieron actualizar las métricas del proceso")
+    finally:
+        _sync_lock.release()
+
+
+# ============================================================
+# Scrape
+# ============================================================
+class _BacklogCollector:
+    """Notificaciones sin enviar: es un valor de la BD, se lee al scrapear (como mucho cada _BACKLOG_TTL seg)."""
+
+    def collect(self):
+        global _backlog
+        now = time.monotonic()
+        if _backlog is None or now - _backlog[0] >= _BACKLOG_TTL:
+            from app.db import get_conn
+            try:
+                with get_conn(readonly=True) as (conn, cur):
+                    cur.execute("SELECT count(*) FROM inv.notificaciones WHERE sent_at IS NULL")
+                    _backlog = (now, int(cur.fetchone()[0]))
+            except Exception as e:
+                log.warning("Métricas: no se pudo leer el backlog de notificaciones: %s", e)
+                return
+        yield GaugeMetricFamily("inv_notificaciones_pendientes", "Notificaciones con sent_at IS NULL",
+                                value=_backlog[1])
+
+
+def render() -> tuple:
+    """(cuerpo, content-type) con todas las métricas (agregadas si es multiproceso)."""
+    sync_process_stats(force=True)
+    if _MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = CollectorRegistry()
+        registry.register(_ProcessRegistry())
+    registry.register(_BacklogCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _ProcessRegistry:
+    """Un solo proceso: el REGISTRY global (métricas de arriba + proceso/GC de Python)."""
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def init_metrics(app) -> bool:
+    """Hooks de request, observador de sentencias y GET /metrics. False si está desactivado."""
+    if not Settings.METRICS_ENABLED:
+        return False
+
+    from flask import g, request
+
+    @app.get("/metrics")
+    def metrics():
+        if not HAVE_PROMETHEUS:
+            return {"error": "prometheus_client no está instalado"}, 501
+        token = Settings.METRICS_TOKEN
+        if not token:
+            return {"error": "Definir METRICS_TOKEN para habilitar /metrics"}, 403
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return {"error": "No autorizado"}, 401
+        body, content_type = render()
+        return body, 200, {"Content-Type": content_type}
+
+    if not HAVE_PROMETHEUS:
+        log.warning("METRICS_ENABLED sin prometheus_client instalado: /metrics responde 501")
+        return False
+    if not Settings.METRICS_TOKEN:
+        log.warning("METRICS_ENABLED sin METRICS_TOKEN: /metrics responde 403 (se siguen midiendo los requests)")
+
+    if stmt_stats.cursor_factory() is not None:
+        stmt_stats.add_observer(_on_statement)
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+        in_flight(1)
+
+    @app.after_request
+    def _metrics_observe(resp):
+        t0 = g.get("_metrics_t0")
+        if t0 is not None:
+            observe_request(request.blueprint, request.endpoint, request.method,
+                            resp.status_code, time.perf_counter() - t0)
+        return resp
+
+    @app.teardown_request
+    def _metrics_end(exc):
+        if g.pop("_metrics_t0", None) is not None:
+            in_flight(-1)
+
+    return True
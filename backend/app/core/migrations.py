@@ -0,0 +1,409 @@
+# backend/app/core/migrations.py
+"""
+Migraciones versionadas del esquema inv (backend/migrations/NNNN_nombre.sql).
+
+- Cada archivo se aplica una sola vez, en orden de versión, y queda registrado
+  en inv.schema_migrations con el sha256 de su contenido. Si un archivo ya
+  aplicado cambia, `estado` lo marca como modificado (no se vuelve a correr:
+  los cambios van en una migración nueva).
+- Por defecto cada archivo corre en una transacción: si una sentencia falla no
+  queda nada a medias.
+- Un archivo con la línea `-- migrate:no-transaction` corre en autocommit,
+  sentencia por sentencia (CREATE INDEX CONCURRENTLY, ALTER TYPE ... ADD VALUE).
+  Sus sentencias deben ser idempotentes (IF NOT EXISTS): si algo falla, la
+  migración no se registra y la próxima corrida la repite completa. Un índice
+  CONCURRENTLY que quedó INVALID por un fallo anterior se elimina antes de
+  volver a crearlo.
+- Una sentencia precedida por la línea `-- migrate:gexec` es un SELECT que
+  genera SQL (como \gexec de psql): cada celda no nula de cada fila se ejecuta
+  como sentencia, en orden. Sirve para lo que depende del catálogo, p.ej. un
+  índice CONCURRENTLY por partición (ver 0003).
+- Corre con una conexión propia (MIGRATIONS_DATABASE_URL, con permisos de DDL),
+  bajo un advisory lock: varios workers arrancando con MIGRATIONS_ON_STARTUP=apply
+  no aplican dos veces lo mismo. lock_timeout (MIGRATIONS_LOCK_TIMEOUT) evita
+  que una sentencia de DDL quede en cola bloqueando el tráfico.
+
+Uso: `flask migraciones estado|aplicar|marcar` y el chequeo de create_app.
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import psycopg
+
+from app.config import Settings
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "migrations"))
+NO_TRANSACTION = "-- migrate:no-transaction"
+_RX_GEXEC = re.compile(r"^\s*--\s*migrate:gexec\s*$", re.MULTILINE | re.IGNORECASE)
+_RX_ARCHIVO = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+_LOCK_KEY = 0x696E765F6D6967   # "inv_mig"
+
+_SQL_TABLA = """
+    CREATE TABLE IF NOT EXISTS inv.schema_migrations (
+      version        text PRIMARY KEY,
+      nombre         text NOT NULL,
+      checksum       text NOT NULL,
+      transaccional  boolean NOT NULL DEFAULT true,
+      aplicada_en    timestamptz NOT NULL DEFAULT now(),
+      aplicada_por   text NOT NULL DEFAULT current_user,
+      duracion_ms    integer
+    )
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    nombre: str
+    path: str
+    sql: str
+    checksum: str
+    transaccional: bool
+
+    @property
+    def archivo(self) -> str:
+        return os.path.basename(self.path)
+
+
+# ============================================================
+# Archivos
+# ============================================================
+def discover(directory: Optional[str] = None) -> List[Migration]:
+    directory = directory or MIGRATIONS_DIR
+    out: List[Migration] = []
+    vistas: Dict[str, str] = {}
+    for fname in sorted(os.listdir(directory)):
+        m = _RX_ARCHIVO.match(fname)
+        if not m:
+            continue
+        version, nombre = m.group(1), m.group(2)
+        if version in vistas:
+            raise MigrationError(f"Versión {version} repetida: {vistas[version]} y {fname}")
+        vistas[version] = fname
+        path = os.path.join(directory, fname)
+        with open(path, "r", encoding="utf-8") as f:
+            sql = f.read().replace("\r\n", "\n")
+        out.append(Migration(
+            version=version,
+            nombre=nombre,
+            path=path,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transaccional=not any(l.strip().lower() == NO_TRANSACTION for l in sql.splitlines()),
+        ))
+    return out
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Separa un script en sentencias por ';' de nivel superior. Respeta comentarios
+    (-- y /* */ anidados), literales '...' y E'...', identificadores "..." y
+    bloques $tag$...$tag$. Las sentencias vacías o sólo de comentarios se omiten.
+    """
+    out: List[str] = []
+    buf: List[str] = []
+    codigo = False          # la sentencia actual tiene algo más que comentarios
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        nxt = sql[i + 1] if i + 1 < n else ""
+        if c == "-" and nxt == "-":
+            j = sql.find("\n", i)
+            j = n if j < 0 else j
+            buf.append(sql[i:j])
+            i = j
+            continue
+        if c == "/" and nxt == "*":
+            depth, j = 1, i + 2
+            while j < n and depth:
+                if sql.startswith("/*", j):
+                    depth, j = depth + 1, j + 2
+                elif sql.startswith("*/", j):
+                    depth, j = depth - 1, j + 2
+                else:
+                    j += 1
+            buf.append(sql[i:j])
+            i = j
+            continue
+        if c in ("'", '"'):
+            escape = c == "'" and i > 0 and sql[i - 1] in "eE" and not (i > 1 and (sql[i - 2].isalnum() or sql[i - 2] == "_"))
+            j = i + 1
+            while j < n:
+                if escape and sql[j] == "\\":
+                    j += 2
+                    continue
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:   # '' o "" dentro del literal
+                        j += 2
+                        continue
+                    break
+                j += 1
+            buf.append(sql[i:j + 1])
+            codigo = True
+            i = j + 1
+            continue
+        if c == "$":
+            m = re.match(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$", sql[i:])
+            if m and not (i > 0 and (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+                tag = m.group(0)
+                j = sql.find(tag, i + len(tag))
+                j = n if j < 0 else j + len(tag)
+                buf.append(sql[i:j])
+                codigo = True
+                i = j
+                continue
+        if c == ";":
+            if codigo:
+                out.append("".join(buf).strip())
+            buf, codigo = [], False
+            i += 1
+            continue
+        if not c.isspace():
+            codigo = True
+        buf.append(c)
+        i += 1
+    if codigo:
+        out.append("".join(buf).strip())
+    return out
+
+
+# ============================================================
+# Conexión y registro
+# ============================================================
+def _connect() -> psycopg.Connection:
+    return psycopg.connect(
+        Settings.MIGRATIONS_DATABASE_URL or Settings.DATABASE_URL,
+        autocommit=True,
+        connect_timeout=Settings.DB_CONNECT_TIMEOUT,
+        application_name="inv-migraciones",
+    )
+
+
+def _aplicadas(conn) -> Dict[str, Dict[str, Any]]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('inv.schema_migrations') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return {}
+        cur.execute("""
+          SELECT version, nombre, checksum, aplicada_en, aplicada_por, duracion_ms
+          FROM inv.schema_migrations ORDER BY version
+        """)
+        return {
+            r[0]: {"nombre": r[1], "checksum": r[2], "aplicada_en": r[3],
+                   "aplicada_por": r[4], "duracion_ms": r[5]}
+            for r in cur.fetchall()
+        }
+
+
+def _registrar(cur, mig: Migration, duracion_ms: Optional[int]):
+    cur.execute("""
+      INSERT INTO inv.schema_migrations(version, nombre, checksum, transaccional, duracion_ms)
+      VALUES (%s, %s, %s, %s, %s)
+      ON CONFLICT (version) DO UPDATE
+        SET nombre = EXCLUDED.nombre, checksum = EXCLUDED.checksum,
+            transaccional = EXCLUDED.transaccional, aplicada_en = now(),
+            aplicada_por = current_user, duracion_ms = EXCLUDED.duracion_ms
+    """, (mig.version, mig.nombre, mig.checksum, mig.transaccional, duracion_ms))
+
+
+def _estado(migs: List[Migration], aplicadas: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out = []
+    for m in migs:
+        a = aplicadas.get(m.version)
+        if a is None:
+            estado = "pendiente"
+        elif a["checksum"] != m.checksum:
+            estado = "modificada"
+        else:
+            estado = "aplicada"
+        out.append({
+            "version": m.version,
+            "archivo": m.archivo,
+            "transaccional": m.transaccional,
+            "estado": estado,
+            "aplicada_en": a["aplicada_en"] if a else None,
+        })
+    archivos = {m.version for m in migs}
+    for v, a in aplicadas.items():
+        if v not in archivos:
+            out.append({"version": v, "archivo": None, "transaccional": None,
+                        "estado": "sin_archivo", "aplicada_en": a["aplicada_en"]})
+    return sorted(out, key=lambda x: x["version"])
+
+
+def status(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """[{version, archivo, transaccional, estado, aplicada_en}]; estado: aplicada|pendiente|modificada|sin_archivo."""
+    migs = discover(directory)
+    with _connect() as conn:
+        return _estado(migs, _aplicadas(conn))
+
+
+# ============================================================
+# Aplicar
+# ============================================================
+_RX_INDEX_CONC = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"(\"?[\w$]+\"?)\s+ON\s+(?:ONLY\s+)?(?:(\"?[\w$]+\"?)\.)?",
+    re.IGNORECASE,
+)
+
+
+def _ident(s: str) -> str:
+    return s[1:-1] if s.startswith('"') else s.lower()
+
+
+def _limpiar_indice_invalido(cur, sentencia: str):
+    """Un CONCURRENTLY fallido deja el índice INVALID y IF NOT EXISTS no lo rehace."""
+    m = _RX_INDEX_CONC.match(re.sub(r"--[^\n]*|/\*.*?\*/", " ", sentencia, flags=re.S))
+    if not m:
+        return
+    nombre = _ident(m.group(1))
+    schema = _ident(m.group(2)) if m.group(2) else "public"
+    cur.execute("""
+      SELECT format('%%I.%%I', n.nspname, c.relname)
+      FROM pg_index x
+      JOIN pg_class c ON c.oid = x.indexrelid
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = %s AND c.relname = %s AND NOT x.indisvalid
+    """, (schema, nombre))
+    row = cur.fetchone()
+    if row:
+        log.warning("Índice %s quedó INVALID; se elimina y se vuelve a crear", row[0])
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row[0]}")
+
+
+def _generadas(cur, mig: Migration, sentencia: str) -> List[str]:
+    """`-- migrate:gexec`: las sentencias que devuelve el SELECT; si no, la sentencia tal cual."""
+    if not _RX_GEXEC.search(sentencia):
+        return [sentencia]
+    _ejecutar(cur, mig, sentencia)
+    return [v for row in cur.fetchall() for v in row if v]
+
+
+def _aplicar(conn, mig: Migration):
+    sentencias = split_statements(mig.sql)
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        if mig.transaccional:
+            with conn.transaction():
+                for s in sentencias:
+                    for g in _generadas(cur, mig, s):
+                        _ejecutar(cur, mig, g)
+                _registrar(cur, mig, int((time.perf_counter() - t0) * 1000))
+        else:
+            for s in sentencias:
+                for g in _generadas(cur, mig, s):
+                    _limpiar_indice_invalido(cur, g)
+                    _ejecutar(cur, mig, g)
+            _registrar(cur, mig, int((time.perf_counter() - t0) * 1000))
+
+
+def _ejecutar(cur, mig: Migration, sentencia: str):
+    try:
+        cur.execute(sentencia)
+    except psycopg.Error as e:
+        primera = " ".join(re.sub(r"--[^\n]*", " ", sentencia).split())[:160]
+        raise MigrationError(f"{mig.archivo}: {e.__class__.__name__}: {e} [en: {primera}]") from e
+
+
+def migrate(
+    target: Optional[str] = None,
+    dry_run: bool = False,
+    directory: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Aplica las pendientes hasta target (inclusive). Devuelve
+    {"aplicadas": [...], "pendientes": [...], "modificadas": [...]}; con dry_run
+    sólo informa. Lanza MigrationError en la primera que falla (las anteriores
+    quedan registradas).
+    """
+    migs = discover(directory)
+    if target is not None:
+        migs = [m for m in migs if m.version <= target]
+    res: Dict[str, Any] = {"aplicadas": [], "pendientes": [], "modificadas": [], "dry_run": dry_run}
+
+    def clasificar(aplicadas):
+        res["pendientes"], res["modificadas"] = [], []
+        for m in migs:
+            a = aplicadas.get(m.version)
+            if a is None:
+                res["pendientes"].append(m)
+            elif a["checksum"] != m.checksum:
+                res["modificadas"].append(m.archivo)
+
+    with _connect() as conn:
+        # dry_run no toma el lock: el chequeo de arranque no espera a otro proceso que esté migrando
+        clasificar(_aplicadas(conn))
+        if res["pendientes"] and not dry_run:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+                try:
+                    cur.execute("SELECT set_config('lock_timeout', %s, false), set_config('statement_timeout', '0', false)",
+                                (f"{int(Settings.MIGRATIONS_LOCK_TIMEOUT * 1000)}ms",))
+                    clasificar(_aplicadas(conn))   # otro proceso pudo aplicarlas mientras esperábamos
+                    cur.execute("CREATE SCHEMA IF NOT EXISTS inv")
+                    cur.execute(_SQL_TABLA)
+                    while res["pendientes"]:
+                        m = res["pendientes"][0]
+                        log.info("Aplicando migración %s", m.archivo)
+                        _aplicar(conn, m)
+                        res["aplicadas"].append(m.archivo)
+                        res["pendientes"].pop(0)
+                finally:
+                    if not conn.closed and not conn.broken:
+                        cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+    res["pendientes"] = [m.archivo for m in res["pendientes"]]
+    for f in res["modificadas"]:
+        log.warning("Migración %s cambió después de aplicarse (checksum distinto)", f)
+    return res
+
+
+def mark_applied(version: str, directory: Optional[str] = None) -> str:
+    """Registra una migración como aplicada sin ejecutarla (BD creada a mano)."""
+    migs = {m.version: m for m in discover(directory)}
+    mig = migs.get(version)
+    if mig is None:
+        raise MigrationError(f"No existe la migración {version}")
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE SCHEMA IF NOT EXISTS inv")
+            cur.execute(_SQL_TABLA)
+            _registrar(cur, mig, None)
+    return mig.archivo
+
+
+# ============================================================
+# Arranque
+# ============================================================
+def check_on_startup(mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    MIGRATIONS_ON_STARTUP: off | check (avisa en el log) | apply (aplica).
+    Si la BD no responde sólo se registra: /health/db ya lo informa. Con apply,
+    una migración que falla impide arrancar (MigrationError).
+    """
+    mode = (mode or Settings.MIGRATIONS_ON_STARTUP or "off").strip().lower()
+    if mode not in ("check", "apply"):
+        return None
+    try:
+        res = migrate(dry_run=mode != "apply")
+    except MigrationError:
+        raise
+    except Exception as e:
+        log.warning("No se pudo verificar las migraciones: %s", e)
+        return None
+    if res["aplicadas"]:
+        log.info("Migraciones aplicadas al arrancar: %s", ", ".join(res["aplicadas"]))
+    if res["pendientes"]:
+        log.warning("Migraciones pendientes: %s (flask migraciones aplicar)", ", ".join(res["pendientes"]))
+    return res
@@ -0,0 +1,144 @@
+# backend/app/core/passwords.py
+"""
+Hash y verificación de contraseñas en la capa de aplicación.
+
+- Usa el paquete 'bcrypt' (opcional). Los hashes son '$2a$NN$...', el mismo
+  formato que genera crypt(..., gen_salt('bf')) en pgcrypto, así que los hashes
+  existentes siguen validando en ambos lados.
+- El trabajo corre en un ThreadPoolExecutor acotado (bcrypt libera el GIL): un
+  pico de logins no deja sin hilos al resto de la API ni consume CPU de la BD.
+  Si la cola está llena se lanza PasswordBusy (la app responde 503).
+- Sin 'bcrypt' instalado, hash_sql()/hash_many() devuelven la variante con
+  crypt() y verify() devuelve None para que el llamador verifique en la BD.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.config import Settings
+
+try:
+    import bcrypt  # type: ignore
+    HAVE_BCRYPT = True
+except Exception:  # pragma: no cover - dependencia opcional
+    bcrypt = None
+    HAVE_BCRYPT = False
+
+ROUNDS = max(4, min(31, Settings.BCRYPT_ROUNDS))
+_MAX_BYTES = 72   # bcrypt sólo usa los primeros 72 bytes (pgcrypto trunca igual)
+_RX_BCRYPT = re.compile(r"^\$2[abxy]\$(\d{2})\$")
+
+
+class PasswordBusy(Exception):
+    """Demasiados hash/verificaciones en cola."""
+
+
+_executor = ThreadPoolExecutor(max_workers=max(1, Settings.BCRYPT_WORKERS), thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(max(1, Settings.BCRYPT_WORKERS) + max(0, Settings.BCRYPT_MAX_QUEUE))
+
+
+def _run(fn: Callable, *args):
+    if not _slots.acquire(timeout=Settings.BCRYPT_QUEUE_TIMEOUT):
+        raise PasswordBusy("Demasiadas solicitudes de autenticación en curso")
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def _b(raw: str) -> bytes:
+    return (raw or "").encode("utf-8")[:_MAX_BYTES]
+
+
+def _hash(raw: str) -> str:
+    return bcrypt.hashpw(_b(raw), bcrypt.gensalt(rounds=ROUNDS, prefix=b"2a")).decode("ascii")
+
+
+def _check(raw: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(_b(raw), hashed.encode("ascii"))
+    except ValueError:
+        # hash que no es bcrypt (p.ej. md5 de crypt) -> no se puede verificar aquí
+        return False
+
+
+# ============================================================
+# API
+# ============================================================
+def hash_password(raw: str) -> Optional[str]:
+    """Hash bcrypt listo para guardar; None si no está disponible el paquete."""
+    if not HAVE_BCRYPT:
+        return None
+    return _run(_hash, raw)
+
+
+def hash_many(raws: Sequence[Optional[str]]) -> List[Optional[str]]:
+    """Hashea en paralelo (mismo pool); None en las posiciones sin contraseña."""
+    if not HAVE_BCRYPT:
+        return [None] * len(raws)
+    out: List[Optional[str]] = [None] * len(raws)
+    idx = [i for i, r in enumerate(raws) if r is not None]
+    # se adquiere un cupo por lote, no por contraseña, para no bloquear a medias
+    if not _slots.acquire(timeout=Settings.BCRYPT_QUEUE_TIMEOUT):
+        raise PasswordBusy("Demasiadas solicitudes de autenticación en curso")
+    try:
+        for i, h in zip(idx, _executor.map(_hash, [raws[i] for i in idx])):
+            out[i] = h
+    finally:
+        _slots.release()
+    return out
+
+
+def hash_sql(raw: str) -> Tuple[str, list]:
+    """
+    Fragmento SQL + parámetros para guardar la contraseña:
+      ("%s", [hash])                         con bcrypt en la app
+      ("crypt(%s, gen_salt('bf', %s))", ...)  sin bcrypt (como antes, en la BD)
+    """
+    h = hash_password(raw)
+    if h is not None:
+        return "%s", [h]
+    return "crypt(%s, gen_salt('bf', %s))", [raw, ROUNDS]
+
+
+def is_bcrypt(hashed: Optional[str]) -> bool:
+    return bool(hashed and _RX_BCRYPT.match(hashed))
+
+
+def verify(raw: str, hashed: Optional[str]) -> Optional[bool]:
+    """
+    True/False si se pudo verificar en la app; None si hay que hacerlo en la BD
+    (sin paquete bcrypt o hash de otro algoritmo de crypt()).
+    """
+    if not hashed:
+        return False
+    if not HAVE_BCRYPT or not is_bcrypt(hashed):
+        return None
+    return _run(_check, raw, hashed)
+
+
+def verify_many(pares: Sequence[Tuple[str, Optional[str]]]) -> List[Optional[bool]]:
+    """verify() de varios (clave, hash) en paralelo; None donde hay que ir a la BD."""
+    out: List[Optional[bool]] = [None] * len(pares)
+    idx = []
+    for i, (raw, hashed) in enumerate(pares):
+        if not hashed:
+            out[i] = False
+        elif HAVE_BCRYPT and is_bcrypt(hashed):
+            idx.append(i)
+    if idx:
+        if not _slots.acquire(timeout=Settings.BCRYPT_QUEUE_TIMEOUT):
+            raise PasswordBusy("Demasiadas solicitudes de autenticación en curso")
+        try:
+            for i, ok in zip(idx, _executor.map(_check, [pares[i][0] for i in idx], [pares[i][1] for i in idx])):
+                out[i] = ok
+        finally:
+            _slots.release()
+    return out
+
+
+def needs_rehash(hashed: Optional[str]) -> bool:
+    """El hash guardado usa otro costo (o no es bcrypt) que el configurado."""
+    m = _RX_BCRYPT.match(hashed or "")
+    return not m or int(m.group(1)) != ROUNDS
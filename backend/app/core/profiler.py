@@ -0,0 +1,322 @@
+# backend/app/core/profiler.py
+"""
+Profiler por muestreo para requests en producción (opt-in).
+
+- Un único hilo muestreador lee sys._current_frames() cada PROFILE_INTERVAL_MS
+  y, sólo para los hilos que están atendiendo un request perfilado, suma la
+  pila en formato "folded" (raíz;...;hoja). Sin requests perfilados el hilo
+  duerme: el costo fuera de la muestra es un random() por request.
+- Qué se perfila: una fracción PROFILE_RATE de los requests (opcionalmente sólo
+  ciertos endpoints) o el request que trae "X-Profile: <PROFILE_TOKEN>".
+  La fracción y los endpoints se cambian en caliente con
+  POST /api/admin/profiles/config; se guardan en <dir>/_config.json y cada
+  worker lo relee (como mucho cada 2 s), así que valen para todos los procesos.
+- Salida: <PROFILE_DIR o instance/profiles>/<endpoint>.<pid>.folded, una línea
+  "pila cuenta" por pila (flamegraph.pl, speedscope, inferno). Cada worker
+  reescribe su archivo al terminar un request perfilado; merged() los junta.
+
+Las pilas incluyen psycopg (adaptación de filas) y el proveedor JSON; orjson y
+bcrypt son C y su tiempo aparece en la función Python que los llama.
+Sólo requests de Flask (WSGI): las rutas nativas de app.asgi comparten el hilo
+del event loop y no se pueden atribuir por hilo.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.config import Settings
+
+log = logging.getLogger(__name__)
+
+_MAX_DEPTH = 128
+_CONFIG_FILE = "_config.json"
+_CONFIG_CHECK = 2.0
+_RX_ENDPOINT = re.compile(r"[^\w.-]")
+
+_dir: Optional[str] = None
+
+
+def profile_dir_for(instance_path: str) -> str:
+    return Settings.PROFILE_DIR or os.path.join(instance_path, "profiles")
+
+
+# ============================================================
+# Muestreador
+# ============================================================
+_labels: Dict[tuple, str] = {}
+
+
+def _label(code) -> str:
+    key = (code.co_filename, code.co_name)
+    lbl = _labels.get(key)
+    if lbl is None:
+        lbl = f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ",").replace(" ", "_")
+        _labels[key] = lbl
+    return lbl
+
+
+def _folded(frame) -> str:
+    stack: List[str] = []
+    while frame is not None and len(stack) < _MAX_DEPTH:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+
+class _Sampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._activos: Dict[int, Counter] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, tid: int) -> None:
+        with self._lock:
+            self._activos[tid] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, tid: int) -> Counter:
+        with self._lock:
+            return self._activos.pop(tid, None) or Counter()
+
+    def _run(self):
+        propio = threading.get_ident()
+        while True:
+            if not self._activos:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                activos = list(self._activos.items())
+            for tid, cnt in activos:
+                f = frames.get(tid)
+                if f is not None and tid != propio:
+                    cnt[_folded(f)] += 1
+            del frames
+            time.sleep(max(0.001, Settings.PROFILE_INTERVAL_MS / 1000.0))
+
+
+_sampler = _Sampler()
+
+
+# ============================================================
+# Configuración compartida entre workers
+# ============================================================
+class _Config:
+    def __init__(self):
+        self.rate = max(0.0, min(1.0, Settings.PROFILE_RATE))
+        self.endpoints: List[str] = []
+        self.generacion = 0
+        self._mtime = 0.0
+        self._checked = 0.0
+
+    def as_dict(self) -> dict:
+        return {"rate": self.rate, "endpoints": self.endpoints, "generacion": self.generacion}
+
+    def refresh(self) -> None:
+        now = time.monotonic()
+        if _dir is None or now - self._checked < _CONFIG_CHECK:
+            return
+        self._checked = now
+        path = os.path.join(_dir, _CONFIG_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Profiler: no se pudo leer %s: %s", path, e)
+            return
+        self._mtime = mtime
+        self.rate = max(0.0, min(1.0, float(d.get("rate", self.rate))))
+        self.endpoints = [str(e) for e in d.get("endpoints") or []]
+        gen = int(d.get("generacion", 0))
+        if gen != self.generacion:
+            self.generacion = gen
+            _reset_local()
+
+    def save(self) -> None:
+        os.makedirs(_dir, exist_ok=True)
+        path = os.path.join(_dir, _CONFIG_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f)
+        os.replace(tmp, path)
+        self._checked = 0.0
+
+
+_config = _Config()
+
+
+def config() -> dict:
+    _config.refresh()
+    return dict(_config.as_dict(), interval_ms=Settings.PROFILE_INTERVAL_MS, dir=_dir)
+
+
+def set_config(rate: Optional[float] = None, endpoints: Optional[List[str]] = None) -> dict:
+    _config.refresh()
+    if rate is not None:
+        _config.rate = max(0.0, min(1.0, float(rate)))
+    if endpoints is not None:
+        _config.endpoints = [str(e) for e in endpoints if e]
+    _config.save()
+    return config()
+
+
+# ============================================================
+# Acumulado por endpoint (este proceso) y archivos
+# ============================================================
+_agg_lock = threading.Lock()
+_agg: Dict[str, Counter] = {}
+
+
+def _reset_local() -> None:
+    with _agg_lock:
+        _agg.clear()
+
+
+def _file_for(endpoint: str, pid: int) -> str:
+    return os.path.join(_dir, f"{endpoint}.{pid}.folded")
+
+
+def _write(endpoint: str, stacks: Counter) -> None:
+    os.makedirs(_dir, exist_ok=True)
+    path = _file_for(endpoint, os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for stack, n in stacks.most_common():
+            f.write(f"{stack} {n}\n")
+    os.replace(tmp, path)
+
+
+def _record(endpoint: str, samples: Counter) -> None:
+    if not samples:
+        return
+    with _agg_lock:
+        acc = _agg.setdefault(endpoint, Counter())
+        acc.update(samples)
+        try:
+            _write(endpoint, acc)
+        except OSError as e:
+            log.warning("Profiler: no se pudo escribir el perfil de %s: %s", endpoint, e)
+
+
+def _read(path: str) -> Counter:
+    out: Counter = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            stack, _, n = line.rstrip("\n").rpartition(" ")
+            if stack and n.isdigit():
+                out[stack] += int(n)
+    return out
+
+
+def list_profiles() -> List[dict]:
+    """Un registro por endpoint: muestras totales, procesos y última escritura."""
+    if _dir is None or not os.path.isdir(_dir):
+        return []
+    por_endpoint: Dict[str, dict] = {}
+    for name in os.listdir(_dir):
+        if not name.endswith(".folded"):
+            continue
+        endpoint, _, _pid = name[: -len(".folded")].rpartition(".")
+        path = os.path.join(_dir, name)
+        try:
+            samples = sum(_read(path).values())
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        e = por_endpoint.setdefault(endpoint, {"endpoint": endpoint, "samples": 0, "procesos": 0, "actualizado": 0.0})
+        e["samples"] += samples
+        e["procesos"] += 1
+        e["actualizado"] = max(e["actualizado"], mtime)
+    out = sorted(por_endpoint.values(), key=lambda e: e["samples"], reverse=True)
+    for e in out:
+        e["actualizado"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(e["actualizado"]))
+        e["ms_aprox"] = e["samples"] * Settings.PROFILE_INTERVAL_MS
+    return out
+
+
+def merged(endpoint: str) -> Optional[str]:
+    """Pilas folded de todos los procesos para un endpoint; None si no hay perfil."""
+    if _dir is None or not os.path.isdir(_dir):
+        return None
+    endpoint = _RX_ENDPOINT.sub("_", endpoint)
+    total: Counter = Counter()
+    found = False
+    for name in os.listdir(_dir):
+        if name.endswith(".folded") and name[: -len(".folded")].rpartition(".")[0] == endpoint:
+            found = True
+            try:
+                total.update(_read(os.path.join(_dir, name)))
+            except OSError:
+                continue
+    if not found:
+        return None
+    return "".join(f"{stack} {n}\n" for stack, n in total.most_common())
+
+
+def clear() -> int:
+    """Borra los perfiles de todos los procesos (nueva generación en _config.json)."""
+    n = 0
+    if _dir is not None and os.path.isdir(_dir):
+        for name in os.listdir(_dir):
+            if name.endswith(".folded"):
+                try:
+                    os.remove(os.path.join(_dir, name))
+                    n += 1
+                except OSError:
+                    pass
+    _config.refresh()
+    _config.generacion += 1
+    _config.save()
+    _reset_local()
+    return n
+
+
+# ============================================================
+# Hooks de Flask
+# ============================================================
+def _wanted(request) -> bool:
+    token = Settings.PROFILE_TOKEN
+    if token and request.headers.get("X-Profile") == token:
+        return True
+    _config.refresh()
+    if _config.rate <= 0 or random.random() >= _config.rate:
+        return False
+    return not _config.endpoints or (request.endpoint or "") in _config.endpoints
+
+
+def init_profiler(app) -> None:
+    global _dir
+    _dir = profile_dir_for(app.instance_path)
+
+    from flask import g, request
+
+    @app.before_request
+    def _profile_start():
+        if request.endpoint and _wanted(request):
+            g._profile_tid = threading.get_ident()
+            _sampler.start(g._profile_tid)
+
+    @app.teardown_request
+    def _profile_end(exc):
+        tid = g.pop("_profile_tid", None)
+        if tid is not None:
+            _record(_RX_ENDPOINT.sub("_", request.endpoint or "sin_ruta"), _sampler.stop(tid))
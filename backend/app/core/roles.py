@@ -0,0 +1,24 @@
+# backend/app/core/roles.py
+"""
+Nombres de rol: la UI usa USUARIO, la BD (inv.roles) USUARIOS.
+"""
+
+
+def ui_to_db_role(rol_ui: str) -> str:
+    """
+    UI: ADMIN | USUARIO | PRACTICANTE
+    BD: ADMIN | USUARIOS | PRACTICANTE
+    """
+    r = (rol_ui or "").strip().upper()
+    if r == "USUARIO":
+        return "USUARIOS"
+    if r in ("ADMIN", "PRACTICANTE"):
+        return r
+    return r
+
+
+def db_to_ui_role(rol_db: str) -> str:
+    r = (rol_db or "").strip().upper()
+    if r == "USUARIOS":
+        return "USUARIO"
+    return r
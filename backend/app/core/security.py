@@ -2,6 +2,8 @@
 import os, time, functools
 import jwt
 from flask import request, jsonify
+from app.core import auth_context
+from app.core.auth_context import AuthError
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
 JWT_EXP_SECONDS = int(os.getenv("JWT_EXP_SECONDS", "21600"))  # 6h
@@ -13,19 +15,47 @@ def make_token(payload: dict) -> str:
     data["exp"] = int(time.time()) + JWT_EXP_SECONDS
     return jwt.encode(data, JWT_SECRET, algorithm="HS256")
 
-def decode_token_from_request():
-    h = request.headers.get("Authorization", "")
-    if not h.startswith("Bearer "):
-        raise ValueError("Falta Bearer token")
-    tok = h.split(" ", 1)[1].strip()
+def _decode_jwt(tok: str) -> dict:
     return jwt.decode(tok, JWT_SECRET, algorithms=["HS256"])
 
+def decode_token(tok: str) -> dict:
+    """Verifica el token (firma + exp); los ya verificados salen del LRU de auth_context."""
+    try:
+        return auth_context.tokens.verify(tok, _decode_jwt)
+    except jwt.PyJWTError as e:
+        raise AuthError(str(e)) from e
+
+def decode_bearer(authorization: str) -> dict:
+    """Valida un header 'Authorization: Bearer ...' (también lo usa el modo ASGI)."""
+    h = authorization or ""
+    if not h.startswith("Bearer "):
+        raise AuthError("Falta Bearer token")
+    return decode_token(h.split(" ", 1)[1].strip())
+
+def authenticate(authorization: str, fetch_user: bool = True):
+    """
+    Claims del token enriquecidos con el estado vigente del usuario (rol, área).
+    Lanza AuthError si el token no es válido o el usuario fue desactivado/eliminado.
+    Con fetch_user=False devuelve None si el estado del usuario no está en caché.
+    """
+    claims = decode_bearer(authorization)
+    username = claims.get("username")
+    if not username:
+        raise AuthError("Token sin username")
+    st = auth_context.users.get(username, fetch=fetch_user)
+    if st is None:
+        return None
+    return auth_context.enrich_claims(claims, st)
+
+def decode_token_from_request():
+    return authenticate(request.headers.get("Authorization", ""))
+
 def require_auth(fn):
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
         try:
             claims = decode_token_from_request()
-        except Exception as e:
+        except AuthError as e:
             return jsonify({"error": f"Token inválido: {e}"}), 401
         request.claims = claims
         return fn(*args, **kwargs)
@@ -44,7 +74,7 @@ def require_roles(roles: list[str]):
                 try:
                     claims = decode_token_from_request()
                     request.claims = claims
-                except Exception as e:
+                except AuthError as e:
                     return jsonify({"error": f"Token inválido: {e}"}), 401
             rol = (claims.get("rol") or "").upper()
             if rol not in allowed:
@@ -0,0 +1,255 @@
+# backend/app/core/slow_queries.py
+"""
+Log de SQL lenta con captura de EXPLAIN.
+
+- Observador de app.core.stmt_stats: toda sentencia de los cursores de
+  get_conn/get_aconn que tarde más de DB_SLOW_QUERY_MS se registra en el
+  logger "app.slow_sql" con el SQL normalizado (literales -> ?), los
+  parámetros redactados, la duración, la función del modelo que la ejecutó
+  y el app_user de la conexión.
+- A una fracción (DB_SLOW_QUERY_EXPLAIN_SAMPLE) de las lecturas lentas se les
+  captura EXPLAIN (FORMAT JSON) en un hilo aparte con su propia conexión
+  (no toma conexiones del pool ni demora la respuesta). Como mucho una vez
+  cada DB_SLOW_QUERY_EXPLAIN_INTERVAL seg por consulta normalizada.
+- Las últimas DB_SLOW_QUERY_BUFFER entradas quedan en un buffer circular en
+  memoria (por proceso) que expone GET /api/admin/slow-queries.
+
+Limitaciones: en pipeline mode (app.db.pipeline) el tiempo medido es el de
+encolar, así que esas sentencias no llegan al umbral. El EXPLAIN es el plan
+de ahora en el primario, no necesariamente el que se ejecutó.
+"""
+import hashlib
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional
+
+import psycopg
+
+from app.config import Settings
+from app.core import stmt_stats
+
+log = logging.getLogger("app.slow_sql")
+
+_EXPLAIN_TIMEOUT_MS = 2000
+_MAX_SQL = 4000
+_MAX_VALOR = 64
+
+_buffer: deque = deque(maxlen=max(1, Settings.DB_SLOW_QUERY_BUFFER))
+_total = 0
+_ultimo_explain: Dict[str, float] = {}
+
+
+# ============================================================
+# Normalización y redacción
+# ============================================================
+_RX_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RX_CADENA = re.compile(r"[Ee]?'(?:[^']|'')*'")
+_RX_NUMERO = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?\b")
+_RX_ESPACIOS = re.compile(r"\s+")
+_RX_LISTA = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_RX_SQL_SECRETO = re.compile(r"crypt\s*\(|password|passwd|pass_hash|token", re.I)
+_RX_CLAVE_SECRETA = re.compile(r"pass|pwd|token|secret|hash|clave", re.I)
+_RX_LECTURA = re.compile(r"^\(*\s*(select|with)\b", re.I)
+_RX_ESCRITURA = re.compile(r"\b(insert|update|delete|merge|for\s+update|for\s+share|nextval|setval)\b", re.I)
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL en una línea, literales y listas IN (...) colapsados a '?'."""
+    s = _RX_COMENTARIO.sub(" ", sql)
+    s = _RX_CADENA.sub("?", s)
+    s = _RX_NUMERO.sub("?", s)
+    s = _RX_ESPACIOS.sub(" ", s).strip()
+    s = _RX_LISTA.sub("(?)", s)
+    return s if len(s) <= _MAX_SQL else s[:_MAX_SQL] + "…"
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def _valor(v: Any, todo_secreto: bool) -> Any:
+    if v is None or isinstance(v, (bool, int, float)):
+        return v
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return f"<{len(v)} bytes>"
+    if isinstance(v, str):
+        if todo_secreto or v.startswith(("$2a$", "$2b$", "$2y$")) or (v.startswith("eyJ") and v.count(".") == 2):
+            return "***"
+        return v if len(v) <= _MAX_VALOR else v[:_MAX_VALOR] + "…"
+    if isinstance(v, (list, tuple)):
+        out = [_valor(x, todo_secreto) for x in v[:20]]
+        return out + ["…"] if len(v) > 20 else out
+    s = str(v)   # fechas, Decimal, Json(...)
+    return s if len(s) <= _MAX_VALOR else s[:_MAX_VALOR] + "…"
+
+
+def redact_params(sql: str, params: Any, n: int = 1) -> Any:
+    """
+    Parámetros aptos para el log: secretos -> '***' (por nombre del parámetro,
+    por forma del valor -bcrypt, JWT- o, si el SQL toca contraseñas, todas las
+    cadenas), textos largos truncados. executemany sólo informa la cantidad.
+    """
+    if params is None:
+        return None
+    if n > 1:
+        return {"filas": n}
+    todo = bool(_RX_SQL_SECRETO.search(sql))
+    if isinstance(params, Mapping):
+        return {k: ("***" if _RX_CLAVE_SECRETA.search(str(k)) else _valor(v, todo)) for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_valor(v, todo) for v in params]
+    return _valor(params, todo)
+
+
+def _llamador() -> Optional[str]:
+    """Primera función de app.models / app.jobs en la pila (o la primera de app.* fuera de la capa de BD)."""
+    f = sys._getframe(2)
+    alterno = None
+    while f is not None:
+        mod = f.f_globals.get("__name__", "")
+        if mod.startswith(("app.models.", "app.jobs.")):
+            return f"{mod.rsplit('.', 1)[-1]}.{f.f_code.co_name}:{f.f_lineno}"
+        if alterno is None and mod.startswith("app.") and not mod.startswith(("app.db", "app.core.")):
+            alterno = f"{mod.rsplit('.', 1)[-1]}.{f.f_code.co_name}:{f.f_lineno}"
+        f = f.f_back
+    return alterno
+
+
+# ============================================================
+# EXPLAIN en segundo plano
+# ============================================================
+class _Explainer:
+    """Un hilo daemon con cola acotada y conexión propia (fuera del pool)."""
+
+    def __init__(self, maxsize: int = 16):
+        self._q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[psycopg.Connection] = None
+
+    def submit(self, entry: dict, sql: str, params: Any, app_user: Optional[str]) -> bool:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="slow-sql-explain", daemon=True)
+                    self._thread.start()
+        try:
+            self._q.put_nowait((entry, sql, params, app_user))
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        while True:
+            entry, sql, params, app_user = self._q.get()
+            try:
+                entry["plan"] = self._explain(sql, params, app_user)
+                entry["explain"] = "ok"
+            except Exception as e:
+                entry["explain"] = f"error: {e}"
+                if self._conn is not None and self._conn.closed:
+                    self._conn = None
+
+    def _explain(self, sql: str, params: Any, app_user: Optional[str]):
+        if self._conn is None or self._conn.closed:
+            # cursor por defecto: estas sentencias no pasan por los observadores
+            self._conn = psycopg.connect(Settings.DATABASE_URL, connect_timeout=Settings.DB_CONNECT_TIMEOUT)
+        with self._conn.transaction(), self._conn.cursor() as cur:
+            cur.execute(
+                "SELECT set_config('transaction_read_only', 'on', true),"
+                "       set_config('statement_timeout', %s, true),"
+                "       set_config('app.user', %s, true)",
+                (str(_EXPLAIN_TIMEOUT_MS), app_user or ""),
+            )
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            return cur.fetchone()[0]
+
+
+_explainer = _Explainer()
+
+
+def _debe_explicar(norm: str, fp: str) -> bool:
+    if Settings.DB_SLOW_QUERY_EXPLAIN_SAMPLE <= 0:
+        return False
+    if not _RX_LECTURA.match(norm) or _RX_ESCRITURA.search(norm):
+        return False
+    if random.random() >= Settings.DB_SLOW_QUERY_EXPLAIN_SAMPLE:
+        return False
+    now = time.monotonic()
+    t = _ultimo_explain.get(fp)
+    if t is not None and now - t < Settings.DB_SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    if len(_ultimo_explain) > 1000:
+        _ultimo_explain.clear()
+    _ultimo_explain[fp] = now
+    return True
+
+
+# ============================================================
+# Observador
+# ============================================================
+def _observar(cur, query, params, ms: float, n: int) -> None:
+    global _total
+    if ms < Settings.DB_SLOW_QUERY_MS:
+        return
+    sql = stmt_stats.sql_text(cur, query)
+    norm = normalize_sql(sql)
+    fp = fingerprint(norm)
+    usuario = stmt_stats.app_user()
+    from app.core import tracing
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "ms": round(ms, 1),
+        "fingerprint": fp,
+        "sql": norm,
+        "params": redact_params(sql, params, n),
+        "caller": _llamador(),
+        "app_user": usuario,
+        "trace_id": tracing.current_trace_id(),
+    }
+    _total += 1
+    log.warning("SQL lenta %.1f ms [%s] %s user=%s: %s params=%s",
+                ms, fp, entry["caller"], usuario, norm, entry["params"])
+    if n == 1 and _debe_explicar(norm, fp):
+        entry["explain"] = "pendiente"
+        if not _explainer.submit(entry, sql, params, usuario):
+            entry["explain"] = "descartado (cola llena)"
+    _buffer.append(entry)
+
+
+def init_slow_queries() -> bool:
+    """Registra el observador; False si está desactivado (umbral 0 o sin cursor de estadísticas)."""
+    if Settings.DB_SLOW_QUERY_MS <= 0 or stmt_stats.cursor_factory() is None:
+        return False
+    stmt_stats.add_observer(_observar)
+    return True
+
+
+def recent(limit: int = 50, with_plan: bool = True) -> List[dict]:
+    """Últimas entradas, la más reciente primero."""
+    out = list(_buffer)[-max(1, limit):][::-1]
+    if not with_plan:
+        out = [{k: v for k, v in e.items() if k != "plan"} for e in out]
+    return out
+
+
+def clear() -> None:
+    _buffer.clear()
+    _ultimo_explain.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "umbral_ms": Settings.DB_SLOW_QUERY_MS,
+        "total": _total,
+        "en_buffer": len(_buffer),
+        "buffer_max": _buffer.maxlen,
+        "explain_sample": Settings.DB_SLOW_QUERY_EXPLAIN_SAMPLE,
+    }
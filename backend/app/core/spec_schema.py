@@ -0,0 +1,257 @@
+# backend/app/core/spec_schema.py
+"""
+Esquema de ficha por tipo de ítem (clase, tipo), compilado y en caché.
+
+- SpecSchema: atributos del tipo (attr_id, nombre, data_type, orden) indexados
+  por nombre en minúsculas. coerce() valida y convierte una ficha completa en
+  Python (int/Decimal/bool/date) antes de tocar la BD; los errores vuelven por
+  atributo sin ningún round-trip.
+- Caché por proceso con TTL (SPEC_SCHEMA_TTL): define_attr y las altas que
+  definen atributos nuevos llaman a invalidate_schema(); el TTL acota lo que
+  tarda en verse un atributo definido desde otro worker.
+- Lo usan el endpoint de atributos (UI), el alta de ítems con ficha y el
+  upsert de ficha completa.
+"""
+import datetime
+import decimal
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import Settings
+from app.core.lru import LRU
+from app.db import get_conn
+
+DATA_TYPES = ("text", "int", "numeric", "bool", "date")
+VAL_COLUMNS = {
+    "text": "val_text",
+    "int": "val_int",
+    "numeric": "val_numeric",
+    "bool": "val_bool",
+    "date": "val_date",
+}
+
+_TRUE = {"true", "t", "1", "si", "sí", "s", "yes", "y", "on"}
+_FALSE = {"false", "f", "0", "no", "n", "off"}
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def infer_data_type(value: Any) -> str:
+    """data_type para un atributo nuevo a partir del valor JSON."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "numeric"
+    return "text"
+
+
+def coerce_value(data_type: str, value: Any) -> Any:
+    """Valor Python listo para la columna val_*; None/'' -> None. Lanza ValueError."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if data_type == "text":
+        if isinstance(value, (dict, list)):
+            raise ValueError("se esperaba texto")
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value).strip()
+    if data_type == "int":
+        if isinstance(value, bool):
+            raise ValueError("se esperaba un entero")
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError("se esperaba un entero")
+            value = int(value)
+        elif isinstance(value, str):
+            try:
+                value = int(value.strip())
+            except ValueError:
+                raise ValueError("se esperaba un entero") from None
+        elif not isinstance(value, int):
+            raise ValueError("se esperaba un entero")
+        if not _INT_MIN <= value <= _INT_MAX:
+            raise ValueError("entero fuera de rango")
+        return value
+    if data_type == "numeric":
+        if isinstance(value, bool) or not isinstance(value, (int, float, str, decimal.Decimal)):
+            raise ValueError("se esperaba un número")
+        try:
+            d = decimal.Decimal(str(value).strip().replace(",", "."))
+        except decimal.InvalidOperation:
+            raise ValueError("se esperaba un número") from None
+        if not d.is_finite():
+            raise ValueError("se esperaba un número")
+        return d
+    if data_type == "bool":
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str):
+            v = value.strip().lower()
+            if v in _TRUE:
+                return True
+            if v in _FALSE:
+                return False
+        raise ValueError("se esperaba sí/no")
+    if data_type == "date":
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        if isinstance(value, str):
+            try:
+                return datetime.date.fromisoformat(value.strip()[:10])
+            except ValueError:
+                pass
+        raise ValueError("se esperaba una fecha AAAA-MM-DD")
+    raise ValueError("data_type inválido")
+
+
+def json_value(value: Any) -> Any:
+    """Valor ya convertido -> forma JSON (para los SP que reciben la ficha como jsonb)."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+@dataclass(frozen=True)
+class SpecAttr:
+    attr_id: int
+    nombre: str
+    data_type: str
+    orden: Optional[int]
+
+
+@dataclass(frozen=True)
+class SpecValue:
+    """Un valor de la ficha ya validado; attr es None si el atributo aún no existe."""
+    nombre: str
+    data_type: str
+    value: Any
+    attr: Optional[SpecAttr]
+
+
+class SpecSchema:
+    def __init__(self, item_tipo_id: int, clase: str, tipo: str, attrs: List[SpecAttr]):
+        self.item_tipo_id = item_tipo_id
+        self.clase = clase
+        self.tipo = tipo
+        self.attrs = attrs
+        self.by_name: Dict[str, SpecAttr] = {a.nombre.lower(): a for a in attrs}
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [{"nombre": a.nombre, "data_type": a.data_type, "orden": a.orden} for a in self.attrs]
+
+    def coerce(self, ficha: Dict[str, Any], permitir_nuevos: bool = True) -> Tuple[List[SpecValue], Dict[str, str]]:
+        """
+        Valida una ficha {atributo: valor | {"data_type", "value"}}.
+        Devuelve (valores, errores); errores es {atributo: motivo} y vacío si todo va bien.
+        Los atributos que el tipo no tiene usan el data_type indicado o uno inferido.
+        """
+        valores: Dict[str, SpecValue] = {}
+        errores: Dict[str, str] = {}
+        if not isinstance(ficha, dict):
+            return [], {"ficha": "se esperaba un objeto atributo -> valor"}
+        for nombre, raw in ficha.items():
+            nombre = (nombre or "").strip() if isinstance(nombre, str) else ""
+            if not nombre:
+                continue
+            if isinstance(raw, dict):
+                dt = (raw.get("data_type") or "").strip().lower() or None
+                val = raw.get("value")
+            else:
+                dt, val = None, raw
+            if dt and dt not in DATA_TYPES:
+                errores[nombre] = "data_type inválido"
+                continue
+            attr = self.by_name.get(nombre.lower())
+            if attr is not None:
+                if dt and dt != attr.data_type:
+                    errores[nombre] = f"es de tipo {attr.data_type}, no {dt}"
+                    continue
+                dt = attr.data_type
+                nombre = attr.nombre
+            elif not permitir_nuevos:
+                errores[nombre] = "atributo no definido para el tipo"
+                continue
+            else:
+                dt = dt or infer_data_type(val)
+            try:
+                valores[nombre.lower()] = SpecValue(nombre, dt, coerce_value(dt, val), attr)
+            except ValueError as e:
+                errores[nombre] = str(e)
+        return list(valores.values()), errores
+
+
+def format_errores(errores: Dict[str, str]) -> str:
+    return "Ficha inválida: " + "; ".join(f"{k}: {v}" for k, v in errores.items())
+
+
+# ============================================================
+# CACHÉ
+# ============================================================
+_SQL_SCHEMA = """
+    SELECT it.item_tipo_id, it.clase, it.nombre, sa.attr_id, sa.nombre_attr, sa.data_type, sa.orden
+    FROM inv.item_tipos it
+    LEFT JOIN inv.spec_atributos sa ON sa.item_tipo_id = it.item_tipo_id
+    WHERE it.clase = %s AND lower(it.nombre) = lower(%s)
+    ORDER BY sa.orden NULLS LAST, lower(sa.nombre_attr)
+"""
+
+_cache = LRU(Settings.SPEC_SCHEMA_CACHE_SIZE)
+
+
+def _key(clase: str, tipo: str) -> Tuple[str, str]:
+    return ((clase or "").upper(), (tipo or "").strip().lower())
+
+
+def _compile(rows) -> Optional[SpecSchema]:
+    if not rows:
+        return None
+    tipo_id, clase, tipo = int(rows[0][0]), rows[0][1], rows[0][2]
+    attrs = [
+        SpecAttr(attr_id=int(r[3]), nombre=r[4], data_type=r[5], orden=r[6])
+        for r in rows if r[3] is not None
+    ]
+    return SpecSchema(tipo_id, clase, tipo, attrs)
+
+
+def get_schema(app_user: Optional[str], clase: str, tipo: str, cur=None, fresh: bool = False) -> Optional[SpecSchema]:
+    """
+    Esquema del tipo (None si el tipo no existe; eso no se cachea).
+    Con cur se consulta en esa transacción. fresh=True ignora la caché y no
+    guarda el resultado (para releer tras definir atributos sin confirmar aún).
+    """
+    key = _key(clase, tipo)
+    use_cache = Settings.SPEC_SCHEMA_TTL > 0 and not fresh
+    if use_cache:
+        sch = _cache.get(key)
+        if sch is not None:
+            return sch
+    if cur is not None:
+        cur.execute(_SQL_SCHEMA, key, prepare=True)
+        sch = _compile(cur.fetchall())
+    else:
+        with get_conn(app_user, readonly=True) as (conn, c):
+            c.execute(_SQL_SCHEMA, key, prepare=True)
+            sch = _compile(c.fetchall())
+    if sch is not None and use_cache:
+        _cache.put(key, sch, time.time() + Settings.SPEC_SCHEMA_TTL)
+    return sch
+
+
+def invalidate_schema(clase: Optional[str] = None, tipo: Optional[str] = None):
+    """Llamar tras definir atributos; sin argumentos vacía la caché."""
+    if clase is None:
+        _cache.clear()
+    else:
+        _cache.pop(_key(clase, tipo or ""))
+
+
+def cache_stats() -> Dict[str, int]:
+    return _cache.stats()
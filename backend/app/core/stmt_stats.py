@@ -0,0 +1,157 @@
+# backend/app/core/stmt_stats.py
+"""
+Conteo y tiempo de las sentencias SQL que ejecuta un bloque de código.
+
+- StatsCursor / AsyncStatsCursor: cursor_factory de los pools (app.db,
+  app.db_async) con DB_STATEMENT_STATS=true. Cada execute/executemany se
+  anota en los colectores activos del contexto actual (contextvar: vale para
+  hilos y para tareas asyncio).
+- collect(): `with collect() as st: ...` -> st.count, st.ms y, con
+  keep_sql=True, st.statements [(sql, params, ms)]. Los colectores se anidan.
+- add_observer(fn): fn(cur, query, params, ms, n) tras cada sentencia, en
+  todo el proceso (log de SQL lenta, app.core.slow_queries).
+- app_user_scope(): get_conn/get_aconn dejan el app_user de la conexión en
+  el contexto; app_user() lo devuelve a los observadores.
+
+Sin colectores ni observadores el costo es un ContextVar.get() por sentencia.
+En pipeline mode el tiempo medido es el de encolar, no el de la BD; la cuenta
+sí es exacta.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+import psycopg
+from psycopg import sql as _sql
+
+from app.config import Settings
+
+_activos: contextvars.ContextVar[Tuple["StmtStats", ...]] = contextvars.ContextVar("stmt_stats", default=())
+_app_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("stmt_app_user", default=None)
+# Tupla (no lista) para leerla sin lock desde los cursores
+_observadores: Tuple[Callable, ...] = ()
+
+log = logging.getLogger(__name__)
+
+
+class StmtStats:
+    __slots__ = ("count", "ms", "keep_sql", "statements")
+
+    def __init__(self, keep_sql: bool = False):
+        self.count = 0
+        self.ms = 0.0
+        self.keep_sql = keep_sql
+        self.statements: List[Tuple[str, Any, float]] = []
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "ms": round(self.ms, 3)}
+
+
+@contextmanager
+def collect(keep_sql: bool = False):
+    st = StmtStats(keep_sql)
+    token = _activos.set(_activos.get() + (st,))
+    try:
+        yield st
+    finally:
+        _activos.reset(token)
+
+
+def add_observer(fn: Callable) -> None:
+    global _observadores
+    if fn not in _observadores:
+        _observadores = _observadores + (fn,)
+
+
+def remove_observer(fn: Callable) -> None:
+    global _observadores
+    _observadores = tuple(o for o in _observadores if o is not fn)
+
+
+@contextmanager
+def app_user_scope(app_user: Optional[str]):
+    token = _app_user.set(app_user)
+    try:
+        yield
+    finally:
+        _app_user.reset(token)
+
+
+def app_user() -> Optional[str]:
+    return _app_user.get()
+
+
+def _activo() -> bool:
+    return bool(_observadores) or bool(_activos.get())
+
+
+def sql_text(cur, query) -> str:
+    if isinstance(query, _sql.Composable):
+        return query.as_string(cur)
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return str(query)
+
+
+def _anotar(cur, query, params, ms: float, n: int = 1):
+    for st in _activos.get():
+        st.count += n
+        st.ms += ms
+        if st.keep_sql:
+            st.statements.append((sql_text(cur, query), params, ms))
+    for fn in _observadores:
+        try:
+            fn(cur, query, params, ms, n)
+        except Exception:
+            log.exception("Observador de sentencias %r falló", fn)
+
+
+class StatsCursor(psycopg.Cursor):
+    def execute(self, query, params=None, **kwargs):
+        if not _activo():
+            return super().execute(query, params, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            _anotar(self, query, params, (time.perf_counter() - t0) * 1000)
+
+    def executemany(self, query, params_seq, **kwargs):
+        if not _activo():
+            return super().executemany(query, params_seq, **kwargs)
+        params_seq = list(params_seq)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            _anotar(self, query, params_seq, (time.perf_counter() - t0) * 1000, n=len(params_seq))
+
+
+class AsyncStatsCursor(psycopg.AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        if not _activo():
+            return await super().execute(query, params, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            _anotar(self, query, params, (time.perf_counter() - t0) * 1000)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        if not _activo():
+            return await super().executemany(query, params_seq, **kwargs)
+        params_seq = list(params_seq)
+        t0 = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            _anotar(self, query, params_seq, (time.perf_counter() - t0) * 1000, n=len(params_seq))
+
+
+def cursor_factory(async_: bool = False) -> Optional[type]:
+    """Clase de cursor para los pools; None con DB_STATEMENT_STATS=false."""
+    if not Settings.DB_STATEMENT_STATS:
+        return None
+    return AsyncStatsCursor if async_ else StatsCursor
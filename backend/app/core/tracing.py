@@ -0,0 +1,336 @@
+# backend/app/core/tracing.py
+"""
+Trazas livianas por request: un trace_id y spans anidados vía contextvars.
+
+- Raíz: cada request de Flask (y de las rutas nativas de app.asgi) abre una
+  traza "HTTP <método> <endpoint>"; continúa el traceparent W3C entrante
+  (traza siempre si trae el flag sampled; si no, aplica TRACING_SAMPLE) y
+  devuelve el id en X-Trace-Id.
+- Spans: span("nombre", **attrs) como context manager; record() para algo que
+  ya terminó (las sentencias SQL llegan del observador de app.core.stmt_stats
+  con su duración). Instrumentados: get_conn/get_aconn (db.conn + db.checkout),
+  cada sentencia (db.statement), send_mail_safe (mail.connect, mail.tls,
+  mail.login, mail.send) y la escritura de uploads (fs.write).
+- Sin traza activa (jobs, CLI, request no muestreado) span() no hace nada.
+- Exportación (TRACING_EXPORTER): "log" = una línea JSON por traza en el logger
+  "app.trace"; "otlp" = OTLP/HTTP JSON a TRACING_OTLP_ENDPOINT (collector de
+  OpenTelemetry, Jaeger, Tempo...) desde un hilo con cola acotada, sin
+  depender del SDK de OpenTelemetry; "off" = desactivado.
+
+En pipeline mode la duración de db.statement es la de encolar (ver stmt_stats).
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from app.config import Settings
+from app.core import stmt_stats
+from app.core.slow_queries import normalize_sql
+
+log = logging.getLogger("app.trace")
+
+EXPORTER = (Settings.TRACING_EXPORTER or "off").lower()
+ENABLED = EXPORTER in ("log", "otlp")
+
+_RX_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_MAX_SQL = 1000
+
+# OTLP SpanKind
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attrs", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attrs: Dict[str, Any],
+                 start_ns: Optional[int] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def as_dict(self) -> dict:
+        d = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+        }
+        if self.attrs:
+            d["attrs"] = self.attrs
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class Trace:
+    def __init__(self, trace_id: str, remote_parent: Optional[str] = None):
+        self.trace_id = trace_id
+        self.remote_parent = remote_parent
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= Settings.TRACING_MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    sp = _current.get()
+    return sp.trace.trace_id if sp is not None else None
+
+
+# ============================================================
+# API de spans
+# ============================================================
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attrs):
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    sp = Span(parent.trace, name, parent.span_id, kind, attrs)
+    if not parent.trace.add(sp):
+        yield None
+        return
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+def record(name: str, start_ns: int, end_ns: Optional[int] = None, kind: int = KIND_INTERNAL, **attrs) -> None:
+    """Span ya terminado, hijo del span actual."""
+    parent = _current.get()
+    if parent is None:
+        return
+    sp = Span(parent.trace, name, parent.span_id, kind, attrs, start_ns=start_ns)
+    sp.end_ns = end_ns if end_ns is not None else time.time_ns()
+    parent.trace.add(sp)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attrs):
+    """Abre la traza raíz de un request; None si no se muestrea. Devolver el token a end_trace()."""
+    if not ENABLED:
+        return None
+    m = _RX_TRACEPARENT.match((traceparent or "").strip().lower())
+    # el llamador ya decidió muestrear (flag sampled); si no, decide TRACING_SAMPLE
+    # pero la traza sigue colgando del trace id entrante
+    muestreado = m is not None and int(m.group(3), 16) & 1
+    if not muestreado and random.random() >= Settings.TRACING_SAMPLE:
+        return None
+    trace = Trace(m.group(1) if m else os.urandom(16).hex(), m.group(2) if m else None)
+    root = Span(trace, name, trace.remote_parent, KIND_SERVER, attrs)
+    trace.add(root)
+    return root, _current.set(root)
+
+
+def end_trace(handle, status: Optional[int] = None, error: Optional[str] = None) -> None:
+    if handle is None:
+        return
+    root, token = handle
+    root.end_ns = time.time_ns()
+    if status is not None:
+        root.attrs["http.status_code"] = status
+    if error:
+        root.error = error
+    try:
+        _current.reset(token)
+    except ValueError:
+        _current.set(None)   # otro contexto (no debería pasar): que no quede colgado
+    _export(root.trace)
+
+
+# ============================================================
+# Observador de sentencias
+# ============================================================
+def _on_statement(cur, query, params, ms: float, n: int) -> None:
+    if _current.get() is None:
+        return
+    end = time.time_ns()
+    sql = normalize_sql(stmt_stats.sql_text(cur, query))
+    if not sql:   # check_connection del pool al entregar la conexión
+        record("db.pool_check", end - int(ms * 1e6), end, KIND_CLIENT)
+        return
+    record("db.statement", end - int(ms * 1e6), end, KIND_CLIENT,
+           **{"db.statement": sql[:_MAX_SQL], "db.rows": n if n > 1 else cur.rowcount})
+
+
+# ============================================================
+# Exportadores
+# ============================================================
+def _export(trace: Trace) -> None:
+    try:
+        if EXPORTER == "log":
+            root = trace.spans[0]
+            log.info(json.dumps({
+                "trace_id": trace.trace_id,
+                "name": root.name,
+                "ms": root.as_dict()["ms"],
+                "spans": [s.as_dict() for s in trace.spans],
+                "dropped": trace.dropped,
+            }, default=str, ensure_ascii=False))
+        elif EXPORTER == "otlp":
+            _otlp.submit(trace)
+    except Exception:
+        log.exception("No se pudo exportar la traza %s", trace.trace_id)
+
+
+def _otlp_value(v: Any) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_span(s: Span) -> dict:
+    d = {
+        "traceId": s.trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items() if v is not None],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+    }
+    if s.parent_id:
+        d["parentSpanId"] = s.parent_id
+    return d
+
+
+class _OtlpExporter:
+    """Hilo daemon que junta trazas y las envía en lotes a /v1/traces."""
+
+    def __init__(self, maxsize: int = 1000, batch: int = 50, interval: float = 2.0):
+        self._q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._batch = batch
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._q.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            lote = [self._q.get()]
+            limite = time.monotonic() + self._interval
+            while len(lote) < self._batch:
+                try:
+                    lote.append(self._q.get(timeout=max(0.0, limite - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._send(lote)
+            except Exception as e:
+                log.warning("OTLP: no se pudieron enviar %d trazas a %s: %s",
+                            len(lote), Settings.TRACING_OTLP_ENDPOINT, e)
+
+    def _send(self, lote: List[Trace]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": Settings.TRACING_SERVICE_NAME}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.core.tracing"},
+                    "spans": [_otlp_span(s) for t in lote for s in t.spans],
+                }],
+            }]
+        }
+        req = urllib.request.Request(
+            Settings.TRACING_OTLP_ENDPOINT,
+            data=json.dumps(body, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            resp.read()
+
+
+_otlp = _OtlpExporter()
+
+
+# ============================================================
+# Flask
+# ============================================================
+def init_tracing(app) -> bool:
+    """Traza raíz por request, X-Trace-Id y spans de sentencias. False si está desactivado."""
+    if not ENABLED:
+        return False
+
+    from flask import g, request
+
+    if stmt_stats.cursor_factory() is not None:
+        stmt_stats.add_observer(_on_statement)
+
+    @app.before_request
+    def _trace_start():
+        g._trace = start_trace(
+            f"HTTP {request.method} {request.endpoint or 'sin_ruta'}",
+            request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.route": request.url_rule.rule if request.url_rule else None,
+               "http.target": request.path},
+        )
+
+    @app.after_request
+    def _trace_header(resp):
+        handle = g.get("_trace")
+        if handle is not None:
+            resp.headers["X-Trace-Id"] = handle[0].trace.trace_id
+            handle[0].attrs["http.status_code"] = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def _trace_end(exc):
+        handle = g.pop("_trace", None)
+        if handle is not None:
+            handle[0].attrs.setdefault("app.user", (getattr(request, "claims", None) or {}).get("username"))
+            end_trace(handle, error=f"{type(exc).__name__}: {exc}" if exc else None)
+
+    return True
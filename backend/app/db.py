@@ -1,44 +1,225 @@
 # backend/app/db.py
-from contextlib import contextmanager
-from typing import Optional, Tuple
-from psycopg_pool import ConnectionPool
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
 from .config import Settings
+from .core.stmt_stats import app_user_scope, cursor_factory
+from .core import tracing
 
-# Pool (psycopg3)
+log = logging.getLogger(__name__)
+
+# Errores de adquisición que la app traduce a 503 (ver create_app)
+POOL_BUSY_ERRORS = (PoolTimeout, TooManyRequests)
+
+def pool_kwargs(conninfo: Optional[str] = None, async_: bool = False) -> dict:
+    """Parámetros comunes del pool (también los usa el pool async de db_async)."""
+    kwargs = {
+        "connect_timeout": Settings.DB_CONNECT_TIMEOUT,
+        "prepare_threshold": Settings.DB_PREPARE_THRESHOLD,
+    }
+    factory = cursor_factory(async_)
+    if factory is not None:
+        kwargs["cursor_factory"] = factory   # conteo de sentencias (app.core.stmt_stats)
+    return dict(
+        conninfo=conninfo or Settings.DATABASE_URL,
+        min_size=Settings.DB_POOL_MIN_SIZE,
+        max_size=max(Settings.DB_POOL_MIN_SIZE, Settings.DB_POOL_MAX_SIZE),
+        timeout=Settings.DB_POOL_TIMEOUT,
+        max_waiting=Settings.DB_POOL_MAX_WAITING,
+        max_idle=Settings.DB_POOL_MAX_IDLE,
+        max_lifetime=Settings.DB_POOL_MAX_LIFETIME,
+        kwargs=kwargs,
+    )
+
+# Pool (psycopg3). Se abre en create_app (warmup) o, en scripts sueltos, al primer get_conn.
 pool = ConnectionPool(
-    conninfo=Settings.DATABASE_URL,
-    min_size=1,
-    max_size=10,
-    open=True,
+    **pool_kwargs(),
+    check=ConnectionPool.check_connection if Settings.DB_POOL_CHECK else None,
+    name="inv",
+    open=False,
 )
 
-def _set_app_user_local(cur, username: Optional[str]):
+# Pool de la réplica de lectura (opcional). Puede apuntar a la misma BD para pruebas.
+read_pool: Optional[ConnectionPool] = None
+if Settings.DATABASE_READ_URL:
+    read_pool = ConnectionPool(
+        **pool_kwargs(Settings.DATABASE_READ_URL),
+        check=ConnectionPool.check_connection if Settings.DB_POOL_CHECK else None,
+        name="inv-read",
+        open=False,
+    )
+
+def open_pool(wait: bool = False) -> None:
+    """
+    Abre los pools si están cerrados. Con wait=True espera a tener min_size conexiones
+    (warmup); si la BD no responde a tiempo sólo se registra el aviso.
     """
-    Deja app.user como LOCAL a la transacción actual.
-    Usamos set_config(..., true) para scope local.
+    for p in (pool, read_pool):
+        if p is None:
+            continue
+        if p.closed:
+            p.open()
+        if wait:
+            try:
+                p.wait(timeout=max(Settings.DB_POOL_TIMEOUT, Settings.DB_CONNECT_TIMEOUT))
+            except PoolTimeout:
+                log.warning("Pool %s: warmup sin completar (%s)", p.name, p.get_stats())
+
+def pool_stats() -> dict:
+    """Contadores de psycopg_pool (waiting, usage, errores...) para /health/db."""
+    out = pool.get_stats()
+    if read_pool is not None:
+        out = dict(out, read=dict(read_pool.get_stats(), **replica.snapshot()))
+    return out
+
+
+# ============================================================
+# Ruteo de lecturas a la réplica
+# ============================================================
+# Segundos de atraso de la réplica (0 si está al día o si en realidad es un primario)
+SQL_REPLICA_LAG = """
+  SELECT CASE
+           WHEN NOT pg_is_in_recovery() THEN 0
+           WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+           ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+         END
+"""
+
+class _ReplicaState:
     """
+    Lag medido de la réplica (cacheado DB_READ_LAG_CHECK_INTERVAL seg) y marcas de
+    última escritura por usuario para read-your-writes.
+    Las marcas son por proceso: con varios workers, el lag máximo (DB_READ_MAX_LAG)
+    sigue acotando lo que un usuario puede ver desactualizado. Las comparten
+    get_conn y get_aconn (app.db_async mide el lag con su propio pool).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.last_error: Optional[str] = None
+        self._writes: Dict[str, float] = {}
+
+    def snapshot(self) -> dict:
+        return {"lag_s": self.lag, "healthy": self.healthy, "last_error": self.last_error}
+
+    def mark_write(self, app_user: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._writes[app_user] = now
+            if len(self._writes) > 10000:
+                limite = now - Settings.DB_READ_STICKY_SECONDS
+                self._writes = {u: t for u, t in self._writes.items() if t >= limite}
+
+    def is_sticky(self, app_user: Optional[str]) -> bool:
+        if not app_user:
+            return False
+        t = self._writes.get(app_user)
+        return t is not None and time.monotonic() - t < Settings.DB_READ_STICKY_SECONDS
+
+    def due(self) -> bool:
+        return time.monotonic() - self.checked_at >= Settings.DB_READ_LAG_CHECK_INTERVAL
+
+    def usable(self) -> bool:
+        if self.due():
+            with self._lock:
+                if self.due():
+                    self._measure()
+        return self.healthy
+
+    def _measure(self) -> None:
+        try:
+            with read_pool.connection(timeout=1.0) as conn:
+                row = conn.execute(SQL_REPLICA_LAG).fetchone()
+            self.set_lag(row[0])
+        except Exception as e:
+            self.set_error(e)
+
+    def set_lag(self, lag) -> None:
+        self.lag = float(lag or 0)
+        self.healthy = self.lag <= Settings.DB_READ_MAX_LAG
+        self.last_error = None
+        self.checked_at = time.monotonic()
+
+    def set_error(self, e: Exception) -> None:
+        self.healthy = False
+        self.last_error = str(e)
+        self.checked_at = time.monotonic()
+        log.warning("Réplica de lectura no disponible, se usa el primario: %s", e)
+
+replica = _ReplicaState()
+
+def _pool_for(app_user: Optional[str], readonly: bool) -> ConnectionPool:
+    if not readonly or read_pool is None:
+        return pool
+    if replica.is_sticky(app_user):
+        return pool
+    return read_pool if replica.usable() else pool
+
+
+def pipeline(conn):
+    """
+    Pipeline mode de psycopg3: las sentencias encoladas dentro del bloque viajan en un
+    solo envío y se sincronizan al primer fetch (o al salir). Usar un cursor por
+    consulta cuyo resultado se lea después. Se desactiva con DB_PIPELINE=false.
+    """
+    return conn.pipeline() if Settings.DB_PIPELINE else nullcontext()
+
+
+def app_user_local_sql(username: Optional[str], readonly: bool = False) -> Optional[Tuple[str, tuple]]:
+    """
+    Sentencia que deja app.user como LOCAL a la transacción actual (None si no
+    hace falta ninguna). Usamos set_config(..., true) para scope local.
+    Con readonly además marca la transacción READ ONLY en el mismo round-trip.
+    """
+    if username and readonly:
+        return ("SELECT set_config('app.user', %s, true), set_config('transaction_read_only', 'on', true);",
+                (username,))
     if username:
-        cur.execute("SELECT set_config('app.user', %s, true);", (username,))
-    else:
-        # Si quisieras limpiar explícitamente:
-        # cur.execute("SELECT set_config('app.user', '', true);")
-        pass
+        return "SELECT set_config('app.user', %s, true);", (username,)
+    if readonly:
+        return "SELECT set_config('transaction_read_only', 'on', true);", ()
+    # Si quisieras limpiar explícitamente:
+    # return "SELECT set_config('app.user', '', true);", ()
+    return None
+
+def _set_app_user_local(cur, username: Optional[str], readonly: bool = False):
+    stmt = app_user_local_sql(username, readonly)
+    if stmt is not None:
+        cur.execute(*stmt)
 
 @contextmanager
-def get_conn(app_user: Optional[str] = None) -> Tuple:
+def get_conn(app_user: Optional[str] = None, readonly: bool = False) -> Tuple:
     """
     Entrega (conn, cur) listo para usar. Maneja commit/rollback automáticamente.
     Si se pasa app_user, se setea 'app.user' LOCAL en la transacción para auditoría.
+    Si no hay conexión libre dentro de DB_POOL_TIMEOUT se lanza PoolTimeout (→ 503).
+
+    readonly=True: transacción READ ONLY; si hay DATABASE_READ_URL se atiende en la
+    réplica salvo que el lag supere DB_READ_MAX_LAG o el usuario haya escrito hace
+    menos de DB_READ_STICKY_SECONDS (read-your-writes).
     """
-    with pool.connection() as conn:
-        cur = conn.cursor()
-        try:
-            if app_user:
-                _set_app_user_local(cur, app_user)
-            yield conn, cur
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            cur.close()
+    if pool.closed:
+        open_pool()
+    target = _pool_for(app_user, readonly)
+    with app_user_scope(app_user), tracing.span("db.conn", pool=target.name, readonly=readonly):
+        t0 = time.time_ns()
+        with target.connection() as conn:
+            tracing.record("db.checkout", t0, pool=target.name)
+            cur = conn.cursor()
+            try:
+                _set_app_user_local(cur, app_user, readonly)
+                yield conn, cur
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+    if app_user and not readonly:
+        replica.mark_write(app_user)
@@ -0,0 +1,94 @@
+# backend/app/db_async.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+from psycopg_pool import AsyncConnectionPool
+from .config import Settings
+from .db import pool_kwargs, app_user_local_sql, replica, SQL_REPLICA_LAG
+from .core.stmt_stats import app_user_scope
+from .core import tracing
+
+# Pool async (psycopg3). Se abre en el lifespan del modo ASGI (necesita event loop),
+# por eso se crea cerrado: importar este módulo desde WSGI no abre conexiones.
+apool = AsyncConnectionPool(
+    **pool_kwargs(async_=True),
+    check=AsyncConnectionPool.check_connection if Settings.DB_POOL_CHECK else None,
+    name="inv-async",
+    open=False,
+)
+
+# Réplica de lectura (opcional), igual que read_pool de app.db
+read_apool: Optional[AsyncConnectionPool] = None
+if Settings.DATABASE_READ_URL:
+    read_apool = AsyncConnectionPool(
+        **pool_kwargs(Settings.DATABASE_READ_URL, async_=True),
+        check=AsyncConnectionPool.check_connection if Settings.DB_POOL_CHECK else None,
+        name="inv-async-read",
+        open=False,
+    )
+
+async def open_apool():
+    await apool.open(wait=True)
+    if read_apool is not None:
+        await read_apool.open(wait=True)
+
+async def close_apool():
+    if read_apool is not None:
+        await read_apool.close()
+    await apool.close()
+
+
+# ============================================================
+# Ruteo de lecturas a la réplica (mismas reglas que app.db._pool_for)
+# ============================================================
+_lag_lock = asyncio.Lock()
+
+async def _replica_usable() -> bool:
+    """Como replica.usable(), pero midiendo el lag sin bloquear el event loop."""
+    if replica.due():
+        async with _lag_lock:
+            if replica.due():
+                try:
+                    async with read_apool.connection(timeout=1.0) as conn:
+                        cur = await conn.execute(SQL_REPLICA_LAG)
+                        row = await cur.fetchone()
+                    replica.set_lag(row[0])
+                except Exception as e:
+                    replica.set_error(e)
+    return replica.healthy
+
+async def _apool_for(app_user: Optional[str], readonly: bool) -> AsyncConnectionPool:
+    if not readonly or read_apool is None:
+        return apool
+    if replica.is_sticky(app_user):
+        return apool
+    return read_apool if await _replica_usable() else apool
+
+@asynccontextmanager
+async def get_aconn(app_user: Optional[str] = None, readonly: bool = False) -> Tuple:
+    """
+    Versión async de app.db.get_conn: entrega (conn, cur) con commit/rollback automático
+    y 'app.user' LOCAL a la transacción si se pasa app_user.
+    readonly=True: transacción READ ONLY, en la réplica con las mismas reglas que
+    get_conn (lag máximo y read-your-writes).
+    """
+    target = await _apool_for(app_user, readonly)
+    with app_user_scope(app_user), tracing.span("db.conn", pool=target.name, readonly=readonly):
+        t0 = time.time_ns()
+        async with target.connection() as conn:
+            tracing.record("db.checkout", t0, pool=target.name)
+            cur = conn.cursor()
+            try:
+                stmt = app_user_local_sql(app_user, readonly)
+                if stmt is not None:
+                    await cur.execute(*stmt)
+                yield conn, cur
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            finally:
+                await cur.close()
+    if app_user and not readonly:
+        replica.mark_write(app_user)
@@ -0,0 +1,236 @@
+# backend/app/jobs/particiones_job.py
+"""
+Mantenimiento de las tablas particionadas por mes (migrations/0002):
+inv.movimientos (mov_fecha) e inv.audit_log (created_at).
+
+- ensure_future_partitions(): crea las particiones de los próximos
+  PARTITION_PREMAKE_MONTHS meses (inv.fn_crear_particiones_mes).
+- apply_retention(): los meses anteriores a PARTITION_RETENTION_MONTHS se
+  separan (DETACH, sólo metadatos) y, con PARTITION_ARCHIVE=true, se vuelcan a
+  <archivo>/<tabla>/<particion>.csv.gz con COPY y se eliminan (DROP). Con
+  PARTITION_ARCHIVE=false quedan separadas (fuera de las consultas) para que
+  un DBA las mueva.
+- Una partición separada que no llegó a archivarse (p.ej. error de disco) se
+  retoma en la siguiente corrida.
+- Préstamos abiertos: el préstamo activo de un ítem es su último TRASLADO. Si
+  está en un mes que se separa, se copia a inv.traslados_retenidos (0006) en la
+  misma transacción del DETACH (y otra vez antes del DROP); las consultas de
+  préstamos leen inv.vw_traslados. Sin esa tabla no se separa ninguna
+  partición de movimientos. Los retenidos que un TRASLADO más nuevo deja
+  obsoletos se borran al inicio de cada corrida.
+
+Se ejecuta con `flask particiones mantener` (cron) o POST /api/admin/jobs/particiones.
+"""
+import datetime
+import gzip
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from app.config import Settings
+from app.db import get_conn
+
+log = logging.getLogger(__name__)
+
+TABLAS = {"movimientos": "mov_fecha", "audit_log": "created_at"}
+_RX_MES = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def _mes_de(nombre: str) -> Optional[datetime.date]:
+    m = _RX_MES.search(nombre)
+    return datetime.date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def _sumar_meses(d: datetime.date, n: int) -> datetime.date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return datetime.date(d.year + y, m + 1, 1)
+
+
+def _corte(hoy: Optional[datetime.date] = None) -> Optional[datetime.date]:
+    """Primer mes que se conserva; None = sin retención."""
+    if Settings.PARTITION_RETENTION_MONTHS <= 0:
+        return None
+    hoy = hoy or datetime.date.today()
+    return _sumar_meses(hoy.replace(day=1), -Settings.PARTITION_RETENTION_MONTHS)
+
+
+def _es_particionada(cur, tabla: str) -> bool:
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (f"inv.{tabla}",),
+    )
+    return bool(cur.fetchone()[0])
+
+
+# ============================================================
+# Listado
+# ============================================================
+def list_partitions(app_user: str = "system") -> Dict[str, List[Dict[str, Any]]]:
+    """{tabla: [{nombre, mes, adjunta, filas_estimadas, bytes}]} incluidas las separadas pendientes."""
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        for tabla in TABLAS:
+            cur.execute("""
+              SELECT c.relname, c.relispartition, GREATEST(c.reltuples, 0)::bigint,
+                     pg_total_relation_size(c.oid)
+              FROM pg_class c
+              JOIN pg_namespace n ON n.oid = c.relnamespace
+              WHERE n.nspname = 'inv' AND c.relkind = 'r'
+                AND c.relname ~ ('^' || %s || '_p([0-9]{6}|default)$')
+              ORDER BY c.relname
+            """, (tabla,))
+            out[tabla] = [
+                {
+                    "nombre": r[0],
+                    "mes": _mes_de(r[0]),
+                    "adjunta": bool(r[1]),
+                    "filas_estimadas": int(r[2]),
+                    "bytes": int(r[3]),
+                }
+                for r in cur.fetchall()
+            ]
+    return out
+
+
+# ============================================================
+# Particiones futuras
+# ============================================================
+def ensure_future_partitions(app_user: str = "system", meses: Optional[int] = None) -> Dict[str, int]:
+    """Crea las particiones que falten hasta hoy + meses; {tabla: creadas}."""
+    meses = Settings.PARTITION_PREMAKE_MONTHS if meses is None else meses
+    hasta = _sumar_meses(datetime.date.today().replace(day=1), max(0, meses))
+    creadas: Dict[str, int] = {}
+    with get_conn(app_user) as (conn, cur):
+        for tabla in TABLAS:
+            if not _es_particionada(cur, tabla):
+                log.warning("inv.%s no está particionada (falta migrations/0002)", tabla)
+                continue
+            cur.execute("SELECT inv.fn_crear_particiones_mes(%s, current_date, %s)", (tabla, hasta))
+            creadas[tabla] = int(cur.fetchone()[0])
+    return creadas
+
+
+# ============================================================
+# Retención
+# ============================================================
+def _archivar(cur, nombre: str, destino: str) -> int:
+    """COPY de la partición a destino (.csv.gz); escribe en .tmp y renombra al final."""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tmp = destino + ".tmp"
+    size = 0
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        with cur.copy(f"COPY inv.{nombre} TO STDOUT (FORMAT csv, HEADER)") as cp:
+            for data in cp:
+                f.write(data)
+                size += len(data)
+    os.replace(tmp, destino)
+    return size
+
+
+_SQL_RETENER_TRASLADOS = """
+    INSERT INTO inv.traslados_retenidos(mov_id, mov_item_id, mov_fecha, mov_origen_area_id,
+                                        mov_destino_area_id, mov_equipo_id, mov_detalle)
+    SELECT t.mov_id, t.mov_item_id, t.mov_fecha, t.mov_origen_area_id,
+           t.mov_destino_area_id, t.mov_equipo_id, t.mov_detalle
+      FROM (
+        SELECT DISTINCT ON (p.mov_item_id) p.*
+          FROM inv.{nombre} p
+         WHERE p.mov_tipo = 'TRASLADO' AND p.mov_item_id IS NOT NULL
+         ORDER BY p.mov_item_id, p.mov_id DESC
+      ) t
+     WHERE COALESCE((t.mov_detalle->>'es_prestamo')::boolean, false)
+       AND NOT EXISTS (SELECT 1 FROM inv.vw_traslados n
+                        WHERE n.mov_item_id = t.mov_item_id AND n.mov_id > t.mov_id)
+    ON CONFLICT (mov_id) DO NOTHING
+"""
+
+_SQL_PURGAR_RETENIDOS = """
+    DELETE FROM inv.traslados_retenidos r
+     WHERE EXISTS (SELECT 1 FROM inv.movimientos m
+                    WHERE m.mov_item_id = r.mov_item_id AND m.mov_tipo = 'TRASLADO'
+                      AND m.mov_id > r.mov_id)
+"""
+
+
+def _retener_traslados(cur, tabla: str, nombre: str) -> int:
+    """Copia a inv.traslados_retenidos los préstamos abiertos de la partición (sólo movimientos)."""
+    if tabla != "movimientos":
+        return 0
+    cur.execute(_SQL_RETENER_TRASLADOS.format(nombre=nombre))
+    return cur.rowcount
+
+
+def apply_retention(
+    archive_dir: str,
+    app_user: str = "system",
+    dry_run: bool = False,
+    hoy: Optional[datetime.date] = None,
+) -> Dict[str, Any]:
+    """
+    Separa/archiva/elimina las particiones de meses anteriores al corte.
+    Cada partición va en sus propias transacciones: un fallo deja las demás
+    procesadas y la partición afectada separada para la próxima corrida.
+    """
+    corte = _corte(hoy)
+    res: Dict[str, Any] = {"corte": corte, "dry_run": dry_run, "particiones": [], "errores": []}
+    if corte is None:
+        return res
+
+    vencidas = []
+    for tabla, parts in list_partitions(app_user).items():
+        for p in parts:
+            # sin archivo, las ya separadas quedan para el DBA
+            if p["mes"] is not None and p["mes"] < corte and (p["adjunta"] or Settings.PARTITION_ARCHIVE):
+                vencidas.append((tabla, p))
+    if dry_run:
+        res["particiones"] = [{"tabla": t, **p} for t, p in vencidas]
+        return res
+
+    if any(t == "movimientos" for t, _ in vencidas):
+        try:
+            with get_conn(app_user) as (conn, cur):
+                cur.execute(_SQL_PURGAR_RETENIDOS)
+                res["retenidos_purgados"] = cur.rowcount
+        except Exception as e:
+            log.exception("Retención: no se pudieron purgar los traslados retenidos")
+            res["errores"].append({"tabla": "traslados_retenidos", "nombre": None, "paso": "purga", "error": str(e)})
+
+    for tabla, p in vencidas:
+        nombre = p["nombre"]
+        paso = "detach"
+        try:
+            info: Dict[str, Any] = {"tabla": tabla, "nombre": nombre, "mes": p["mes"], "accion": "detach"}
+            if p["adjunta"]:
+                with get_conn(app_user) as (conn, cur):
+                    cur.execute("SELECT set_config('lock_timeout', %s, true)",
+                                (f"{int(Settings.PARTITION_LOCK_TIMEOUT * 1000)}ms",))
+                    # préstamos abiertos: se copian antes de que el mes salga de las consultas
+                    info["traslados_retenidos"] = _retener_traslados(cur, tabla, nombre)
+                    cur.execute(f"ALTER TABLE inv.{tabla} DETACH PARTITION inv.{nombre}")
+            if Settings.PARTITION_ARCHIVE:
+                paso = "archivo"
+                destino = os.path.join(archive_dir, tabla, f"{nombre}.csv.gz")
+                with get_conn(app_user) as (conn, cur):
+                    info["bytes_csv"] = _archivar(cur, nombre, destino)
+                paso = "drop"
+                with get_conn(app_user) as (conn, cur):
+                    # separada en una corrida anterior (o sin el paso de arriba): otra vez antes de borrar
+                    info["traslados_retenidos"] = info.get("traslados_retenidos", 0) + _retener_traslados(cur, tabla, nombre)
+                    cur.execute(f"DROP TABLE inv.{nombre}")
+                info.update(accion="archivada", archivo=destino)
+            res["particiones"].append(info)
+            log.info("Retención %s: %s", nombre, info["accion"])
+        except Exception as e:
+            log.exception("Retención %s falló en %s", nombre, paso)
+            res["errores"].append({"tabla": tabla, "nombre": nombre, "paso": paso, "error": str(e)})
+    return res
+
+
+def archive_dir_for(instance_path: str) -> str:
+    return Settings.PARTITION_ARCHIVE_DIR or os.path.join(instance_path, "archive")
+
+
+def run_maintenance(archive_dir: str, app_user: str = "system", dry_run: bool = False) -> Dict[str, Any]:
+    creadas = {} if dry_run else ensure_future_partitions(app_user)
+    return {"creadas": creadas, "retencion": apply_retention(archive_dir, app_user, dry_run=dry_run)}
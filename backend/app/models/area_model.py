@@ -1,35 +1,71 @@
 # app/models/area_model.py
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 from app.db import get_conn
+from app.db_async import get_aconn
+from app.models.item_model import fichas_por_ids
+from app.core.date_range import date_range
 
 # -------------------------
 # Lecturas básicas de áreas
 # -------------------------
 
-def list_areas(app_user: Optional[str]):
-    SQL = """
+_SQL_LIST_AREAS = """
     SELECT area_id, area_nombre, area_padre_id
     FROM inv.areas
     ORDER BY COALESCE(area_padre_id, 0), lower(area_nombre)
-    """
-    with get_conn(app_user) as (conn, cur):
-        cur.execute(SQL)
+"""
+
+_SQL_LIST_ROOT_AREAS = """
+    SELECT area_id, area_nombre
+    FROM inv.areas
+    WHERE area_padre_id IS NULL
+    ORDER BY lower(area_nombre)
+"""
+
+
+# Sello de versión (ETag de /api/areas): contador que suben los triggers de
+# inv.areas en cada alta, baja o update (migración 0005); sólo crece
+_SQL_AREAS_VERSION = """
+    SELECT version FROM inv.catalogo_versiones WHERE tabla = 'areas'
+"""
+
+
+def areas_version(app_user: Optional[str]) -> str:
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_SQL_AREAS_VERSION, prepare=True)
+        r = cur.fetchone()
+    return str(r[0] if r else 0)
+
+
+def list_areas(app_user: Optional[str]):
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_SQL_LIST_AREAS)
         rows = cur.fetchall()
     return [{"id": r[0], "nombre": r[1], "padre_id": r[2]} for r in rows]
 
 
 def list_root_areas(app_user: Optional[str]):
-    with get_conn(app_user) as (conn, cur):
-        cur.execute("""
-            SELECT area_id, area_nombre
-            FROM inv.areas
-            WHERE area_padre_id IS NULL
-            ORDER BY lower(area_nombre)
-        """)
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_SQL_LIST_ROOT_AREAS)
         rows = cur.fetchall()
     return [{"id": r[0], "nombre": r[1]} for r in rows]
 
 
+# Variantes async (modo ASGI, ver app/asgi.py)
+async def list_areas_async(app_user: Optional[str]):
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(_SQL_LIST_AREAS)
+        rows = await cur.fetchall()
+    return [{"id": r[0], "nombre": r[1], "padre_id": r[2]} for r in rows]
+
+
+async def list_root_areas_async(app_user: Optional[str]):
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(_SQL_LIST_ROOT_AREAS)
+        rows = await cur.fetchall()
+    return [{"id": r[0], "nombre": r[1]} for r in rows]
+
+
 def list_area_items(
     app_user: str,
     area_id: int,
@@ -40,13 +76,18 @@ def list_area_items(
     tipo_nombre: Optional[str] = None,
     fecha_desde: Optional[str] = None,
     fecha_hasta: Optional[str] = None,
+    fields: Tuple[str, ...] = (),
 ):
     """
     Devuelve:
-      A) Ítems propios del área (v.area_id = area_id). Si están EN_USO_PRESTADO,
+      A) Ítems propios del área (i.area_id = area_id). Si están EN_USO_PRESTADO,
          arma 'prestamo_text' = 'a {destino} · PC-xxx' y puede_devolver = TRUE.
       B) Ítems prestados que este área está usando (estado PRESTAMO) detectados por
          equipos.equipo_area_id = area_id (destino). Arma 'prestamo_text' = 'de {origen} · PC-xxx'.
+
+    La grilla sale de las tablas base (items + item_tipos). 'ficha'/'fotos' sólo
+    se incluyen si vienen en fields, y se piden a la vista únicamente para los
+    ítems de la página.
     """
     p = max(1, int(page or 1))
     s = min(100, max(1, int(size or 10)))
@@ -56,38 +97,33 @@ def list_area_items(
     params_common: List[Any] = []
 
     if clase:
-        filtros.append("v.clase = %s")
+        filtros.append("it.clase = %s")
         params_common.append(clase)
 
     if estado:
-        filtros.append("v.estado = %s")
+        filtros.append("i.estado = %s")
         params_common.append(estado)
 
     if tipo_nombre:
-        filtros.append("lower(v.tipo) = lower(%s)")
+        filtros.append("lower(it.nombre) = lower(%s)")
         params_common.append(tipo_nombre)
 
-    if fecha_desde:
-        filtros.append("v.created_at::date >= %s::date")
-        params_common.append(fecha_desde)
-
-    if fecha_hasta:
-        filtros.append("v.created_at::date <= %s::date")
-        params_common.append(fecha_hasta)
+    rango, rango_params = date_range("i.creado_en", fecha_desde, fecha_hasta)
+    filtros.extend(rango)
+    params_common.extend(rango_params)
 
     where_extra = (" AND " + " AND ".join(filtros)) if filtros else ""
 
     select_cols = """
-      v.item_id,
-      v.item_codigo,
-      v.clase,
-      v.tipo,
-      v.estado,
-      v.created_at,
+      i.item_id,
+      i.item_codigo,
+      it.clase,
+      it.nombre    AS tipo,
+      i.estado,
+      i.creado_en  AS created_at,
       e.equipo_id,
       e.equipo_codigo,
       e.equipo_nombre,
-      v.ficha,
       ao.area_id   AS origen_area_id,
       ao.area_nombre AS origen_area_nombre,
       ea.area_id   AS destino_area_id,
@@ -96,10 +132,11 @@ def list_area_items(
 
     # 🔧 FIX: usar e.equipo_area_id (no existe e.area_id)
     from_joins = """
-      FROM inv.vw_items_con_ficha_y_fotos v
-      LEFT JOIN inv.equipo_items ei ON ei.item_id = v.item_id
+      FROM inv.items i
+      JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
+      LEFT JOIN inv.equipo_items ei ON ei.item_id = i.item_id
       LEFT JOIN inv.equipos      e  ON e.equipo_id = ei.equipo_id
-      LEFT JOIN inv.areas ao ON ao.area_id = v.area_id                -- dueño del ítem
+      LEFT JOIN inv.areas ao ON ao.area_id = i.area_id                -- dueño del ítem
       LEFT JOIN inv.areas ea ON ea.area_id = e.equipo_area_id         -- área del equipo (destino)
     """
 
@@ -109,7 +146,7 @@ def list_area_items(
         {select_cols},
         FALSE AS es_prestamo_recibido,
         CASE
-          WHEN v.estado = 'EN_USO_PRESTADO' THEN
+          WHEN i.estado = 'EN_USO_PRESTADO' THEN
             CONCAT(
               'a ',
               COALESCE(ea.area_nombre, 'otra área'),
@@ -118,11 +155,11 @@ def list_area_items(
           ELSE NULL
         END AS prestamo_text,
         CASE
-          WHEN v.estado = 'EN_USO_PRESTADO' AND v.area_id = %s THEN TRUE
+          WHEN i.estado = 'EN_USO_PRESTADO' AND i.area_id = %s THEN TRUE
           ELSE FALSE
         END AS puede_devolver
       {from_joins}
-      WHERE v.area_id = %s
+      WHERE i.area_id = %s
       {where_extra}
     """
     params_propios = [area_id, area_id] + params_common
@@ -134,7 +171,7 @@ def list_area_items(
         {select_cols},
         TRUE AS es_prestamo_recibido,
         CASE
-          WHEN v.estado = 'PRESTAMO' THEN
+          WHEN i.estado = 'PRESTAMO' THEN
             CONCAT(
               'de ',
               COALESCE(ao.area_nombre, 'otra área'),
@@ -144,9 +181,9 @@ def list_area_items(
         END AS prestamo_text,
         FALSE AS puede_devolver
       {from_joins}
-      WHERE v.estado = 'PRESTAMO'
+      WHERE i.estado = 'PRESTAMO'
         AND e.equipo_area_id = %s
-        AND v.area_id <> %s
+        AND i.area_id <> %s
       {where_extra}
     """
     params_recibidos = [area_id, area_id] + params_common
@@ -174,22 +211,24 @@ def list_area_items(
     """
     params = params_propios + params_recibidos + [s, off]
 
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(sql_union, params)
         rows = cur.fetchall()
+        # ficha/fotos sólo de los ítems de esta página (una consulta)
+        extra = fichas_por_ids(cur, [r[0] for r in rows], fields) if fields else {}
 
     IDX = {
         "item_id": 0, "item_codigo": 1, "clase": 2, "tipo": 3, "estado": 4, "created_at": 5,
-        "equipo_id": 6, "equipo_codigo": 7, "equipo_nombre": 8, "ficha": 9,
-        "origen_area_id":10, "origen_area_nombre":11, "destino_area_id":12, "destino_area_nombre":13,
-        "es_prestamo_recibido":14, "prestamo_text":15, "puede_devolver":16, "total_rows":17
+        "equipo_id": 6, "equipo_codigo": 7, "equipo_nombre": 8,
+        "origen_area_id": 9, "origen_area_nombre": 10, "destino_area_id": 11, "destino_area_nombre": 12,
+        "es_prestamo_recibido": 13, "prestamo_text": 14, "puede_devolver": 15, "total_rows": 16
     }
 
     items: List[Dict[str, Any]] = []
     total = 0
     for r in rows:
         total = r[IDX["total_rows"]]
-        items.append({
+        it = {
             "item_id": r[IDX["item_id"]],
             "item_codigo": r[IDX["item_codigo"]],
             "clase": r[IDX["clase"]],
@@ -201,11 +240,13 @@ def list_area_items(
                 "equipo_codigo": r[IDX["equipo_codigo"]],
                 "equipo_nombre": r[IDX["equipo_nombre"]],
             },
-            "ficha": r[IDX["ficha"]] or {},
             "prestamo_text": r[IDX["prestamo_text"]],
             "puede_devolver": bool(r[IDX["puede_devolver"]]),
             "es_prestamo_recibido": bool(r[IDX["es_prestamo_recibido"]]),
-        })
+        }
+        if fields:
+            it.update(extra.get(r[IDX["item_id"]]) or {f: ({} if f == "ficha" else []) for f in fields})
+        items.append(it)
 
     return {"items": items, "total": int(total or 0), "page": p, "size": s}
 
@@ -261,7 +302,7 @@ def create_sub_area(app_user: str, nombre: str, padre_id: int) -> int:
 
 
 def get_area_info(app_user: str, area_id: int):
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute("SELECT area_id, area_nombre, area_padre_id FROM inv.areas WHERE area_id=%s", (area_id,))
         a = cur.fetchone()
         if not a:
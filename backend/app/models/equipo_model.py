@@ -1,7 +1,14 @@
 from typing import List, Dict, Any, Optional, Tuple
 from json import dumps
-from app.db import get_conn
-from app.models.user_model import ensure_user_for_equipo  # crea/actualiza usuario rol USUARIO
+from psycopg.types.json import Json
+from app.db import get_conn, pipeline
+from app.models.user_model import (  # crea/actualiza usuario rol USUARIO
+    ensure_user_for_equipo, ensure_users_for_equipos, clave_guardada, preparar_clave_equipo,
+    claves_guardadas, preparar_claves_equipos,
+)
+from app.core.passwords import PasswordBusy
+from app.core.fotos import normalize_fotos
+from app.core.date_range import date_range_sql
 
 # ============================================================
 # LISTADOS DE EQUIPOS (compatibilidad + paginado)
@@ -20,7 +27,7 @@ def list_area_equipos(app_user: str, area_id: int) -> List[Dict[str, Any]]:
     WHERE e.equipo_area_id = %s
     ORDER BY lower(e.equipo_codigo), e.equipo_id
     """
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, (area_id,))
         rows = cur.fetchall()
     out: List[Dict[str, Any]] = []
@@ -69,13 +76,9 @@ def list_area_equipos_paged(
         sql += " AND e.equipo_estado = %s"
         params.append(estado.upper())
 
-    if fecha_desde:
-        sql += " AND e.created_at::date >= %s::date"
-        params.append(fecha_desde)
-
-    if fecha_hasta:
-        sql += " AND e.created_at::date <= %s::date"
-        params.append(fecha_hasta)
+    rango, rango_params = date_range_sql("e.created_at", fecha_desde, fecha_hasta)
+    sql += rango
+    params.extend(rango_params)
 
     sql += """
       ORDER BY e.created_at DESC, lower(e.equipo_codigo)
@@ -83,7 +86,7 @@ def list_area_equipos_paged(
     """
     params.extend([s, off])
 
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(sql, params)
         rows = cur.fetchall()
 
@@ -122,7 +125,7 @@ def get_equipo_header(app_user: str, equipo_id: int) -> Optional[Dict[str, Any]]
       FROM inv.equipos e
       WHERE e.equipo_id=%s
     """
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, (equipo_id,))
         r = cur.fetchone()
         if not r:
@@ -141,33 +144,111 @@ def get_equipo_header(app_user: str, equipo_id: int) -> Optional[Dict[str, Any]]
     }
 
 
-def get_equipo_detalle(app_user: str, equipo_id: int) -> Optional[Dict[str, Any]]:
-    SQL = """
-      SELECT i.item_id, i.item_codigo, it.clase, it.nombre AS tipo, i.estado
-      FROM inv.equipo_items ei
-      JOIN inv.items i       ON i.item_id = ei.item_id
-      JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
-      WHERE ei.equipo_id = %s
-      ORDER BY CASE WHEN it.clase='COMPONENTE' THEN 0 ELSE 1 END,
-               lower(it.nombre), lower(i.item_codigo)
+EQUIPO_EXPAND = ("ficha", "fotos", "prestamo")
+
+
+def parse_expand(raw: Optional[str]) -> Tuple[str, ...]:
+    """'ficha,prestamo' | 'all' -> tupla de EQUIPO_EXPAND."""
+    pedidos = {x.strip().lower() for x in (raw or "").split(",") if x.strip()}
+    if "all" in pedidos:
+        return EQUIPO_EXPAND
+    return tuple(x for x in EQUIPO_EXPAND if x in pedidos)
+
+
+def _equipo_detalle_sql(expand: Tuple[str, ...]) -> str:
+    """
+    Cabecera + ítems (json_agg) en una sola consulta. Según expand se agregan
+    la ficha/fotos de cada ítem (vista, sólo para los ítems del equipo) y el
+    préstamo activo (último TRASLADO con es_prestamo).
+    """
+    campos = [
+        "'item_id', i.item_id",
+        "'item_codigo', i.item_codigo",
+        "'clase', it.clase",
+        "'tipo', it.nombre",
+        "'estado', i.estado",
+    ]
+    joins = []
+    if "ficha" in expand or "fotos" in expand:
+        joins.append("LEFT JOIN inv.vw_items_con_ficha_y_fotos v ON v.item_id = i.item_id")
+        if "ficha" in expand:
+            campos.append("'ficha', COALESCE(v.ficha, '{}')")
+        if "fotos" in expand:
+            campos.append("'fotos', v.fotos")
+    if "prestamo" in expand:
+        joins.append("""
+          LEFT JOIN LATERAL (
+            SELECT m.mov_id, m.mov_origen_area_id, m.mov_destino_area_id,
+                   COALESCE((m.mov_detalle->>'es_prestamo')::boolean, false) AS es_prestamo
+              FROM inv.vw_traslados m
+             WHERE m.mov_item_id = i.item_id
+             ORDER BY m.mov_id DESC
+             LIMIT 1
+          ) l ON true
+          LEFT JOIN inv.areas lo ON lo.area_id = l.mov_origen_area_id
+          LEFT JOIN inv.areas ld ON ld.area_id = l.mov_destino_area_id""")
+        campos.append("""'prestamo', CASE WHEN l.es_prestamo THEN json_build_object(
+            'mov_id', l.mov_id,
+            'origen_area_id', l.mov_origen_area_id, 'origen_area_nombre', lo.area_nombre,
+            'destino_area_id', l.mov_destino_area_id, 'destino_area_nombre', ld.area_nombre
+          ) END""")
+
+    return f"""
+      SELECT
+        e.equipo_id,
+        e.equipo_codigo,
+        e.equipo_nombre,
+        e.equipo_area_id AS area_id,
+        e.equipo_estado,
+        e.equipo_usuario_final,
+        e.equipo_login,
+        e.equipo_password,
+        e.created_at,
+        e.updated_at,
+        (
+          SELECT COALESCE(json_agg(json_build_object({', '.join(campos)})
+                   ORDER BY CASE WHEN it.clase='COMPONENTE' THEN 0 ELSE 1 END,
+                            lower(it.nombre), lower(i.item_codigo)), '[]'::json)
+            FROM inv.equipo_items ei
+            JOIN inv.items i       ON i.item_id = ei.item_id
+            JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
+            {' '.join(joins)}
+           WHERE ei.equipo_id = e.equipo_id
+        ) AS items
+      FROM inv.equipos e
+      WHERE e.equipo_id = %s
+    """
+
+
+def get_equipo_detalle(app_user: str, equipo_id: int, expand: Tuple[str, ...] = ()) -> Optional[Dict[str, Any]]:
+    """
+    Cabecera + ítems del equipo en un solo round-trip.
+    expand: ("ficha", "fotos", "prestamo") agrega esos datos a cada ítem.
     """
-    header = get_equipo_header(app_user, equipo_id)
-    if not header:
+    expand = tuple(x for x in EQUIPO_EXPAND if x in expand)
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_equipo_detalle_sql(expand), (equipo_id,), prepare=True)
+        r = cur.fetchone()
+    if not r:
         return None
-    with get_conn(app_user) as (conn, cur):
-        cur.execute(SQL, (equipo_id,))
-        rows = cur.fetchall()
-    items = []
-    for r in rows:
-        items.append({
-            "item_id": r[0],
-            "item_codigo": r[1],
-            "clase": r[2],
-            "tipo": r[3],
-            "estado": r[4],
-        })
-    header["items"] = items
-    return header
+
+    items = r[10] or []
+    if "fotos" in expand:
+        for it in items:
+            it["fotos"] = normalize_fotos(it.get("fotos") or [])
+    return {
+        "equipo_id": r[0],
+        "equipo_codigo": r[1],
+        "equipo_nombre": r[2],
+        "area_id": r[3],
+        "estado": r[4],
+        "usuario_final": r[5],
+        "login": r[6],
+        "password": r[7],
+        "created_at": r[8],
+        "updated_at": r[9],
+        "items": items,
+    }
 
 
 # ============================================================
@@ -186,37 +267,39 @@ def list_items_disponibles(
     s = min(100, max(1, int(size or 10)))
     off = (p - 1) * s
 
+    # tablas base: la vista agrega ficha/fotos que acá no se usan
     SQL = """
       SELECT
-        v.item_id,
-        v.item_codigo,
-        v.clase,
-        v.tipo,
-        v.estado,
-        v.created_at,
+        i.item_id,
+        i.item_codigo,
+        it.clase,
+        it.nombre   AS tipo,
+        i.estado,
+        i.creado_en AS created_at,
         COUNT(*) OVER() AS total_rows
-      FROM inv.vw_items_con_ficha_y_fotos v
-      WHERE v.area_id = %s
-        AND v.clase   = %s
-        AND v.estado  = 'ALMACEN'
+      FROM inv.items i
+      JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
+      WHERE i.area_id = %s
+        AND it.clase  = %s
+        AND i.estado  = 'ALMACEN'
     """
     params = [area_id, clase]
 
     if tipo_nombre:
-        SQL += " AND lower(v.tipo) = lower(%s)"
+        SQL += " AND lower(it.nombre) = lower(%s)"
         params.append(tipo_nombre)
 
     if q:
-        SQL += " AND v.item_codigo ILIKE %s"
+        SQL += " AND i.item_codigo ILIKE %s"
         params.append(f"%{q}%")
 
     SQL += """
-      ORDER BY lower(v.tipo), v.item_codigo
+      ORDER BY lower(it.nombre), i.item_codigo
       LIMIT %s OFFSET %s
     """
     params.extend([s, off])
 
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, params)
         rows = cur.fetchall()
 
@@ -266,8 +349,8 @@ def create_equipo_con_items(
 
         equipo_id = int(cur.fetchone()[0])
 
-        # === usuario de equipo (rol USUARIO, sin duplicar) ===
-        ensure_user_for_equipo(app_user, login, password, area_id)
+        # === usuario de equipo (rol USUARIO, sin duplicar) en la misma transacción ===
+        ensure_user_for_equipo(app_user, login, password, area_id, cur=cur)
 
         for it in items:
             item_id = int(it.get("item_id"))
@@ -283,18 +366,7 @@ def create_equipo_con_items(
                 return None, f"Item {item_id} no está en ALMACEN (actual={r[1]})"
 
             # si existe SP, usarlo; si no, fallback
-            try:
-                cur.execute("""
-                  SELECT 1
-                    FROM pg_proc
-                   WHERE proname='sp_asignar_item_a_equipo'
-                     AND pronamespace = 'inv'::regnamespace
-                """)
-                exists = cur.fetchone() is not None
-            except Exception:
-                exists = False
-
-            if exists:
+            if _sp_asignar_existe(cur):
                 cur.execute("CALL inv.sp_asignar_item_a_equipo(%s,%s,%s)", (equipo_id, item_id, slot))
             else:
                 cur.execute("""
@@ -312,106 +384,350 @@ def create_equipo_con_items(
                     %s
                   )
                 """, (item_id, area_id, area_id, equipo_id,
-                      None if slot is None else {'slot': slot}))
+                      None if slot is None else Json({'slot': slot})))
 
         return equipo_id, None
 
 
+def _sp_asignar_existe(cur) -> bool:
+    """¿Está instalado inv.sp_asignar_item_a_equipo? (alta simple y alta en lote lo usan igual)"""
+    cur.execute("""
+        SELECT EXISTS (
+          SELECT 1
+            FROM pg_proc
+           WHERE proname='sp_asignar_item_a_equipo'
+             AND pronamespace = 'inv'::regnamespace
+        )
+    """)
+    return bool(cur.fetchone()[0])
+
+
 # ============================================================
-# ASIGNAR / RETIRAR ITEM DEL EQUIPO
+# CREAR EQUIPOS EN LOTE (laboratorios) — una sola transacción
 # ============================================================
-def assign_item_to_equipo(
+LOTE_MAX_EQUIPOS = 200
+
+
+def _render_patron(patron: Optional[str], codigo: str, n: int, num: int) -> Optional[str]:
+    """
+    Reemplaza {codigo}, {n} (1..cantidad dentro del lote) y {num} (sufijo numérico
+    del código) en el patrón. Sin patrón devuelve None.
+    """
+    if not patron:
+        return None
+    return (patron.replace("{codigo}", codigo)
+                  .replace("{n}", str(n))
+                  .replace("{num}", str(num)))
+
+
+def _numeracion_lote(pref: str, base_num: int, n_eq: int, pad: int) -> List[Tuple[int, int, str]]:
+    """[(n, num, codigo), ...] de los equipos del lote a partir del mayor sufijo actual."""
+    return [(n, base_num + n, _format_equipo_code(pref, base_num + n, pad)) for n in range(1, n_eq + 1)]
+
+
+def create_equipos_en_lote(
     app_user: str,
-    equipo_id: int,
-    item_id: int,
-    slot: Optional[str] = None,
-) -> Tuple[bool, Optional[str]]:
+    area_id: int,
+    cantidad: int,
+    nombre_patron: str,
+    prefix: Optional[str] = None,
+    pad: int = 3,
+    estado: str = "USO",
+    usuario_final: Optional[str] = None,
+    login_patron: Optional[str] = None,
+    password_patron: Optional[str] = None,
+    items_por_equipo: Optional[List[List[Dict[str, Any]]]] = None,
+    picks: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Crea <cantidad> equipos con la misma plantilla en una sola transacción:
+      - reserva los códigos de una vez (lock por área + MAX del sufijo),
+      - inserta equipos, usuarios y asignaciones con sentencias por conjunto (unnest),
+      - items_por_equipo: [[{item_id, slot}], ...] uno por equipo (opcional),
+      - picks: [{tipo, clase?, cantidad?, slot?}] toma ítems en ALMACEN del área por tipo,
+      - las asignaciones pasan por inv.sp_asignar_item_a_equipo cuando existe, igual
+        que create_equipo_con_items (mismos efectos en BD por ambas vías).
+    Devuelve (resumen, None) u (None, error). Ante error no queda nada creado.
+    """
+    n_eq = int(cantidad or 0)
+    if n_eq < 1 or n_eq > LOTE_MAX_EQUIPOS:
+        return None, f"cantidad debe estar entre 1 y {LOTE_MAX_EQUIPOS}"
+    if not (nombre_patron or "").strip():
+        return None, "nombre (patrón) es requerido"
+    explicitos = items_por_equipo or []
+    if len(explicitos) > n_eq:
+        return None, "items tiene más entradas que equipos a crear"
+    picks = picks or []
+
+    pref = _norm_equipo_prefix(prefix)
+
+    # bcrypt de los usuarios de equipo antes de la transacción (como update_equipo_meta):
+    # no se retienen el lock del área ni los ítems mientras tanto. Los logins salen de
+    # los códigos que tocarían ahora; si otra alta los corre, esas cuentas se
+    # verifican y hashean bajo el lock.
+    claves = None
+    if login_patron:
+        with get_conn(app_user) as (conn, cur):
+            previstas = [
+                (_render_patron(login_patron, codigo, n, num), _render_patron(password_patron, codigo, n, num))
+                for n, num, codigo in _numeracion_lote(pref, _max_equipo_num(cur, area_id, pref), n_eq, pad)
+            ]
+            guardadas = claves_guardadas(cur, [l for l, _ in previstas])
+        claves = preparar_claves_equipos(previstas, guardadas)
+
     with get_conn(app_user) as (conn, cur):
-        cur.execute("SELECT set_config('app.proc', %s, true)", ('equipos.assign_item',))
+        try:
+            cur.execute("SELECT set_config('app.proc', %s, true)", ('equipos.create_lote',))
 
-        cur.execute("SELECT equipo_area_id FROM inv.equipos WHERE equipo_id=%s", (equipo_id,))
-        r = cur.fetchone()
-        if not r:
-            return False, "Equipo no encontrado"
-        equipo_area_id = int(r[0])
+            # 1) Códigos: serializa altas concurrentes del mismo área y reserva el rango
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('inv.equipos.codigo'), %s)", (int(area_id),))
+            base_num = _max_equipo_num(cur, area_id, pref)
 
-        cur.execute("SELECT area_id, estado FROM inv.items WHERE item_id=%s", (item_id,))
-        r = cur.fetchone()
-        if not r:
-            return False, "Item no encontrado"
+            codigos, nombres, logins, passwords = [], [], [], []
+            for n, num, codigo in _numeracion_lote(pref, base_num, n_eq, pad):
+                codigos.append(codigo)
+                nombres.append(_render_patron(nombre_patron, codigo, n, num))
+                logins.append(_render_patron(login_patron, codigo, n, num))
+                passwords.append(_render_patron(password_patron, codigo, n, num))
 
-        cur.execute("SELECT equipo_id FROM inv.equipo_items WHERE item_id=%s", (item_id,))
-        prev = cur.fetchone()
-        if prev:
-            cur.execute("DELETE FROM inv.equipo_items WHERE item_id=%s", (item_id,))
+            # 2) Equipos
+            cur.execute("""
+              INSERT INTO inv.equipos (
+                equipo_codigo, equipo_nombre, equipo_area_id,
+                equipo_estado, equipo_usuario_final, equipo_login, equipo_password
+              )
+              SELECT t.codigo, t.nombre, %s, %s, %s, t.login, t.pwd
+                FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[])
+                     WITH ORDINALITY AS t(codigo, nombre, login, pwd, ord)
+               ORDER BY t.ord
+              RETURNING equipo_id, equipo_codigo
+            """, (area_id, estado, usuario_final, codigos, nombres, logins, passwords))
+            id_por_codigo = {r[1]: int(r[0]) for r in cur.fetchall()}
+            equipo_ids = [id_por_codigo[c] for c in codigos]
+
+            # 3) Ítems explícitos (validados en una sola consulta, bloqueados)
+            asign_eq: List[int] = []
+            asign_item: List[int] = []
+            asign_slot: List[Optional[str]] = []
+            for idx, lista in enumerate(explicitos):
+                for it in lista or []:
+                    asign_eq.append(equipo_ids[idx])
+                    asign_item.append(int(it.get("item_id")))
+                    asign_slot.append(it.get("slot"))
+
+            if len(set(asign_item)) != len(asign_item):
+                conn.rollback()
+                return None, "Hay ítems repetidos en el lote"
+
+            if asign_item:
+                cur.execute("""
+                  SELECT i.item_id, i.area_id, i.estado,
+                         EXISTS (SELECT 1 FROM inv.equipo_items ei WHERE ei.item_id = i.item_id)
+                    FROM inv.items i
+                   WHERE i.item_id = ANY(%s)
+                     FOR UPDATE OF i
+                """, (asign_item,))
+                info = {int(r[0]): r for r in cur.fetchall()}
+                for item_id in asign_item:
+                    r = info.get(item_id)
+                    if not r:
+                        conn.rollback()
+                        return None, f"Item {item_id} no existe"
+                    if r[1] != area_id:
+                        conn.rollback()
+                        return None, f"Item {item_id} pertenece a otra área"
+                    if r[2] != "ALMACEN" or r[3]:
+                        conn.rollback()
+                        return None, f"Item {item_id} no está en ALMACEN (actual={r[2]})"
+
+            # 4) Auto-selección por tipo desde ALMACEN (una consulta por regla)
+            for pk in picks:
+                tipo = (pk.get("tipo") or "").strip()
+                if not tipo:
+                    conn.rollback()
+                    return None, "Cada pick requiere 'tipo'"
+                por_equipo = max(1, int(pk.get("cantidad") or 1))
+                clase = (pk.get("clase") or "").strip().upper() or None
+                necesarios = por_equipo * n_eq
+                cur.execute("""
+                  SELECT i.item_id
+                    FROM inv.items i
+                    JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
+                   WHERE i.area_id = %s
+                     AND i.estado  = 'ALMACEN'
+                     AND lower(it.nombre) = lower(%s)
+                     AND (%s::text IS NULL OR it.clase = %s::text)
+                     AND NOT (i.item_id = ANY(%s::bigint[]))
+                     AND NOT EXISTS (SELECT 1 FROM inv.equipo_items ei WHERE ei.item_id = i.item_id)
+                   ORDER BY i.item_codigo
+                   LIMIT %s
+                     FOR UPDATE OF i SKIP LOCKED
+                """, (area_id, tipo, clase, clase, asign_item, necesarios))
+                libres = [int(r[0]) for r in cur.fetchall()]
+                if len(libres) < necesarios:
+                    conn.rollback()
+                    return None, (f"No hay suficientes ítems '{tipo}' en ALMACEN "
+                                  f"(requeridos={necesarios}, disponibles={len(libres)})")
+                for k, item_id in enumerate(libres):
+                    asign_eq.append(equipo_ids[k // por_equipo])
+                    asign_item.append(item_id)
+                    asign_slot.append(pk.get("slot"))
+
+            # 5) Asignaciones: mismos efectos que create_equipo_con_items. Si existe
+            #    inv.sp_asignar_item_a_equipo se usa (una llamada por ítem, en un solo
+            #    envío); si no, el mismo fallback pero por conjunto.
+            if asign_item and _sp_asignar_existe(cur):
+                cur.executemany("CALL inv.sp_asignar_item_a_equipo(%s,%s,%s)",
+                                list(zip(asign_eq, asign_item, asign_slot)))
+            elif asign_item:
+                cur.execute("""
+                  INSERT INTO inv.equipo_items(equipo_id, item_id, slot_o_ubicacion)
+                  SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::text[])
+                """, (asign_eq, asign_item, asign_slot))
+                cur.execute("UPDATE inv.items SET estado='EN_USO' WHERE item_id = ANY(%s)", (asign_item,))
+                cur.execute("""
+                  INSERT INTO inv.movimientos(
+                    mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+                    mov_equipo_id, mov_usuario_app, mov_detalle
+                  )
+                  SELECT t.item_id, 'ASIGNACION', %s, %s, t.equipo_id,
+                         current_setting('app.user', true),
+                         CASE WHEN t.slot IS NULL THEN NULL ELSE jsonb_build_object('slot', t.slot) END
+                    FROM unnest(%s::bigint[], %s::bigint[], %s::text[]) AS t(equipo_id, item_id, slot)
+                """, (area_id, area_id, asign_eq, asign_item, asign_slot))
+
+            # 6) Usuarios de equipo (rol USUARIO) en la misma transacción, con las claves ya preparadas
+            usuarios = ensure_users_for_equipos(
+                cur, [(l, p, area_id) for l, p in zip(logins, passwords) if l], claves=claves
+            )
+        except PasswordBusy:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            return None, f"No se pudo crear el lote: {e}"
 
-        cur.execute("""
-            INSERT INTO inv.equipo_items(equipo_id, item_id, slot_o_ubicacion)
-            VALUES (%s,%s,%s)
-        """, (equipo_id, item_id, slot))
+    por_equipo_count: Dict[int, int] = {}
+    for eq in asign_eq:
+        por_equipo_count[eq] = por_equipo_count.get(eq, 0) + 1
 
-        active = _get_active_loan(cur, item_id)
-        if active is not None and active[1] == equipo_area_id:
-            cur.execute("UPDATE inv.items SET estado='EN_USO_PRESTADO' WHERE item_id=%s", (item_id,))
-        else:
-            cur.execute("UPDATE inv.items SET estado='EN_USO' WHERE item_id=%s", (item_id,))
+    return {
+        "creados": n_eq,
+        "items_asignados": len(asign_item),
+        "usuarios_creados": usuarios["creados"],
+        "usuarios_actualizados": usuarios["actualizados"],
+        "usuarios_sin_cambios": usuarios["sin_cambios"],
+        "equipos": [
+            {
+                "equipo_id": equipo_ids[i],
+                "equipo_codigo": codigos[i],
+                "equipo_nombre": nombres[i],
+                "login": logins[i],
+                "items": por_equipo_count.get(equipo_ids[i], 0),
+            }
+            for i in range(n_eq)
+        ],
+    }, None
 
-        cur.execute("""
-          INSERT INTO inv.movimientos(
-            mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
-            mov_equipo_id, mov_usuario_app, mov_detalle
-          ) VALUES (
-            %s, 'ASIGNACION', %s, %s, %s, current_setting('app.user', true),
-            %s
-          )
-        """, (item_id, equipo_area_id, equipo_area_id, equipo_id,
-              None if slot is None else {'slot': slot}))
+
+# ============================================================
+# ASIGNAR / RETIRAR ITEM DEL EQUIPO
+# ============================================================
+def assign_item_to_equipo(
+    app_user: str,
+    equipo_id: int,
+    item_id: int,
+    slot: Optional[str] = None,
+) -> Tuple[bool, Optional[str]]:
+    with get_conn(app_user) as (conn, cur):
+        with pipeline(conn):
+            # lecturas independientes: un solo envío
+            c_eq, c_it, c_loan = conn.cursor(), conn.cursor(), conn.cursor()
+            cur.execute(_SQL_SET_PROC, ('equipos.assign_item',), prepare=True)
+            c_eq.execute("SELECT equipo_area_id FROM inv.equipos WHERE equipo_id=%s", (equipo_id,), prepare=True)
+            c_it.execute("SELECT area_id, estado FROM inv.items WHERE item_id=%s", (item_id,), prepare=True)
+            _queue_active_loan(c_loan, item_id)
+
+            r = c_eq.fetchone()
+            if not r:
+                return False, "Equipo no encontrado"
+            equipo_area_id = int(r[0])
+            if not c_it.fetchone():
+                return False, "Item no encontrado"
+            active = _read_active_loan(c_loan)
+
+            # escrituras: otro único envío (el DELETE es no-op si no estaba asignado)
+            estado = ('EN_USO_PRESTADO' if active is not None and active[1] == equipo_area_id
+                      else 'EN_USO')
+            cur.execute("DELETE FROM inv.equipo_items WHERE item_id=%s", (item_id,), prepare=True)
+            cur.execute("""
+                INSERT INTO inv.equipo_items(equipo_id, item_id, slot_o_ubicacion)
+                VALUES (%s,%s,%s)
+            """, (equipo_id, item_id, slot), prepare=True)
+            cur.execute(_SQL_SET_ESTADO, (estado, item_id), prepare=True)
+            cur.execute("""
+              INSERT INTO inv.movimientos(
+                mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+                mov_equipo_id, mov_usuario_app, mov_detalle
+              ) VALUES (
+                %s, 'ASIGNACION', %s, %s, %s, current_setting('app.user', true),
+                %s
+              )
+            """, (item_id, equipo_area_id, equipo_area_id, equipo_id,
+                  None if slot is None else Json({'slot': slot})), prepare=True)
 
         return True, None
 
 
 def unassign_item(app_user: str, equipo_id: int, item_id: int) -> Optional[str]:
     with get_conn(app_user) as (conn, cur):
-        cur.execute("SELECT set_config('app.proc', %s, true)", ('equipos.unassign_item',))
-
-        cur.execute("DELETE FROM inv.equipo_items WHERE equipo_id=%s AND item_id=%s RETURNING 1",
-                    (equipo_id, item_id))
-        if not cur.fetchone():
-            return "El item no estaba asignado"
-
-        active = _get_active_loan(cur, item_id)
-        if active is not None:
-            cur.execute("UPDATE inv.items SET estado='PRESTAMO' WHERE item_id=%s", (item_id,))
-        else:
-            cur.execute("UPDATE inv.items SET estado='ALMACEN' WHERE item_id=%s", (item_id,))
-
-        cur.execute("""
-          INSERT INTO inv.movimientos(
-            mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
-            mov_equipo_id, mov_usuario_app
-          ) SELECT %s, 'RETIRO', e.equipo_area_id, e.equipo_area_id, %s,
-                   current_setting('app.user', true)
-            FROM inv.equipos e WHERE e.equipo_id=%s
-        """, (item_id, equipo_id, equipo_id))
+        with pipeline(conn):
+            c_del, c_loan = conn.cursor(), conn.cursor()
+            cur.execute(_SQL_SET_PROC, ('equipos.unassign_item',), prepare=True)
+            c_del.execute("DELETE FROM inv.equipo_items WHERE equipo_id=%s AND item_id=%s RETURNING 1",
+                          (equipo_id, item_id), prepare=True)
+            _queue_active_loan(c_loan, item_id)
+
+            if not c_del.fetchone():
+                return "El item no estaba asignado"
+            active = _read_active_loan(c_loan)
+
+            cur.execute(_SQL_SET_ESTADO, ('PRESTAMO' if active is not None else 'ALMACEN', item_id),
+                        prepare=True)
+            cur.execute("""
+              INSERT INTO inv.movimientos(
+                mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+                mov_equipo_id, mov_usuario_app
+              ) SELECT %s, 'RETIRO', e.equipo_area_id, e.equipo_area_id, %s,
+                       current_setting('app.user', true)
+                FROM inv.equipos e WHERE e.equipo_id=%s
+            """, (item_id, equipo_id, equipo_id), prepare=True)
     return None
 
 
 # ============================================================
 # HELPERS PRÉSTAMO + BI-VISTA DE ÍTEMS POR ÁREA
 # ============================================================
-def _get_active_loan(cur, item_id: int):
+_SQL_SET_PROC = "SELECT set_config('app.proc', %s, true)"
+_SQL_SET_ESTADO = "UPDATE inv.items SET estado=%s WHERE item_id=%s"
+
+
+def _queue_active_loan(cur, item_id: int) -> None:
     """
-    Devuelve (origen_area_id, destino_area_id, mov_id) del último TRASLADO
-    cuyo mov_detalle->>'es_prestamo' = 'true'. None si no hay préstamo activo.
+    Encola la consulta del último TRASLADO (para usar dentro de un pipeline).
+    inv.vw_traslados incluye los préstamos que la retención sacó de movimientos (0006).
     """
     cur.execute("""
         SELECT m.mov_id, m.mov_origen_area_id, m.mov_destino_area_id,
                COALESCE((m.mov_detalle->>'es_prestamo')::boolean, false) AS es_prestamo
-        FROM inv.movimientos m
-        WHERE m.mov_item_id = %s AND m.mov_tipo = 'TRASLADO'
+        FROM inv.vw_traslados m
+        WHERE m.mov_item_id = %s
         ORDER BY m.mov_id DESC
         LIMIT 1
-    """, (item_id,))
+    """, (item_id,), prepare=True)
+
+
+def _read_active_loan(cur):
     r = cur.fetchone()
     if not r:
         return None
@@ -423,6 +739,15 @@ def _get_active_loan(cur, item_id: int):
     return None
 
 
+def _get_active_loan(cur, item_id: int):
+    """
+    Devuelve (origen_area_id, destino_area_id, mov_id) del último TRASLADO
+    cuyo mov_detalle->>'es_prestamo' = 'true'. None si no hay préstamo activo.
+    """
+    _queue_active_loan(cur, item_id)
+    return _read_active_loan(cur)
+
+
 def list_area_items_biview(
     app_user: str,
     area_id: int,
@@ -441,8 +766,7 @@ def list_area_items_biview(
               m.mov_origen_area_id,
               m.mov_destino_area_id,
               COALESCE((m.mov_detalle->>'es_prestamo')::boolean, false) as es_prestamo
-       FROM inv.movimientos m
-       WHERE m.mov_tipo='TRASLADO'
+       FROM inv.vw_traslados m
        ORDER BY m.mov_item_id, m.mov_id DESC
     ),
     base AS (
@@ -464,7 +788,7 @@ def list_area_items_biview(
       LEFT JOIN last_tr l     ON l.mov_item_id = i.item_id
       LEFT JOIN inv.equipo_items ei ON ei.item_id = i.item_id
       LEFT JOIN inv.equipos e       ON e.equipo_id = ei.equipo_id
-      WHERE (%(by_clase)s IS NULL OR it.clase = %(by_clase)s)
+      WHERE (%(by_clase)s::text IS NULL OR it.clase = %(by_clase)s)
     ),
     view_origin AS (
       SELECT b.*, b.dueno_area_id AS vista_area_id, b.loan_destino_area_id AS otra_area_id, 'ORIGEN'::text AS vista
@@ -497,7 +821,7 @@ def list_area_items_biview(
         "limit": s,
         "offset": off,
     }
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, params)
         rows = cur.fetchall()
 
@@ -548,31 +872,32 @@ def prestar_item(
     mov_equipo_id: Optional[int] = None,
 ) -> Tuple[bool, Optional[str]]:
     with get_conn(app_user) as (conn, cur):
-        cur.execute("SELECT set_config('app.proc', %s, true)", ('items.prestar',))
-
-        cur.execute("SELECT area_id FROM inv.items WHERE item_id=%s", (item_id,))
-        r = cur.fetchone()
-        if not r:
-            return False, "Item no existe"
-        origen_area_id = int(r[0]) if r[0] is not None else None
+        with pipeline(conn):
+            c_it = conn.cursor()
+            cur.execute(_SQL_SET_PROC, ('items.prestar',), prepare=True)
+            c_it.execute("SELECT area_id FROM inv.items WHERE item_id=%s", (item_id,), prepare=True)
+            r = c_it.fetchone()
+            if not r:
+                return False, "Item no existe"
+            origen_area_id = int(r[0]) if r[0] is not None else None
 
-        if destino_area_id == origen_area_id:
-            return False, "Destino no puede ser el mismo que el origen"
+            if destino_area_id == origen_area_id:
+                return False, "Destino no puede ser el mismo que el origen"
 
-        det = (detalle or {}).copy()
-        det["es_prestamo"] = True
-        det_json = dumps(det)
+            det = (detalle or {}).copy()
+            det["es_prestamo"] = True
+            det_json = dumps(det)
 
-        cur.execute("""
-          INSERT INTO inv.movimientos(
-            mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
-            mov_equipo_id, mov_usuario_app, mov_detalle
-          ) VALUES (
-            %s, 'TRASLADO', %s, %s, %s, current_setting('app.user', true), %s::jsonb
-          )
-        """, (item_id, origen_area_id, destino_area_id, mov_equipo_id, det_json))
-
-        cur.execute("UPDATE inv.items SET estado='PRESTAMO' WHERE item_id=%s", (item_id,))
+            # movimiento + estado en un solo envío
+            cur.execute("""
+              INSERT INTO inv.movimientos(
+                mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+                mov_equipo_id, mov_usuario_app, mov_detalle
+              ) VALUES (
+                %s, 'TRASLADO', %s, %s, %s, current_setting('app.user', true), %s::jsonb
+              )
+            """, (item_id, origen_area_id, destino_area_id, mov_equipo_id, det_json), prepare=True)
+            cur.execute(_SQL_SET_ESTADO, ('PRESTAMO', item_id), prepare=True)
         return True, None
 
 
@@ -582,29 +907,31 @@ def devolver_item(
     detalle: Optional[Dict[str, Any]] = None
 ) -> Tuple[bool, Optional[str]]:
     with get_conn(app_user) as (conn, cur):
-        cur.execute("SELECT set_config('app.proc', %s, true)", ('items.devolver',))
-
-        active = _get_active_loan(cur, item_id)
-        if not active:
-            return False, "El ítem no tiene préstamo activo"
-        origen_area_id, destino_area_id, _ = active
-
-        det = (detalle or {}).copy()
-        det["es_prestamo"] = False
-        det["devolucion"]   = True
-        det_json = dumps(det)
-
-        cur.execute("""
-          INSERT INTO inv.movimientos(
-            mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
-            mov_usuario_app, mov_detalle
-          ) VALUES (
-            %s, 'TRASLADO', %s, %s, current_setting('app.user', true), %s::jsonb
-          )
-        """, (item_id, destino_area_id, origen_area_id, det_json))
-
-        cur.execute("DELETE FROM inv.equipo_items WHERE item_id=%s", (item_id,))
-        cur.execute("UPDATE inv.items SET estado='ALMACEN' WHERE item_id=%s", (item_id,))
+        with pipeline(conn):
+            c_loan = conn.cursor()
+            cur.execute(_SQL_SET_PROC, ('items.devolver',), prepare=True)
+            _queue_active_loan(c_loan, item_id)
+            active = _read_active_loan(c_loan)
+            if not active:
+                return False, "El ítem no tiene préstamo activo"
+            origen_area_id, destino_area_id, _ = active
+
+            det = (detalle or {}).copy()
+            det["es_prestamo"] = False
+            det["devolucion"]   = True
+            det_json = dumps(det)
+
+            # movimiento + retiro del equipo + estado en un solo envío
+            cur.execute("""
+              INSERT INTO inv.movimientos(
+                mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+                mov_usuario_app, mov_detalle
+              ) VALUES (
+                %s, 'TRASLADO', %s, %s, current_setting('app.user', true), %s::jsonb
+              )
+            """, (item_id, destino_area_id, origen_area_id, det_json), prepare=True)
+            cur.execute("DELETE FROM inv.equipo_items WHERE item_id=%s", (item_id,), prepare=True)
+            cur.execute(_SQL_SET_ESTADO, ('ALMACEN', item_id), prepare=True)
 
         return True, None
 
@@ -638,18 +965,43 @@ def update_equipo_meta(
 
     params.append(equipo_id)
     sql = "UPDATE inv.equipos SET " + ", ".join(pieces) + " WHERE equipo_id=%s"
+
+    # si cambia login/clave, el bcrypt (verificar y hashear) va antes de la
+    # transacción: no se retiene la fila del equipo ni la conexión mientras tanto
+    clave = None
+    if login is not None or password is not None:
+        with get_conn(app_user) as (conn, cur):
+            cur.execute("SELECT equipo_login, equipo_password FROM inv.equipos WHERE equipo_id=%s",
+                        (equipo_id,), prepare=True)
+            b = cur.fetchone()
+            guardada = None
+            if b:
+                el = (login if login is not None else b[0])
+                ep = (password if password is not None else b[1])
+                if not ((el or "").strip() == (b[0] or "").strip() and ep == b[1]):
+                    guardada = clave_guardada(cur, el)
+        if guardada is not None:
+            clave = preparar_clave_equipo(el, ep, *guardada)
+
     with get_conn(app_user) as (conn, cur):
         cur.execute("SELECT set_config('app.proc', %s, true)", ('equipos.update_meta',))
+        # valores previos (para saber si login/clave cambiaron)
+        cur.execute("""
+          SELECT equipo_area_id, equipo_login, equipo_password
+            FROM inv.equipos WHERE equipo_id=%s FOR UPDATE
+        """, (equipo_id,), prepare=True)
+        a = cur.fetchone()
         cur.execute(sql, params)
 
-        # asegurar/actualizar usuario de equipo (sin duplicar)
-        cur.execute("SELECT equipo_area_id, equipo_login, equipo_password FROM inv.equipos WHERE equipo_id=%s", (equipo_id,))
-        a = cur.fetchone()
+        # asegurar/actualizar usuario de equipo (sin duplicar); si sólo cambió
+        # nombre/estado/usuario final no hay bcrypt: sólo se comprueba que exista
         if a:
             area_id = int(a[0]) if a[0] is not None else None
             el = (login if login is not None else a[1])
             ep = (password if password is not None else a[2])
-            ensure_user_for_equipo(app_user, el, ep, area_id)
+            sin_cambios = (el or "").strip() == (a[1] or "").strip() and ep == a[2]
+            ensure_user_for_equipo(app_user, el, ep, area_id, cur=cur,
+                                   clave_sin_cambios=sin_cambios, clave=clave)
     return None
 
 
@@ -667,23 +1019,33 @@ def get_next_equipo_code(
     de los códigos que comienzan con <prefix>.
     Ej: prefix='PC-' -> PC-001, PC-002, ...
     """
+    pref = _norm_equipo_prefix(prefix)
+    # primario, no réplica: con lag dos operadores recibirían el mismo código
+    with get_conn(app_user) as (conn, cur):
+        max_num = _max_equipo_num(cur, area_id, pref)
+    return _format_equipo_code(pref, max_num + 1, pad)
+
+
+def _norm_equipo_prefix(prefix: Optional[str]) -> str:
     pref = (prefix or "PC-").strip()
-    if pref == "":
-        pref = "PC-"
+    return pref or "PC-"
 
-    SQL = """
-      SELECT COALESCE(MAX( (regexp_replace(equipo_codigo, '[^0-9]+', '', 'g'))::int ), 0) AS max_num
-        FROM inv.equipos
-       WHERE equipo_area_id = %s
-         AND equipo_codigo ILIKE %s
-         AND equipo_codigo ~ '\\d+$'
+
+def _max_equipo_num(cur, area_id: int, pref: str) -> int:
     """
-    params = [area_id, f"{pref}%"]
-    with get_conn(app_user) as (conn, cur):
-        cur.execute(SQL, params)
-        r = cur.fetchone()
-        max_num = int(r[0] or 0)
+    Mayor sufijo numérico de los códigos del área que empiezan con <pref>. Sólo
+    cuentan los dígitos que siguen al prefijo ('LAB1-PC-060' -> 60, no 1060);
+    los códigos con otra cosa después del prefijo se ignoran.
+    """
+    cur.execute("""
+      SELECT COALESCE(MAX( (regexp_match(substr(equipo_codigo, length(%(pref)s) + 1), '^(\\d+)$'))[1]::bigint ), 0)
+        FROM inv.equipos
+       WHERE equipo_area_id = %(area_id)s
+         AND lower(left(equipo_codigo, length(%(pref)s))) = lower(%(pref)s)
+    """, {"area_id": area_id, "pref": pref})
+    r = cur.fetchone()
+    return int(r[0] or 0)
+
 
-    nxt = max_num + 1
-    suf = str(nxt).zfill(max(1, int(pad or 3)))
-    return f"{pref}{suf}"
+def _format_equipo_code(pref: str, num: int, pad: int = 3) -> str:
+    return f"{pref}{str(num).zfill(max(1, int(pad or 3)))}"
@@ -1,7 +1,9 @@
 # app/models/incidencia_model.py
 from typing import Optional, Tuple, Dict, Any, List
-from app.db import get_conn
+from app.db import get_conn, pipeline
+from app.db_async import get_aconn
 from app.utils.mailer import send_mail_safe
+from app.core.roles import ui_to_db_role
 
 # ---------- helpers internos ----------
 def _get_user_email(cur, username: str) -> Optional[str]:
@@ -13,6 +15,18 @@ def _get_user_email(cur, username: str) -> Optional[str]:
     r = cur.fetchone()
     return r[0] if r and r[0] else None
 
+def _get_user_emails(cur, usernames: List[Optional[str]]) -> Dict[str, str]:
+    """Correos de varios usuarios en una sola consulta: {username: email}."""
+    names = list({u for u in usernames if u})
+    if not names:
+        return {}
+    cur.execute("""
+        SELECT usuario_username, usuario_email
+        FROM inv.usuarios
+        WHERE usuario_username = ANY(%s)
+    """, (names,), prepare=True)
+    return {r[0]: r[1] for r in cur.fetchall() if r[1]}
+
 def _get_user_id(cur, username: str) -> Optional[int]:
     cur.execute("SELECT usuario_id FROM inv.usuarios WHERE usuario_username=%s", (username,))
     r = cur.fetchone()
@@ -42,6 +56,7 @@ def create_incidencia(
     descripcion: str,
     equipo_id: Optional[int] = None,
     reportado_email: Optional[str] = None,   # opcional, se usará como Reply-To
+    usuario_area_id: Optional[int] = None,   # área del usuario (claims); evita consultarla
 ) -> Tuple[Optional[int], Optional[str]]:
     """
     Inserta en inv.incidencias y notifica por email al ADMIN.
@@ -52,17 +67,18 @@ def create_incidencia(
 
             equipo_codigo, area_id_equipo, area_nombre_equipo = _get_equipo_area(cur, equipo_id)
 
-            # Fallback a área del usuario si existe la columna y no vino área del equipo
-            area_id = area_id_equipo
-            cur.execute("""
-                SELECT 1 FROM information_schema.columns
-                WHERE table_schema='inv' AND table_name='usuarios' AND column_name='usuario_area_id'
-            """)
-            if area_id is None and cur.fetchone():
-                cur.execute("SELECT usuario_area_id FROM inv.usuarios WHERE usuario_username=%s", (app_user,))
-                a = cur.fetchone()
-                if a and a[0] is not None:
-                    area_id = int(a[0])
+            # Fallback a área del usuario: la de los claims o, si no vino, de la BD
+            area_id = area_id_equipo if area_id_equipo is not None else usuario_area_id
+            if area_id is None:
+                cur.execute("""
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema='inv' AND table_name='usuarios' AND column_name='usuario_area_id'
+                """)
+                if cur.fetchone():
+                    cur.execute("SELECT usuario_area_id FROM inv.usuarios WHERE usuario_username=%s", (app_user,))
+                    a = cur.fetchone()
+                    if a and a[0] is not None:
+                        area_id = int(a[0])
 
             cur.execute("""
               INSERT INTO inv.incidencias(
@@ -109,21 +125,24 @@ def list_incidencias(
     size: int = 10,
     q: Optional[str] = None,
     area_id: Optional[int] = None,
+    rol: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """
+    rol: rol UI del usuario (claims ya validados por require_auth). Si no se pasa
+    se consulta en BD.
+    """
     p = max(1, int(page or 1))
     s = min(100, max(1, int(size or 10)))
     off = (p - 1) * s
 
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         # rol
-        cur.execute("""
-          SELECT r.rol_nombre
-          FROM inv.usuarios u
-          JOIN inv.roles r ON r.rol_id=u.rol_id
-          WHERE u.usuario_username=%s
-        """, (app_user,))
-        r = cur.fetchone()
-        rol_db = (r[0] if r else "").upper()
+        if rol:
+            rol_db = ui_to_db_role(rol)
+        else:
+            cur.execute(_SQL_ROL_UPDATES, (app_user,))
+            r = cur.fetchone()
+            rol_db = (r[0] if r else "").upper()
 
         sql = """
           SELECT
@@ -193,7 +212,7 @@ def list_incidencias(
 # DETALLE
 # ============================================================
 def get_incidencia(app_user: str, inc_id: int) -> Optional[Dict[str, Any]]:
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute("""
           SELECT
             i.inc_id, i.titulo, i.descripcion, i.estado,
@@ -261,43 +280,43 @@ def get_incidencia(app_user: str, inc_id: int) -> Optional[Dict[str, Any]]:
 def add_mensaje(app_user: str, inc_id: int, cuerpo: str, solo_staff: bool = False) -> Tuple[Optional[int], Optional[str]]:
     with get_conn(app_user) as (conn, cur):
         try:
-            # ¿existe la columna solo_staff?
-            cur.execute("""
-                SELECT 1 FROM information_schema.columns
-                WHERE table_schema='inv' AND table_name='incidencia_mensajes' AND column_name='solo_staff'
-            """)
-            has_solo = bool(cur.fetchone())
-
-            if has_solo:
-                cur.execute("""
-                  INSERT INTO inv.incidencia_mensajes(inc_id, usuario, mensaje, solo_staff)
-                  VALUES (%s,%s,%s,%s)
-                  RETURNING msg_id
-                """, (inc_id, app_user, cuerpo, solo_staff))
-            else:
-                cur.execute("""
-                  INSERT INTO inv.incidencia_mensajes(inc_id, usuario, mensaje)
-                  VALUES (%s,%s,%s)
-                  RETURNING msg_id
-                """, (inc_id, app_user, cuerpo))
-            msg_id = int(cur.fetchone()[0])
-
-            # info de la incidencia para correos
-            cur.execute("""
-              SELECT i.titulo, i.reportado_por, i.asignado_a, e.equipo_codigo, a.area_nombre
-              FROM inv.incidencias i
-              LEFT JOIN inv.equipos e ON e.equipo_id = i.equipo_id
-              LEFT JOIN inv.areas  a  ON a.area_id   = i.area_id
-              WHERE i.inc_id=%s
-            """, (inc_id,))
-            row = cur.fetchone()
+            with pipeline(conn):
+                # ¿existe la columna solo_staff?
+                cur.execute(_SQL_HAS_SOLO_STAFF, prepare=True)
+                has_solo = bool(cur.fetchone())
+
+                # INSERT + info de la incidencia en un solo envío
+                c_ins, c_inc = conn.cursor(), conn.cursor()
+                if has_solo:
+                    c_ins.execute("""
+                      INSERT INTO inv.incidencia_mensajes(inc_id, usuario, mensaje, solo_staff)
+                      VALUES (%s,%s,%s,%s)
+                      RETURNING msg_id
+                    """, (inc_id, app_user, cuerpo, solo_staff), prepare=True)
+                else:
+                    c_ins.execute("""
+                      INSERT INTO inv.incidencia_mensajes(inc_id, usuario, mensaje)
+                      VALUES (%s,%s,%s)
+                      RETURNING msg_id
+                    """, (inc_id, app_user, cuerpo), prepare=True)
+                c_inc.execute("""
+                  SELECT i.titulo, i.reportado_por, i.asignado_a, e.equipo_codigo, a.area_nombre
+                  FROM inv.incidencias i
+                  LEFT JOIN inv.equipos e ON e.equipo_id = i.equipo_id
+                  LEFT JOIN inv.areas  a  ON a.area_id   = i.area_id
+                  WHERE i.inc_id=%s
+                """, (inc_id,), prepare=True)
+                msg_id = int(c_ins.fetchone()[0])
+                row = c_inc.fetchone()
             if not row:
                 return msg_id, None
             titulo, reportado_por, asignado_a, equipo_codigo, area_nombre = row
 
-            email_reportado = _get_user_email(cur, reportado_por) if reportado_por else None
-            email_asignado  = _get_user_email(cur, asignado_a) if asignado_a else None
-            email_autor     = _get_user_email(cur, app_user)
+            # correos de reportante, asignado y autor en una sola consulta
+            emails = _get_user_emails(cur, [reportado_por, asignado_a, app_user])
+            email_reportado = emails.get(reportado_por) if reportado_por else None
+            email_asignado  = emails.get(asignado_a) if asignado_a else None
+            email_autor     = emails.get(app_user)
 
             body_lines = [
                 f"Incidencia #{inc_id} · {titulo}",
@@ -426,77 +445,128 @@ def set_estado(app_user: str, inc_id: int, estado: str) -> Optional[str]:
 # ============================================================
 # UPDATES (pull incremental rápido para tiempo “real”)
 # ============================================================
-def list_updates(app_user: str, since_id: Optional[int]) -> Dict[str, Any]:
+_SQL_ROL_UPDATES = """
+  SELECT UPPER(r.rol_nombre)
+  FROM inv.usuarios u JOIN inv.roles r ON r.rol_id=u.rol_id
+  WHERE u.usuario_username=%s
+"""
+
+_SQL_HAS_SOLO_STAFF = """
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema='inv' AND table_name='incidencia_mensajes' AND column_name='solo_staff'
+"""
+
+_SQL_MAX_MSG_ID = "SELECT COALESCE(MAX(msg_id),0) FROM inv.incidencia_mensajes"
+
+
+def _updates_query(app_user: str, rol: str, has_solo: bool, since_id: Optional[int]) -> Tuple[str, List[Any]]:
+    base = f"""
+      SELECT m.msg_id, m.inc_id, m.mensaje, m.usuario, m.created_at,
+             {'m.solo_staff' if has_solo else 'FALSE'} AS solo_staff,
+             i.titulo, i.estado, i.reportado_por, i.asignado_a
+      FROM inv.incidencia_mensajes m
+      JOIN inv.incidencias i ON i.inc_id = m.inc_id
+      WHERE m.msg_id > %s
+        AND LOWER(m.usuario) <> LOWER(%s)
+    """
+
+    params: List[Any] = [int(since_id or 0), app_user]
+
+    if rol == "USUARIOS":
+        # solo incidencias propias y ocultar privados
+        base += " AND i.reportado_por=%s"
+        params.append(app_user)
+        if has_solo:
+            base += " AND COALESCE(m.solo_staff,false)=false"
+    elif rol == "PRACTICANTE":
+        # solo asignadas al practicante
+        base += " AND i.asignado_a=%s"
+        params.append(app_user)
+    else:
+        # ADMIN ve todo
+        pass
+
+    base += " ORDER BY m.msg_id ASC LIMIT 100"
+    return base, params
+
+
+def _rows_to_updates(rows, since_id: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+    items: List[Dict[str, Any]] = []
+    last_id = since_id or 0
+    for r in rows:
+        last_id = max(last_id, int(r[0]))
+        items.append({
+            "msg_id": int(r[0]),
+            "inc_id": int(r[1]),
+            "mensaje": r[2],
+            "usuario": r[3],
+            "created_at": r[4],
+            "solo_staff": bool(r[5]),
+            "titulo": r[6],
+            "estado": r[7],
+        })
+    return items, last_id
+
+
+def list_updates(app_user: str, since_id: Optional[int], rol: Optional[str] = None) -> Dict[str, Any]:
     """
     Devuelve mensajes con msg_id > since_id visibles para app_user.
-    Filtra por rol y privacidad (solo_staff).
+    Filtra por rol y privacidad (solo_staff). rol: rol UI de los claims; si no
+    se pasa se consulta en BD.
     """
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         # rol
-        cur.execute("""
-          SELECT UPPER(r.rol_nombre)
-          FROM inv.usuarios u JOIN inv.roles r ON r.rol_id=u.rol_id
-          WHERE u.usuario_username=%s
-        """, (app_user,))
-        r = cur.fetchone()
-        rol = (r[0] if r else "USUARIOS").upper()
+        if rol:
+            rol = ui_to_db_role(rol)
+        else:
+            cur.execute(_SQL_ROL_UPDATES, (app_user,))
+            r = cur.fetchone()
+            rol = (r[0] if r else "USUARIOS").upper()
 
         # ¿hay columna solo_staff?
-        cur.execute("""
-            SELECT 1 FROM information_schema.columns
-            WHERE table_schema='inv' AND table_name='incidencia_mensajes' AND column_name='solo_staff'
-        """)
+        cur.execute(_SQL_HAS_SOLO_STAFF)
         has_solo = bool(cur.fetchone())
 
-        base = f"""
-          SELECT m.msg_id, m.inc_id, m.mensaje, m.usuario, m.created_at,
-                 {'m.solo_staff' if has_solo else 'FALSE'} AS solo_staff,
-                 i.titulo, i.estado, i.reportado_por, i.asignado_a
-          FROM inv.incidencia_mensajes m
-          JOIN inv.incidencias i ON i.inc_id = m.inc_id
-          WHERE m.msg_id > %s
-            AND LOWER(m.usuario) <> LOWER(%s)
-        """
+        sql, params = _updates_query(app_user, rol, has_solo, since_id)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        items, last_id = _rows_to_updates(rows, since_id)
 
-        params: List[Any] = [int(since_id or 0), app_user]
+        # si no hay nuevos y es el primer arranque, fijar al tope actual
+        if not rows and (since_id is None or since_id == 0):
+            cur.execute(_SQL_MAX_MSG_ID)
+            last_id = int(cur.fetchone()[0] or 0)
 
-        if rol == "USUARIOS":
-            # solo incidencias propias y ocultar privados
-            base += " AND i.reportado_por=%s"
-            params.append(app_user)
-            if has_solo:
-                base += " AND COALESCE(m.solo_staff,false)=false"
-        elif rol == "PRACTICANTE":
-            # solo asignadas al practicante
-            base += " AND i.asignado_a=%s"
-            params.append(app_user)
-        else:
-            # ADMIN ve todo
-            pass
+        return {"items": items, "last_id": last_id}
 
-        base += " ORDER BY m.msg_id ASC LIMIT 100"
 
-        cur.execute(base, params)
-        rows = cur.fetchall()
+async def list_updates_async(app_user: str, since_id: Optional[int], rol: Optional[str] = None) -> Dict[str, Any]:
+    """Igual que list_updates, sobre el pool async (modo ASGI / long-poll)."""
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        if rol:
+            rol = ui_to_db_role(rol)
+        else:
+            await cur.execute(_SQL_ROL_UPDATES, (app_user,))
+            r = await cur.fetchone()
+            rol = (r[0] if r else "USUARIOS").upper()
 
-        items: List[Dict[str, Any]] = []
-        last_id = since_id or 0
-        for r in rows:
-            last_id = max(last_id, int(r[0]))
-            items.append({
-                "msg_id": int(r[0]),
-                "inc_id": int(r[1]),
-                "mensaje": r[2],
-                "usuario": r[3],
-                "created_at": r[4],
-                "solo_staff": bool(r[5]),
-                "titulo": r[6],
-                "estado": r[7],
-            })
+        await cur.execute(_SQL_HAS_SOLO_STAFF)
+        has_solo = bool(await cur.fetchone())
+
+        sql, params = _updates_query(app_user, rol, has_solo, since_id)
+        await cur.execute(sql, params)
+        rows = await cur.fetchall()
+        items, last_id = _rows_to_updates(rows, since_id)
 
-        # si no hay nuevos y es el primer arranque, fijar al tope actual
         if not rows and (since_id is None or since_id == 0):
-            cur.execute("SELECT COALESCE(MAX(msg_id),0) FROM inv.incidencia_mensajes")
-            last_id = int(cur.fetchone()[0] or 0)
+            await cur.execute(_SQL_MAX_MSG_ID)
+            last_id = int((await cur.fetchone())[0] or 0)
 
         return {"items": items, "last_id": last_id}
+
+
+async def max_msg_id_async() -> int:
+    """Tope actual de mensajes; lo usa el vigilante de long-poll del modo ASGI."""
+    async with get_aconn(None, readonly=True) as (conn, cur):
+        await cur.execute(_SQL_MAX_MSG_ID)
+        return int((await cur.fetchone())[0] or 0)
@@ -1,24 +1,53 @@
 # app/models/item_model.py
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 from psycopg.types.json import Json
-from app.db import get_conn
+from app.db import get_conn, pipeline
+from app.db_async import get_aconn
+from app.core.fotos import normalize_fotos
+from app.core.spec_schema import (
+    DATA_TYPES, VAL_COLUMNS, coerce_value, format_errores, get_schema, invalidate_schema, json_value,
+)
 
 # =========================
 # Tipos de ítem
 # =========================
-def list_item_types(app_user: str, clase: Optional[str] = None) -> List[Dict[str, Any]]:
+def _item_types_query(clase: Optional[str]):
     sql = "SELECT item_tipo_id, clase, nombre FROM inv.item_tipos"
     params: List[Any] = []
     if clase:
         sql += " WHERE clase = %s"
         params.append(clase)
     sql += " ORDER BY clase, lower(nombre)"
-    with get_conn(app_user) as (conn, cur):
+    return sql, params
+
+
+def item_types_version(app_user: str) -> str:
+    """Sello de versión de inv.item_tipos para el ETag de /api/item-types (contador de la migración 0005)."""
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(
+            "SELECT version FROM inv.catalogo_versiones WHERE tabla = 'item_tipos'",
+            prepare=True,
+        )
+        r = cur.fetchone()
+    return str(r[0] if r else 0)
+
+
+def list_item_types(app_user: str, clase: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql, params = _item_types_query(clase)
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(sql, params)
         rows = cur.fetchall()
     return [{"id": r[0], "clase": r[1], "nombre": r[2]} for r in rows]
 
 
+async def list_item_types_async(app_user: str, clase: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql, params = _item_types_query(clase)
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(sql, params)
+        rows = await cur.fetchall()
+    return [{"id": r[0], "clase": r[1], "nombre": r[2]} for r in rows]
+
+
 def create_item_type(app_user: str, clase: str, nombre: str) -> int:
     if clase not in ("COMPONENTE", "PERIFERICO"):
         raise ValueError("clase inválida")
@@ -47,7 +76,35 @@ def create_item_with_specs(
     area_id: int,           # subárea o raíz EXACTA
     specs: Dict[str, Any],
 ) -> int:
+    # la ficha se valida antes de abrir conexión (esquema en caché)
+    faltan = []
+    ficha = specs
+    if specs:
+        schema = get_schema(app_user, clase, tipo_nombre)
+        if schema is not None:
+            valores, errores = schema.coerce(specs)
+            if errores:
+                raise ValueError(format_errores(errores))
+            # el SP deduce el tipo del JSON (8.0 llega como 8 -> int): los atributos
+            # nuevos se definen antes con el data_type ya validado, como upsert_ficha
+            faltan = [v for v in valores if v.attr is None]
+            specs = {v.nombre: json_value(v.value) for v in valores}
     with get_conn(app_user) as (conn, cur):
+        if faltan:
+            with pipeline(conn):
+                for v in faltan:
+                    cur.execute("CALL inv.sp_definir_atributo(%s,%s,%s,%s,NULL)",
+                                (clase, tipo_nombre, v.nombre, v.data_type))
+            # otro request pudo definir el mismo atributo con otro data_type
+            schema = get_schema(app_user, clase, tipo_nombre, cur=cur, fresh=True)
+            valores, errores = schema.coerce(ficha, permitir_nuevos=False)
+            if errores:
+                raise ValueError(format_errores(errores))
+            for v in faltan:
+                attr = schema.by_name[v.nombre.lower()]
+                if attr.data_type != v.data_type:
+                    raise ValueError(f"Ficha inválida: {v.nombre}: es de tipo {attr.data_type}, no {v.data_type}")
+            specs = {v.nombre: json_value(v.value) for v in valores}
         cur.execute(
             "CALL inv.sp_crear_item_con_ficha_en_area_id(%s,%s,%s,%s,%s::jsonb)",
             (codigo, clase, tipo_nombre, int(area_id), Json(specs)),
@@ -56,43 +113,26 @@ def create_item_with_specs(
         row = cur.fetchone()
         if not row:
             raise Exception("No se pudo crear el ítem (no se encontró item_id)")
-        return int(row[0])
+        item_id = int(row[0])
+    if faltan:
+        invalidate_schema(clase, tipo_nombre)
+    return item_id
 
 # =========================
 # Detalle de ítem (vista)
 # =========================
-def get_item_detail(app_user: str, item_id: int) -> Optional[Dict[str, Any]]:
-    sql = """
+_SQL_ITEM_DETAIL_BASE = """
     SELECT item_id, item_codigo, clase, tipo, estado,
            area_id, area_nombre, ficha, fotos, created_at
     FROM inv.vw_items_con_ficha_y_fotos
-    WHERE item_id = %s
-    """
-    with get_conn(app_user) as (conn, cur):
-        cur.execute(sql, (item_id,))
-        r = cur.fetchone()
-        if not r:
-            return None
+"""
+_SQL_ITEM_DETAIL = _SQL_ITEM_DETAIL_BASE + " WHERE item_id = %s"
+_SQL_ITEMS_DETAIL = _SQL_ITEM_DETAIL_BASE + " WHERE item_id = ANY(%s)"
+
+ITEMS_BATCH_MAX = 200
 
-    # --- Normaliza fotos: acepta lista de strings o dicts con url/path ---
-    raw_fotos = r[8] or []
-    fotos_norm: List[Dict[str, Any]] = []
-    if isinstance(raw_fotos, list):
-        for f in raw_fotos:
-            if isinstance(f, str):
-                if f.strip():
-                    fotos_norm.append({"path": f.strip(), "principal": False, "orden": None})
-            elif isinstance(f, dict):
-                p = (f.get("path") or f.get("url") or "").strip()
-                if p:
-                    fotos_norm.append({
-                        "path": p,
-                        "principal": bool(f.get("principal", False)),
-                        "orden": f.get("orden"),
-                        "created_at": f.get("created_at"),
-                    })
-    # ---------------------------------------------------------------------
 
+def _row_to_item_detail(r) -> Dict[str, Any]:
     return {
         "item_id": r[0],
         "item_codigo": r[1],
@@ -102,10 +142,112 @@ def get_item_detail(app_user: str, item_id: int) -> Optional[Dict[str, Any]]:
         "area_id": r[5],
         "area_nombre": r[6],
         "ficha": r[7] or {},
-        "fotos": fotos_norm,
+        "fotos": normalize_fotos(r[8] or []),
         "created_at": r[9],
     }
 
+
+def get_item_detail(app_user: str, item_id: int) -> Optional[Dict[str, Any]]:
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_SQL_ITEM_DETAIL, (item_id,))
+        r = cur.fetchone()
+        if not r:
+            return None
+    return _row_to_item_detail(r)
+
+
+# =========================
+# Fichas/fotos bajo demanda (varios ítems en una consulta)
+# =========================
+ITEM_FIELDS = ("ficha", "fotos")
+FICHAS_MAX_IDS = 200
+
+
+def parse_fields(raw: Optional[str], default: Tuple[str, ...] = ()) -> Tuple[str, ...]:
+    """'ficha,fotos' -> ('ficha', 'fotos'); ignora nombres desconocidos."""
+    if raw is None:
+        return default
+    pedidos = {f.strip().lower() for f in str(raw).split(",") if f.strip()}
+    return tuple(f for f in ITEM_FIELDS if f in pedidos)
+
+
+def fichas_por_ids(cur, ids: List[int], fields: Tuple[str, ...] = ("ficha",)) -> Dict[int, Dict[str, Any]]:
+    """
+    {item_id: {"ficha": {...}, "fotos": [...]}} para los ids pedidos, con una sola
+    consulta a la vista filtrada por item_id (sólo agrega esos ítems).
+    """
+    fields = tuple(f for f in ITEM_FIELDS if f in fields)
+    if not ids or not fields:
+        return {}
+    cur.execute(
+        f"""
+        SELECT item_id, {', '.join(fields)}
+        FROM inv.vw_items_con_ficha_y_fotos
+        WHERE item_id = ANY(%s)
+        """,
+        (list(ids),),
+    )
+    out: Dict[int, Dict[str, Any]] = {}
+    for r in cur.fetchall():
+        d: Dict[str, Any] = {}
+        for i, f in enumerate(fields, start=1):
+            d[f] = (r[i] or {}) if f == "ficha" else normalize_fotos(r[i] or [])
+        out[int(r[0])] = d
+    return out
+
+
+def get_item_fichas(app_user: str, ids: List[int], fields: Tuple[str, ...] = ("ficha",)) -> List[Dict[str, Any]]:
+    """Ficha (y fotos si se piden) de varios ítems, en el orden de ids."""
+    ids = list(dict.fromkeys(int(i) for i in ids))[:FICHAS_MAX_IDS]
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        data = fichas_por_ids(cur, ids, fields)
+    return [{"item_id": i, **data[i]} for i in ids if i in data]
+
+
+def _batch_ids(ids: List[int]) -> List[int]:
+    """Sin repetidos, conservando el orden pedido; tope ITEMS_BATCH_MAX por las dudas (las rutas responden 400 si se pasa)."""
+    return list(dict.fromkeys(int(i) for i in ids))[:ITEMS_BATCH_MAX]
+
+
+def _ordered_details(ids: List[int], rows) -> Dict[str, Any]:
+    by_id = {int(r[0]): r for r in rows}
+    return {
+        "items": [_row_to_item_detail(by_id[i]) for i in ids if i in by_id],
+        "faltantes": [i for i in ids if i not in by_id],
+    }
+
+
+def get_items_detail(app_user: str, ids: List[int]) -> Dict[str, Any]:
+    """
+    Detalle de varios ítems en una consulta (etiquetas, detalle de equipo).
+    Mismo formato que get_item_detail, en el orden de ids; 'faltantes' lista
+    los que no existen.
+    """
+    ids = _batch_ids(ids)
+    if not ids:
+        return {"items": [], "faltantes": []}
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(_SQL_ITEMS_DETAIL, (ids,))
+        rows = cur.fetchall()
+    return _ordered_details(ids, rows)
+
+
+async def get_items_detail_async(app_user: str, ids: List[int]) -> Dict[str, Any]:
+    ids = _batch_ids(ids)
+    if not ids:
+        return {"items": [], "faltantes": []}
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(_SQL_ITEMS_DETAIL, (ids,))
+        rows = await cur.fetchall()
+    return _ordered_details(ids, rows)
+
+
+async def get_item_detail_async(app_user: str, item_id: int) -> Optional[Dict[str, Any]]:
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(_SQL_ITEM_DETAIL, (item_id,))
+        r = await cur.fetchone()
+    return _row_to_item_detail(r) if r else None
+
 # =========================
 # Specs: upsert atributo y valor
 # =========================
@@ -118,8 +260,12 @@ def upsert_attribute_and_value(
     data_type: str,
     value: Any,
 ) -> Optional[str]:
-    if data_type not in ("text", "int", "numeric", "bool", "date"):
+    if data_type not in DATA_TYPES:
         return "data_type inválido"
+    try:
+        value = coerce_value(data_type, value)
+    except ValueError as e:
+        return f"{nombre_attr}: {e}"
     with get_conn(app_user) as (conn, cur):
         cur.execute("CALL inv.sp_definir_atributo(%s,%s,%s,%s,NULL)",
                     (clase, tipo_nombre, nombre_attr, data_type))
@@ -143,13 +289,7 @@ def upsert_attribute_and_value(
                     (item_id, attr_id))
         exists = cur.fetchone() is not None
 
-        col = {
-            "text": "val_text",
-            "int": "val_int",
-            "numeric": "val_numeric",
-            "bool": "val_bool",
-            "date": "val_date",
-        }[data_type]
+        col = VAL_COLUMNS[data_type]
 
         if exists:
             cur.execute(
@@ -161,8 +301,105 @@ def upsert_attribute_and_value(
                 f"INSERT INTO inv.spec_valores(item_id, attr_id, {col}) VALUES (%s,%s,%s)",
                 (item_id, attr_id, value),
             )
+    # sp_definir_atributo pudo crear el atributo
+    invalidate_schema(clase, tipo_nombre)
     return None
 
+# =========================
+# Specs: ficha completa en una transacción
+# =========================
+class _FichaError(Exception):
+    """Ficha rechazada dentro de la transacción de upsert_ficha (se revierte)."""
+
+
+def upsert_ficha(app_user: str, item_id: int, ficha: Dict[str, Any]) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    """
+    Guarda una ficha completa {atributo: valor | {"data_type", "value"}}:
+      1) se valida y convierte contra el esquema del tipo (caché, sin ir a la BD)
+      2) atributos que el tipo no tiene -> sp_definir_atributo en un solo pipeline
+         y se revalida contra el esquema releído (otro request pudo definirlos)
+      3) todos los valores -> INSERT ... ON CONFLICT (item_id, attr_id) DO UPDATE
+         sobre arrays ya tipados (unnest)
+    Todo en una transacción (~3 round-trips sin importar cuántos atributos).
+    """
+    if not isinstance(ficha, dict) or not ficha:
+        return None, "ficha vacía"
+
+    nuevos = 0
+    with get_conn(app_user) as (conn, cur):
+        try:
+            cur.execute("""
+              SELECT it.clase, it.nombre
+              FROM inv.items i
+              JOIN inv.item_tipos it ON it.item_tipo_id = i.item_tipo_id
+              WHERE i.item_id = %s
+            """, (item_id,), prepare=True)
+            r = cur.fetchone()
+            if not r:
+                raise _FichaError("Item no existe")
+            clase, tipo_nombre = r[0], r[1]
+
+            schema = get_schema(app_user, clase, tipo_nombre, cur=cur)
+            if schema is None:
+                raise _FichaError("Tipo de ítem no existe")
+            valores, errores = schema.coerce(ficha)
+            if errores:
+                raise _FichaError(format_errores(errores))
+            if not valores:
+                raise _FichaError("ficha vacía")
+
+            faltan = [v for v in valores if v.attr is None]
+            if faltan:
+                cur.execute("SELECT set_config('app.proc', %s, true)", ('items.ficha_bulk',))
+                with pipeline(conn):
+                    for v in faltan:
+                        cur.execute("CALL inv.sp_definir_atributo(%s,%s,%s,%s,NULL)",
+                                    (clase, tipo_nombre, v.nombre, v.data_type))
+                nuevos = len(faltan)
+                schema = get_schema(app_user, clase, tipo_nombre, cur=cur, fresh=True)
+                # otro request pudo definir el mismo atributo con otro data_type:
+                # se vuelve a validar contra el esquema recién leído
+                valores, errores = schema.coerce(ficha, permitir_nuevos=False)
+                if errores:
+                    raise _FichaError(format_errores(errores))
+
+            cols: Dict[str, List[Any]] = {c: [] for c in VAL_COLUMNS.values()}
+            attr_ids: List[int] = []
+            for v in valores:
+                attr = schema.by_name.get(v.nombre.lower())
+                if attr is None:
+                    raise _FichaError(f"No se obtuvo attr_id para '{v.nombre}'")
+                if v.data_type != attr.data_type:
+                    raise _FichaError(f"Ficha inválida: {v.nombre}: es de tipo {attr.data_type}, no {v.data_type}")
+                attr_ids.append(attr.attr_id)
+                for dt, col in VAL_COLUMNS.items():
+                    cols[col].append(v.value if dt == attr.data_type else None)
+
+            cur.execute("""
+              INSERT INTO inv.spec_valores(item_id, attr_id, val_text, val_int, val_numeric, val_bool, val_date)
+              SELECT %s, t.attr_id, t.vt, t.vi, t.vn, t.vb, t.vd
+                FROM unnest(%s::bigint[], %s::text[], %s::bigint[], %s::numeric[], %s::boolean[], %s::date[])
+                     AS t(attr_id, vt, vi, vn, vb, vd)
+              ON CONFLICT (item_id, attr_id) DO UPDATE
+                 SET val_text    = EXCLUDED.val_text,
+                     val_int     = EXCLUDED.val_int,
+                     val_numeric = EXCLUDED.val_numeric,
+                     val_bool    = EXCLUDED.val_bool,
+                     val_date    = EXCLUDED.val_date
+            """, (item_id, attr_ids, cols["val_text"], cols["val_int"], cols["val_numeric"],
+                  cols["val_bool"], cols["val_date"]))
+        except _FichaError as e:
+            # nada a medias: sin esto get_conn confirmaría los atributos ya definidos
+            conn.rollback()
+            return None, str(e)
+        except Exception as e:
+            conn.rollback()
+            return None, f"No se pudo guardar la ficha: {e}"
+
+    if nuevos:
+        invalidate_schema(clase, tipo_nombre)
+    return {"atributos_definidos": nuevos, "valores": len(attr_ids)}, None
+
 # =========================
 # Fotos (media) → vía SP que recibe item_codigo
 # =========================
@@ -212,6 +449,7 @@ def suggest_next_code(app_user: str, clase: str, tipo_nombre: str, area_id: int)
     """
     prefix = (tipo_nombre or "").strip().upper()  # prefijo textual del tipo
 
+    # primario, no réplica: con lag dos operadores recibirían el mismo código
     with get_conn(app_user) as (conn, cur):
         # 1) Resolver item_tipo_id a partir de clase + tipo_nombre (case-insensitive)
         cur.execute("""
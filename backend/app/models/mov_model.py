@@ -1,6 +1,9 @@
 # app/models/mov_model.py
 from typing import Optional, Any, Dict, List, Tuple
 from app.db import get_conn
+from app.db_async import get_aconn
+from app.core.json_provider import RowSet
+from app.core.date_range import date_range_sql
 
 
 def _where_and_params_mov(
@@ -19,13 +22,9 @@ def _where_and_params_mov(
         sql += " AND m.mov_tipo = %s"
         params.append(tipo)
 
-    if desde:
-        sql += " AND m.mov_fecha::date >= %s::date"
-        params.append(desde)
-
-    if hasta:
-        sql += " AND m.mov_fecha::date <= %s::date"
-        params.append(hasta)
+    rango, rango_params = date_range_sql("m.mov_fecha", desde, hasta)
+    sql += rango
+    params.extend(rango_params)
 
     if item_id:
         sql += " AND m.mov_item_id = %s"
@@ -65,13 +64,9 @@ def _where_and_params_audit(
     sql = ""
     params: List[Any] = []
 
-    if desde:
-        sql += " AND a.created_at::date >= %s::date"
-        params.append(desde)
-
-    if hasta:
-        sql += " AND a.created_at::date <= %s::date"
-        params.append(hasta)
+    rango, rango_params = date_range_sql("a.created_at", desde, hasta)
+    sql += rango
+    params.extend(rango_params)
 
     if q:
         like = f"%{q}%"
@@ -92,31 +87,22 @@ def _where_and_params_audit(
     return sql, params
 
 
-def list_auditoria_flexible(
-    app_user: str,
-    fuente: str = "MOV",            # "MOV" | "AUDIT" | "MIX"
-    page: int = 1,
-    size: int = 20,
-    tipo: Optional[str] = None,     # solo se aplica a MOV
-    desde: Optional[str] = None,
-    hasta: Optional[str] = None,
-    q: Optional[str] = None,
-    item_id: Optional[int] = None,
-    equipo_id: Optional[int] = None,
-    area_id: Optional[int] = None,
-) -> Dict[str, Any]:
+def _auditoria_queries(
+    fuente: str,
+    s: int,
+    off: int,
+    tipo: Optional[str],
+    desde: Optional[str],
+    hasta: Optional[str],
+    q: Optional[str],
+    item_id: Optional[int],
+    equipo_id: Optional[int],
+    area_id: Optional[int],
+) -> Tuple[str, List[Any], str, List[Any]]:
     """
-    Devuelve registros de:
-    - inv.movimientos (cuando fuente=MOV)
-    - inv.audit_log   (cuando fuente=AUDIT)
-    - UNION ALL de ambos (cuando fuente=MIX)
-
-    Estructura de salida compatible con tu tabla actual.
+    Arma (sql_total, params_total, sql_pagina, params_pagina) para la fuente pedida.
+    Compartido por la versión sync y la async (modo ASGI).
     """
-    p = max(1, int(page or 1))
-    s = min(200, max(1, int(size or 20)))
-    off = (p - 1) * s
-
     # ----- SELECT MOV -----
     sql_mov_base = """
       SELECT
@@ -183,68 +169,88 @@ def list_auditoria_flexible(
     audit_where, audit_params = _where_and_params_audit(desde, hasta, q)
     sql_audit = sql_audit_base + audit_where
 
-    # ----- Ejecutar según fuente -----
-    with get_conn(app_user) as (conn, cur):
-        items: List[Dict[str, Any]] = []
-        total = 0
+    if fuente == "MOV":
+        sql_total = "SELECT COUNT(1) FROM (" + sql_mov + ") x"
+        sql_page = sql_mov + " ORDER BY m.mov_fecha DESC, m.mov_id DESC LIMIT %s OFFSET %s"
+        return sql_total, mov_params, sql_page, mov_params + [s, off]
+
+    if fuente == "AUDIT":
+        sql_total = "SELECT COUNT(1) FROM (" + sql_audit + ") x"
+        sql_page = sql_audit + " ORDER BY a.created_at DESC, a.audit_id DESC LIMIT %s OFFSET %s"
+        return sql_total, audit_params, sql_page, audit_params + [s, off]
 
-        if fuente == "MOV":
-            # total
-            cur.execute("SELECT COUNT(1) FROM (" + sql_mov + ") x", mov_params)
-            total = int(cur.fetchone()[0] or 0)
+    # MIX
+    sql_union = f"({sql_mov}) UNION ALL ({sql_audit})"
+    sql_total = "SELECT COUNT(1) FROM (" + sql_union + ") z"
+    sql_page = sql_union + " ORDER BY mov_fecha DESC, mov_id DESC LIMIT %s OFFSET %s"
+    return sql_total, mov_params + audit_params, sql_page, mov_params + audit_params + [s, off]
+
+
+def list_auditoria_flexible(
+    app_user: str,
+    fuente: str = "MOV",            # "MOV" | "AUDIT" | "MIX"
+    page: int = 1,
+    size: int = 20,
+    tipo: Optional[str] = None,     # solo se aplica a MOV
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    q: Optional[str] = None,
+    item_id: Optional[int] = None,
+    equipo_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Devuelve registros de:
+    - inv.movimientos (cuando fuente=MOV)
+    - inv.audit_log   (cuando fuente=AUDIT)
+    - UNION ALL de ambos (cuando fuente=MIX)
 
-            # page
-            sql_page = sql_mov + " ORDER BY m.mov_fecha DESC, m.mov_id DESC LIMIT %s OFFSET %s"
-            cur.execute(sql_page, mov_params + [s, off])
-            rows = cur.fetchall()
+    Estructura de salida compatible con tu tabla actual. "items" es un RowSet:
+    los alias del SELECT son las claves de cada objeto en el JSON.
+    """
+    p = max(1, int(page or 1))
+    s = min(200, max(1, int(size or 20)))
+    off = (p - 1) * s
 
-        elif fuente == "AUDIT":
-            # total
-            cur.execute("SELECT COUNT(1) FROM (" + sql_audit + ") x", audit_params)
-            total = int(cur.fetchone()[0] or 0)
+    sql_total, params_total, sql_page, params_page = _auditoria_queries(
+        fuente, s, off, tipo, desde, hasta, q, item_id, equipo_id, area_id
+    )
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(sql_total, params_total)
+        total = int(cur.fetchone()[0] or 0)
+        cur.execute(sql_page, params_page)
+        items = RowSet.from_cursor(cur)
 
-            # page
-            sql_page = sql_audit + " ORDER BY a.created_at DESC, a.audit_id DESC LIMIT %s OFFSET %s"
-            cur.execute(sql_page, audit_params + [s, off])
-            rows = cur.fetchall()
+    return {"items": items, "total": total, "page": p, "size": s}
 
-        else:  # MIX
-            # total
-            cur.execute(
-                "SELECT COUNT(1) FROM (" + f"({sql_mov}) UNION ALL ({sql_audit})" + ") z",
-                mov_params + audit_params
-            )
-            total = int(cur.fetchone()[0] or 0)
 
-            # page
-            sql_union = f"({sql_mov}) UNION ALL ({sql_audit})"
-            sql_page = sql_union + " ORDER BY mov_fecha DESC, mov_id DESC LIMIT %s OFFSET %s"
-            cur.execute(sql_page, mov_params + audit_params + [s, off])
-            rows = cur.fetchall()
+async def list_auditoria_flexible_async(
+    app_user: str,
+    fuente: str = "MOV",
+    page: int = 1,
+    size: int = 20,
+    tipo: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    q: Optional[str] = None,
+    item_id: Optional[int] = None,
+    equipo_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    p = max(1, int(page or 1))
+    s = min(200, max(1, int(size or 20)))
+    off = (p - 1) * s
 
-        for r in rows:
-            items.append({
-                "mov_id": r[0],
-                "mov_item_id": r[1],
-                "item_codigo": r[2],
-                "clase": r[3],
-                "item_tipo": r[4],
-                "mov_tipo": r[5],
-                "mov_fecha": r[6],
-                "mov_origen_area_id": r[7],
-                "origen_area_nombre": r[8],
-                "mov_destino_area_id": r[9],
-                "destino_area_nombre": r[10],
-                "mov_equipo_id": r[11],
-                "equipo_codigo": r[12],
-                "equipo_nombre": r[13],
-                "mov_usuario_app": r[14],
-                "mov_motivo": r[15],
-                "mov_detalle": r[16],
-                "es_audit": bool(r[17]),
-            })
+    sql_total, params_total, sql_page, params_page = _auditoria_queries(
+        fuente, s, off, tipo, desde, hasta, q, item_id, equipo_id, area_id
+    )
+    async with get_aconn(app_user, readonly=True) as (conn, cur):
+        await cur.execute(sql_total, params_total)
+        total = int((await cur.fetchone())[0] or 0)
+        await cur.execute(sql_page, params_page)
+        items = RowSet.from_cursor(cur, await cur.fetchall())
 
-    return {"items": items, "total": int(total or 0), "page": p, "size": s}
+    return {"items": items, "total": total, "page": p, "size": s}
 
 
 # ====== versión anterior (solo MOV) por compatibilidad si la llamas en otro lado ======
@@ -1,19 +1,201 @@
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 from app.db import get_conn
+from app.core.spec_schema import VAL_COLUMNS, coerce_value, get_schema, invalidate_schema
+from app.models.item_model import fichas_por_ids
 
 def get_attrs_for_type(app_user: str, clase: str, tipo_nombre: str) -> List[Dict]:
-    with get_conn(app_user) as (conn, cur):
-        cur.execute("""
-          SELECT sa.nombre_attr, sa.data_type, sa.orden
-          FROM inv.spec_atributos sa
-          JOIN inv.item_tipos it ON it.item_tipo_id = sa.item_tipo_id
-          WHERE it.clase = %s AND lower(it.nombre)=lower(%s)
-          ORDER BY sa.orden NULLS LAST, lower(sa.nombre_attr)
-        """, (clase, tipo_nombre))
-        rows = cur.fetchall()
-        return [{"nombre": r[0], "data_type": r[1], "orden": r[2]} for r in rows]
+    # esquema compilado en caché (se invalida en define_attr)
+    schema = get_schema(app_user, clase, tipo_nombre)
+    return schema.to_list() if schema else []
 
 def define_attr(app_user: str, clase: str, tipo_nombre: str, nombre_attr: str, data_type: str):
     with get_conn(app_user) as (conn, cur):
         cur.execute("CALL inv.sp_definir_atributo(%s,%s,%s,%s,NULL)",
                     (clase, tipo_nombre, nombre_attr, data_type))
+    invalidate_schema(clase, tipo_nombre)
+
+# =========================
+# Búsqueda por ficha (filtros tipados + facetas)
+# =========================
+SEARCH_OPS = {"eq": "=", "ne": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "in": "IN", "like": "LIKE"}
+_OPS_ORDEN = ("gt", "gte", "lt", "lte")
+FACET_MAX_VALUES = 50
+
+
+def parse_search_filters(raw: List[str]) -> List[Dict[str, Any]]:
+    """['Capacidad:gte:8', 'Tipo:in:DDR4|DDR5'] -> [{"attr", "op", "value"}] (formato de query string)."""
+    out: List[Dict[str, Any]] = []
+    for f in raw or []:
+        partes = (f or "").split(":", 2)
+        if len(partes) != 3:
+            out.append({"attr": f, "op": None, "value": None})
+            continue
+        attr, op, val = partes
+        op = op.strip().lower()
+        out.append({"attr": attr.strip(), "op": op, "value": val.split("|") if op == "in" else val})
+    return out
+
+
+def _filtro_sql(attr, op: str, value: Any) -> Tuple[str, List[Any]]:
+    """Condición sobre i.item_id; cada filtro baja a un rango de índice (attr_id, val_*)."""
+    col = "sv." + VAL_COLUMNS[attr.data_type]
+    if op == "in":
+        vals = [coerce_value(attr.data_type, v) for v in (value if isinstance(value, list) else [value])]
+        vals = [v for v in vals if v is not None]
+        if not vals:
+            raise ValueError("lista vacía")
+        if attr.data_type == "text":
+            cond, prm = "lower(sv.val_text) = ANY(%s)", [[v.lower() for v in vals]]
+        else:
+            cond, prm = f"{col} = ANY(%s)", [vals]
+    elif op == "like":
+        if attr.data_type != "text":
+            raise ValueError("'like' sólo aplica a texto")
+        cond, prm = "lower(sv.val_text) LIKE %s", ["%" + str(value).strip().lower().replace("%", r"\%").replace("_", r"\_") + "%"]
+    else:
+        v = coerce_value(attr.data_type, value)
+        if v is None:
+            raise ValueError("valor requerido")
+        if attr.data_type == "bool" and op in _OPS_ORDEN:
+            raise ValueError("sí/no sólo admite eq/ne")
+        if attr.data_type == "text":
+            cond, prm = f"lower(sv.val_text) {SEARCH_OPS[op]} %s", [v.lower()]
+        else:
+            cond, prm = f"{col} {SEARCH_OPS[op]} %s", [v]
+    sql = f"i.item_id IN (SELECT sv.item_id FROM inv.spec_valores sv WHERE sv.attr_id = %s AND {cond})"
+    return sql, [attr.attr_id] + prm
+
+
+def search_by_specs(
+    app_user: str,
+    clase: str,
+    tipo_nombre: str,
+    filtros: List[Dict[str, Any]],
+    facetas: List[str] = (),
+    area_id: Optional[int] = None,
+    incluir_subareas: bool = True,
+    estado: Optional[str] = None,
+    page: int = 1,
+    size: int = 50,
+    fields: Tuple[str, ...] = (),
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Ítems de un tipo que cumplen filtros tipados sobre la ficha, acotados por
+    área (con o sin subáreas) y estado, más conteos por valor de cada faceta
+    pedida (facetas=['*'] = todos los atributos del tipo).
+
+    filtros: [{"attr": "Capacidad", "op": "gte", "value": 8}, ...]
+      op: eq, ne, gt, gte, lt, lte, in (lista), like (texto contiene)
+    Los filtros se validan contra el esquema del tipo antes de ir a la BD.
+    """
+    schema = get_schema(app_user, clase, tipo_nombre)
+    if schema is None:
+        return None, "Tipo de ítem no existe"
+
+    errores: Dict[str, str] = {}
+    conds: List[str] = ["i.item_tipo_id = %s"]
+    params: List[Any] = [schema.item_tipo_id]
+    for f in filtros or []:
+        nombre = str(f.get("attr") or "").strip()
+        op = str(f.get("op") or "eq").strip().lower()
+        attr = schema.by_name.get(nombre.lower())
+        if attr is None:
+            errores[nombre or "?"] = "atributo no definido para el tipo"
+            continue
+        if op not in SEARCH_OPS:
+            errores[nombre] = f"operador inválido ({', '.join(SEARCH_OPS)})"
+            continue
+        try:
+            sql, prm = _filtro_sql(attr, op, f.get("value"))
+        except ValueError as e:
+            errores[nombre] = str(e)
+            continue
+        conds.append(sql)
+        params += prm
+
+    if list(facetas) == ["*"]:
+        facet_attrs = list(schema.attrs)
+    else:
+        facet_attrs = []
+        for nombre in facetas or []:
+            attr = schema.by_name.get(str(nombre).strip().lower())
+            if attr is None:
+                errores[str(nombre)] = "faceta no definida para el tipo"
+            else:
+                facet_attrs.append(attr)
+    if errores:
+        return None, "Búsqueda inválida: " + "; ".join(f"{k}: {v}" for k, v in errores.items())
+
+    cte = "WITH RECURSIVE "
+    if area_id is not None:
+        if incluir_subareas:
+            cte += """arbol AS (
+                SELECT area_id FROM inv.areas WHERE area_id = %s
+                UNION ALL
+                SELECT a.area_id FROM inv.areas a JOIN arbol ON a.area_padre_id = arbol.area_id
+              ), """
+            conds.append("i.area_id IN (SELECT area_id FROM arbol)")
+        else:
+            conds.append("i.area_id = %s")
+        params = [area_id] + params if incluir_subareas else params + [area_id]
+    if estado:
+        conds.append("i.estado = %s")
+        params.append(estado)
+    cte += "base AS (SELECT i.item_id FROM inv.items i WHERE " + " AND ".join(conds) + ")"
+
+    p = max(1, int(page or 1))
+    s = min(200, max(1, int(size or 50)))
+
+    sql_page = f"""
+      {cte}
+      SELECT i.item_id, i.item_codigo, i.estado, i.area_id, a.area_nombre,
+             COUNT(*) OVER() AS total_rows
+      FROM base b
+      JOIN inv.items i ON i.item_id = b.item_id
+      LEFT JOIN inv.areas a ON a.area_id = i.area_id
+      ORDER BY i.item_codigo
+      LIMIT %s OFFSET %s
+    """
+    sql_facets = f"""
+      {cte}
+      SELECT sv.attr_id, sv.val_text, sv.val_int, sv.val_numeric, sv.val_bool, sv.val_date, count(*)
+      FROM base b
+      JOIN inv.spec_valores sv ON sv.item_id = b.item_id AND sv.attr_id = ANY(%s)
+      GROUP BY 1, 2, 3, 4, 5, 6
+    """
+
+    with get_conn(app_user, readonly=True) as (conn, cur):
+        cur.execute(sql_page, params + [s, (p - 1) * s])
+        rows = cur.fetchall()
+        extra = fichas_por_ids(cur, [r[0] for r in rows], fields) if fields and rows else {}
+        facet_rows = []
+        if facet_attrs:
+            cur.execute(sql_facets, params + [[a.attr_id for a in facet_attrs]])
+            facet_rows = cur.fetchall()
+
+    items: List[Dict[str, Any]] = []
+    total = 0
+    for r in rows:
+        total = r[5]
+        it = {"item_id": r[0], "item_codigo": r[1], "estado": r[2], "area_id": r[3], "area_nombre": r[4]}
+        if fields:
+            it.update(extra.get(r[0]) or {f: ({} if f == "ficha" else []) for f in fields})
+        items.append(it)
+
+    por_attr: Dict[int, List[Dict[str, Any]]] = {a.attr_id: [] for a in facet_attrs}
+    col_idx = {dt: 1 + i for i, dt in enumerate(VAL_COLUMNS)}
+    tipos = {a.attr_id: a.data_type for a in facet_attrs}
+    for fr in facet_rows:
+        valor = fr[col_idx[tipos[fr[0]]]]
+        if valor is not None:
+            por_attr[fr[0]].append({"valor": valor, "count": int(fr[6])})
+    facets_out: Dict[str, List[Dict[str, Any]]] = {}
+    for a in facet_attrs:
+        vals = por_attr[a.attr_id]
+        if a.data_type in ("int", "numeric", "date"):
+            vals.sort(key=lambda x: x["valor"])          # rangos: orden natural
+        else:
+            vals.sort(key=lambda x: (-x["count"], str(x["valor"]).lower()))
+        facets_out[a.nombre] = vals[:FACET_MAX_VALUES]
+
+    return {"items": items, "total": int(total or 0), "page": p, "size": s, "facetas": facets_out}, None
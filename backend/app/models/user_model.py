@@ -1,33 +1,23 @@
+from dataclasses import dataclass
 from typing import Optional, Tuple, List, Dict
 from app.db import get_conn
+from app.core.auth_context import invalidate_user
+from app.core import passwords
+from app.core.roles import db_to_ui_role, ui_to_db_role
 
 # ---------- util: mapeos de rol ----------
-def _ui_to_db_role(rol_ui: str) -> str:
-    """
-    UI: ADMIN | USUARIO | PRACTICANTE
-    BD: ADMIN | USUARIOS | PRACTICANTE
-    """
-    r = (rol_ui or "").strip().upper()
-    if r == "USUARIO":
-        return "USUARIOS"
-    if r in ("ADMIN", "PRACTICANTE"):
-        return r
-    return r
-
-def _db_to_ui_role(rol_db: str) -> str:
-    r = (rol_db or "").strip().upper()
-    if r == "USUARIOS":
-        return "USUARIO"
-    return r
-
 def _role_id(cur, rol_nombre_ui: str) -> Optional[int]:
-    rol_db = _ui_to_db_role(rol_nombre_ui)
+    rol_db = ui_to_db_role(rol_nombre_ui)
     cur.execute("SELECT rol_id FROM inv.roles WHERE rol_nombre=%s", (rol_db,))
     row = cur.fetchone()
     return int(row[0]) if row else None
 
 # ---------- LOGIN ----------
 def login_and_check(username: str, password: str):
+    """
+    1) lee el usuario (conexión corta), 2) verifica bcrypt en la app sin tener
+    conexión tomada, 3) registra el login y re-hashea si cambió el costo.
+    """
     with get_conn(username) as (conn, cur):
         cur.execute("""
           SELECT u.usuario_id, u.usuario_username, u.usuario_area_id, r.rol_nombre,
@@ -36,21 +26,36 @@ def login_and_check(username: str, password: str):
           FROM inv.usuarios u
           JOIN inv.roles r ON r.rol_id = u.rol_id
           WHERE u.usuario_username = %s
-        """, (username,))
+        """, (username,), prepare=True)
         row = cur.fetchone()
-        if not row:
-            return None, "Usuario no existe"
+    if not row:
+        return None, "Usuario no existe"
+
+    user_id, uname, area_id, rol_db, activo, hashpwd = row
+    ok_pwd = passwords.verify(password, hashpwd)
+    if ok_pwd is None:
+        # sin paquete bcrypt (o hash que no es bcrypt): como antes, en la BD
+        with get_conn(username) as (conn, cur):
+            cur.execute("SELECT %s = crypt(%s, %s)", (hashpwd, password, hashpwd))
+            ok_pwd = bool(cur.fetchone()[0])
+    if not ok_pwd:
+        return None, "Contraseña incorrecta"
+    if not activo:
+        return None, "Usuario desactivado"
 
-        user_id, uname, area_id, rol_db, activo, hashpwd = row
-        cur.execute("SELECT %s = crypt(%s, %s)", (hashpwd, password, hashpwd))
-        ok_pwd = cur.fetchone()[0]
-        if not ok_pwd:
-            return None, "Contraseña incorrecta"
-        if not activo:
-            return None, "Usuario desactivado"
+    # costo distinto al configurado -> nuevo hash (sólo si no cambió mientras tanto)
+    nuevo_hash = passwords.hash_password(password) if passwords.needs_rehash(hashpwd) else None
 
-        rol_ui = _db_to_ui_role(rol_db)
-        cur.execute("UPDATE inv.usuarios SET usuario_ultimo_login = now() WHERE usuario_id=%s", (user_id,))
+    rol_ui = db_to_ui_role(rol_db)
+    with get_conn(username) as (conn, cur):
+        cur.execute("""
+          UPDATE inv.usuarios
+             SET usuario_ultimo_login = now(),
+                 usuario_password_bcrypt = CASE
+                   WHEN %s::text IS NOT NULL AND usuario_password_bcrypt = %s THEN %s::text
+                   ELSE usuario_password_bcrypt END
+           WHERE usuario_id=%s
+        """, (nuevo_hash, hashpwd, nuevo_hash, user_id), prepare=True)
 
     return {"id": user_id, "username": uname, "area_id": area_id, "rol": rol_ui}, None
 
@@ -64,7 +69,7 @@ def list_users(app_user: str, q: Optional[str] = None, rol_ui: Optional[str] = N
         params.append(f"%{q}%")
     if rol_ui:
         where.append("r.rol_nombre = %s")
-        params.append(_ui_to_db_role(rol_ui))
+        params.append(ui_to_db_role(rol_ui))
 
     SQL = f"""
     SELECT u.usuario_id, u.usuario_username, u.usuario_activo, u.usuario_area_id,
@@ -74,7 +79,7 @@ def list_users(app_user: str, q: Optional[str] = None, rol_ui: Optional[str] = N
     {"WHERE " + " AND ".join(where) if where else ""}
     ORDER BY u.usuario_id DESC
     """
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, params)
         rows = cur.fetchall()
     return [{
@@ -82,7 +87,7 @@ def list_users(app_user: str, q: Optional[str] = None, rol_ui: Optional[str] = N
         "username": r[1],
         "activo": r[2],
         "area_id": r[3],
-        "rol": _db_to_ui_role(r[4]),
+        "rol": db_to_ui_role(r[4]),
         "ultimo_login": r[5]
     } for r in rows]
 
@@ -94,7 +99,7 @@ def get_user_by_id(app_user: str, user_id: int) -> Optional[dict]:
     JOIN inv.roles r ON r.rol_id=u.rol_id
     WHERE u.usuario_id=%s
     """
-    with get_conn(app_user) as (conn, cur):
+    with get_conn(app_user, readonly=True) as (conn, cur):
         cur.execute(SQL, (user_id,))
         r = cur.fetchone()
     if not r:
@@ -104,21 +109,23 @@ def get_user_by_id(app_user: str, user_id: int) -> Optional[dict]:
         "username": r[1],
         "activo": r[2],
         "area_id": r[3],
-        "rol": _db_to_ui_role(r[4]),
+        "rol": db_to_ui_role(r[4]),
         "ultimo_login": r[5]
     }
 
 def create_user(app_user: str, username: str, password: str, rol_ui: str, area_id: int) -> Tuple[Optional[int], Optional[str]]:
+    # el hash se calcula antes de tomar conexión
+    pwd_sql, pwd_params = passwords.hash_sql(password)
     with get_conn(app_user) as (conn, cur):
         rid = _role_id(cur, rol_ui)
         if not rid:
             return None, "Rol inexistente"
         try:
-            cur.execute("""
+            cur.execute(f"""
               INSERT INTO inv.usuarios(usuario_username, usuario_password_bcrypt, rol_id, usuario_area_id, usuario_activo)
-              VALUES (%s, crypt(%s, gen_salt('bf')), %s, %s, true)
+              VALUES (%s, {pwd_sql}, %s, %s, true)
               RETURNING usuario_id
-            """, (username, password, rid, area_id))
+            """, (username, *pwd_params, rid, area_id))
             new_id = cur.fetchone()[0]
             return int(new_id), None
         except Exception as e:
@@ -128,8 +135,9 @@ def update_user(app_user: str, user_id: int, data: dict) -> Optional[str]:
     sets, params = [], []
 
     if "password" in data and data["password"]:
-        sets.append("usuario_password_bcrypt = crypt(%s, gen_salt('bf'))")
-        params.append(data["password"])
+        pwd_sql, pwd_params = passwords.hash_sql(data["password"])
+        sets.append(f"usuario_password_bcrypt = {pwd_sql}")
+        params.extend(pwd_params)
 
     if "rol" in data and data["rol"]:
         rol_ui = str(data["rol"]).upper()
@@ -152,60 +160,320 @@ def update_user(app_user: str, user_id: int, data: dict) -> Optional[str]:
         return None
 
     params.append(user_id)
-    SQL = "UPDATE inv.usuarios SET " + ", ".join(sets) + " WHERE usuario_id=%s"
+    SQL = "UPDATE inv.usuarios SET " + ", ".join(sets) + " WHERE usuario_id=%s RETURNING usuario_username"
 
     with get_conn(app_user) as (conn, cur):
         try:
             cur.execute(SQL, params)
+            row = cur.fetchone()
         except Exception as e:
             return f"No se pudo actualizar: {e}"
+    # rol/área/activo cambian los claims efectivos: no esperar al TTL de la caché
+    if row:
+        invalidate_user(row[0])
     return None
 
 def delete_user(app_user: str, user_id: int) -> Optional[str]:
     with get_conn(app_user) as (conn, cur):
         try:
-            cur.execute("DELETE FROM inv.usuarios WHERE usuario_id=%s", (user_id,))
+            cur.execute("DELETE FROM inv.usuarios WHERE usuario_id=%s RETURNING usuario_username", (user_id,))
+            row = cur.fetchone()
         except Exception as e:
             return f"No se pudo eliminar: {e}"
+    if row:
+        invalidate_user(row[0])
     return None
 
 
 # ---------- Auto-usuario de equipos (ROL BD = USUARIOS) ----------
+def _rol_usuarios_id(cur) -> int:
+    cur.execute("SELECT rol_id FROM inv.roles WHERE rol_nombre = 'USUARIOS'", prepare=True)
+    r = cur.fetchone()
+    if not r:
+        cur.execute("INSERT INTO inv.roles(rol_nombre) VALUES ('USUARIOS') RETURNING rol_id")
+        r = cur.fetchone()
+    return int(r[0])
+
+
+def _claves_coinciden(cur, pares: List[Tuple[str, Optional[str]]]) -> List[bool]:
+    """
+    ¿Cada clave coincide con su hash guardado? bcrypt en la app (en paralelo);
+    lo que no se pueda verificar ahí se resuelve en una sola consulta con crypt().
+    """
+    res = passwords.verify_many(pares)
+    pend = [i for i, ok in enumerate(res) if ok is None]
+    if pend:
+        cur.execute("""
+          SELECT t.h = crypt(t.raw, t.h)
+            FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS t(raw, h, ord)
+           ORDER BY t.ord
+        """, ([pares[i][0] for i in pend], [pares[i][1] for i in pend]))
+        for i, r in zip(pend, cur.fetchall()):
+            res[i] = bool(r[0])
+    return [bool(ok) for ok in res]
+
+
+@dataclass(frozen=True)
+class ClaveEquipo:
+    """
+    Clave del usuario de un equipo ya verificada/hasheada fuera de la transacción.
+    Sólo vale si al escribir la cuenta sigue con el hash que se vio al prepararla.
+    """
+    username: str
+    raw: Optional[str]
+    existe: bool
+    hash_visto: Optional[str]
+    coincide: Optional[bool]        # None: sólo se puede verificar en la BD (crypt)
+    nuevo_hash: Optional[str]       # bcrypt listo para guardar; None sin bcrypt
+
+
+def clave_guardada(cur, username: str) -> Tuple[bool, Optional[str]]:
+    """(existe, hash) de la cuenta; lectura simple, sin bloquear la fila."""
+    cur.execute("SELECT usuario_password_bcrypt FROM inv.usuarios WHERE usuario_username = %s",
+                ((username or "").strip(),), prepare=True)
+    r = cur.fetchone()
+    return (True, r[0]) if r else (False, None)
+
+
+def preparar_clave_equipo(username: Optional[str],
+                          raw_password: Optional[str],
+                          existe: bool,
+                          hash_guardado: Optional[str]) -> Optional[ClaveEquipo]:
+    """
+    bcrypt de ensure_user_for_equipo hecho de antemano (sin conexión ni locks):
+    verifica la clave contra el hash guardado y, si no coincide o la cuenta es
+    nueva, calcula el hash que se va a escribir.
+    """
+    uname = (username or "").strip()
+    if not uname:
+        return None
+    if not existe:
+        return ClaveEquipo(uname, raw_password, False, None, False,
+                           passwords.hash_password(raw_password or uname))
+    if not raw_password:
+        return ClaveEquipo(uname, raw_password, True, hash_guardado, True, None)
+    ok = passwords.verify(raw_password, hash_guardado)
+    return ClaveEquipo(uname, raw_password, True, hash_guardado, ok,
+                       None if ok else passwords.hash_password(raw_password))
+
+
+def claves_guardadas(cur, usernames: List[Optional[str]]) -> Dict[str, Optional[str]]:
+    """{username: hash} de las cuentas que ya existen; una lectura, sin bloquear filas."""
+    unames = list({(u or "").strip() for u in usernames} - {""})
+    if not unames:
+        return {}
+    cur.execute("""
+      SELECT usuario_username, usuario_password_bcrypt
+        FROM inv.usuarios
+       WHERE usuario_username = ANY(%s)
+    """, (unames,))
+    return {r[0]: r[1] for r in cur.fetchall()}
+
+
+def preparar_claves_equipos(cuentas: List[Tuple[Optional[str], Optional[str]]],
+                            guardadas: Dict[str, Optional[str]]) -> Dict[str, ClaveEquipo]:
+    """
+    preparar_clave_equipo en lote para ensure_users_for_equipos (verifica y
+    hashea en paralelo, sin conexión ni locks).
+      cuentas: [(username, raw_password), ...]; guardadas: claves_guardadas()
+    """
+    vistas: Dict[str, Optional[str]] = {}
+    for uname, raw_password in cuentas:
+        u = (uname or "").strip()
+        if u:
+            vistas[u] = raw_password or None
+
+    a_verificar = [u for u in vistas if u in guardadas and vistas[u]]
+    coinciden = dict(zip(a_verificar, passwords.verify_many(
+        [(vistas[u], guardadas[u]) for u in a_verificar])))
+    for u in vistas:
+        if u in guardadas and not vistas[u]:
+            coinciden[u] = True   # sin clave no se toca la guardada
+    # cuentas nuevas (la inicial es el username) y claves que no coinciden
+    a_hashear = [u for u in vistas if not coinciden.get(u, False)]
+    hashes = dict(zip(a_hashear, passwords.hash_many([vistas[u] or u for u in a_hashear])))
+
+    return {
+        u: ClaveEquipo(u, raw, u in guardadas, guardadas.get(u), coinciden.get(u, False), hashes.get(u))
+        for u, raw in vistas.items()
+    }
+
+
 def ensure_user_for_equipo(app_user: str,
                            username: Optional[str],
                            raw_password: Optional[str],
-                           area_id: Optional[int]) -> None:
+                           area_id: Optional[int],
+                           cur=None,
+                           clave_sin_cambios: bool = False,
+                           clave: Optional[ClaveEquipo] = None) -> bool:
+    """
+    Crea o sincroniza el usuario (rol USUARIOS) asociado a un equipo.
+    Sólo escribe si algo cambió: rol, área o clave. La clave se verifica contra
+    el hash guardado (no se re-hashea si coincide); con clave_sin_cambios=True
+    el llamador ya sabe que login/clave del equipo no cambiaron y ni siquiera
+    se verifica (dos lecturas por índice, sin bcrypt).
+    clave: resultado de preparar_clave_equipo() calculado antes de la
+    transacción; si la cuenta cambió desde entonces se verifica aquí.
+    cur: cursor del llamador para reutilizar su transacción; si es None abre una.
+    Devuelve True si creó o actualizó el usuario.
+    """
     uname = (username or "").strip()
     if not uname:
-        return
+        return False
 
-    with get_conn(app_user) as (conn, cur):
-        cur.execute("SELECT rol_id FROM inv.roles WHERE rol_nombre = 'USUARIOS'")
-        r = cur.fetchone()
-        if not r:
-            cur.execute("INSERT INTO inv.roles(rol_nombre) VALUES ('USUARIOS') RETURNING rol_id")
-            rid = int(cur.fetchone()[0])
-        else:
-            rid = int(r[0])
+    if cur is None:
+        with get_conn(app_user) as (conn, own_cur):
+            return ensure_user_for_equipo(app_user, uname, raw_password, area_id, cur=own_cur,
+                                          clave_sin_cambios=clave_sin_cambios, clave=clave)
 
-        cur.execute("SELECT usuario_id FROM inv.usuarios WHERE usuario_username = %s", (uname,))
-        row = cur.fetchone()
+    rid = _rol_usuarios_id(cur)
+    cur.execute("""
+      SELECT usuario_id, rol_id, usuario_area_id, usuario_password_bcrypt
+        FROM inv.usuarios
+       WHERE usuario_username = %s
+    """, (uname,), prepare=True)
+    row = cur.fetchone()
+    if clave is not None and (clave.username != uname or clave.raw != raw_password
+                              or clave.existe != bool(row) or (row and clave.hash_visto != row[3])):
+        clave = None   # la cuenta cambió entre la preparación y el lock
+
+    if row:
+        uid, rol_act, area_act, hash_act = row
+        sets: List[str] = []
+        params: List = []
+        if rol_act != rid:
+            sets.append("rol_id=%s")
+            params.append(rid)
+        if area_id is not None and area_act != int(area_id):
+            sets.append("usuario_area_id = %s")
+            params.append(int(area_id))
+        if raw_password and not clave_sin_cambios:
+            if clave is not None and clave.coincide is not None:
+                coincide = clave.coincide
+            else:
+                coincide = _claves_coinciden(cur, [(raw_password, hash_act)])[0]
+            if not coincide:
+                pwd_sql, pwd_params = _clave_sql(raw_password, clave)
+                sets.append(f"usuario_password_bcrypt = {pwd_sql}")
+                params.extend(pwd_params)
+        if not sets:
+            return False
+        params.append(uid)
+        cur.execute(f"UPDATE inv.usuarios SET {', '.join(sets)} WHERE usuario_id=%s", params)
+    else:
+        # cuenta nueva sin clave: la inicial es el username
+        pwd_sql, pwd_params = _clave_sql(raw_password or uname, clave)
+        cur.execute(f"""
+          INSERT INTO inv.usuarios(
+            usuario_username, usuario_password_bcrypt, rol_id, usuario_area_id, usuario_activo
+          ) VALUES (%s, {pwd_sql}, %s, %s, true)
+        """, (uname, *pwd_params, rid, int(area_id) if area_id is not None else None))
+    invalidate_user(uname)
+    return True
+
+
+def _clave_sql(raw: str, clave: Optional[ClaveEquipo]) -> Tuple[str, list]:
+    if clave is not None and clave.nuevo_hash:
+        return "%s", [clave.nuevo_hash]
+    return passwords.hash_sql(raw)
+
+
+def ensure_users_for_equipos(cur,
+                             cuentas: List[Tuple[str, Optional[str], Optional[int]]],
+                             claves_sin_cambios: bool = False,
+                             claves: Optional[Dict[str, ClaveEquipo]] = None) -> Dict[str, int]:
+    """
+    Variante en lote de ensure_user_for_equipo para operaciones masivas de equipos.
+    Trabaja sobre el cursor (transacción) del llamador.
+      cuentas: [(username, raw_password, area_id), ...]
+    Lee todas las cuentas en una consulta, verifica las claves en paralelo y
+    sólo actualiza las que cambiaron.
+    claves: preparar_claves_equipos() calculado antes de la transacción; las
+    cuentas que cambiaron desde entonces se verifican/hashean aquí.
+    Devuelve {"creados": n, "actualizados": m, "sin_cambios": k}.
+    """
+    vistos: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
+    for uname, raw_password, area_id in cuentas:
+        u = (uname or "").strip()
+        if u:
+            vistos[u] = (raw_password or None, int(area_id) if area_id is not None else None)
+    if not vistos:
+        return {"creados": 0, "actualizados": 0, "sin_cambios": 0}
+
+    rid = _rol_usuarios_id(cur)
+    unames = list(vistos.keys())
+
+    cur.execute("""
+      SELECT usuario_username, rol_id, usuario_area_id, usuario_password_bcrypt
+        FROM inv.usuarios
+       WHERE usuario_username = ANY(%s)
+    """, (unames,))
+    existentes = {r[0]: (r[1], r[2], r[3]) for r in cur.fetchall()}
+
+    # claves preparadas que siguen valiendo: misma clave y mismo hash que al prepararlas
+    listas: Dict[str, ClaveEquipo] = {}
+    for u, c in (claves or {}).items():
+        if (u in vistos and c.raw == vistos[u][0] and c.existe == (u in existentes)
+                and (not c.existe or c.hash_visto == existentes[u][2])):
+            listas[u] = c
+
+    # claves de cuentas existentes: ¿ya coinciden con el hash guardado?
+    a_verificar = [] if claves_sin_cambios else [u for u in unames if u in existentes and vistos[u][0]]
+    coinciden = {u: listas[u].coincide for u in a_verificar
+                 if u in listas and listas[u].coincide is not None}
+    pend = [u for u in a_verificar if u not in coinciden]
+    coinciden.update(zip(pend, _claves_coinciden(
+        cur, [(vistos[u][0], existentes[u][2]) for u in pend])))
+
+    def _hashes(us: List[str], pwds: List[Optional[str]]) -> List[Optional[str]]:
+        # los preparados se reusan; el resto se hashea aquí (en paralelo)
+        out = [listas[u].nuevo_hash if u in listas and p is not None else None for u, p in zip(us, pwds)]
+        faltan = [i for i, p in enumerate(pwds) if p is not None and out[i] is None]
+        for i, h in zip(faltan, passwords.hash_many([pwds[i] for i in faltan])):
+            out[i] = h
+        return out
+
+    upd: List[Tuple[str, Optional[str], Optional[int]]] = []
+    for u in unames:
+        if u not in existentes:
+            continue
+        rol_act, area_act, _ = existentes[u]
+        pwd, area = vistos[u]
+        cambia_pwd = u in coinciden and not coinciden[u]
+        cambia_area = area is not None and area != area_act
+        if rol_act != rid or cambia_pwd or cambia_area:
+            upd.append((u, pwd if cambia_pwd else None, area))
+    nuevos = [u for u in unames if u not in existentes]
+
+    if upd:
+        pwds = [p for _, p, _ in upd]
+        # hashes en la app; sin bcrypt se manda la clave y la BD usa crypt()
+        hashes = _hashes([u for u, _, _ in upd], pwds)
+        raw_db = [None] * len(upd) if passwords.HAVE_BCRYPT else pwds
+        cur.execute("""
+          UPDATE inv.usuarios u
+             SET rol_id = %s,
+                 usuario_password_bcrypt = CASE
+                   WHEN t.hash IS NOT NULL THEN t.hash
+                   WHEN t.pwd  IS NOT NULL THEN crypt(t.pwd, gen_salt('bf', %s))
+                   ELSE u.usuario_password_bcrypt END,
+                 usuario_area_id = COALESCE(t.area_id, u.usuario_area_id)
+            FROM unnest(%s::text[], %s::text[], %s::text[], %s::bigint[]) AS t(uname, hash, pwd, area_id)
+           WHERE u.usuario_username = t.uname
+        """, (rid, passwords.ROUNDS, [u for u, _, _ in upd], hashes, raw_db, [a for _, _, a in upd]))
+
+    if nuevos:
+        # cuentas nuevas sin clave: la inicial es el username
+        pwds = [vistos[u][0] or u for u in nuevos]
+        hashes = _hashes(nuevos, pwds)
+        raw_db = [None] * len(nuevos) if passwords.HAVE_BCRYPT else pwds
+        cur.execute("""
+          INSERT INTO inv.usuarios(
+            usuario_username, usuario_password_bcrypt, rol_id, usuario_area_id, usuario_activo
+          )
+          SELECT t.uname, COALESCE(t.hash, crypt(t.pwd, gen_salt('bf', %s))), %s, t.area_id, true
+            FROM unnest(%s::text[], %s::text[], %s::text[], %s::bigint[]) AS t(uname, hash, pwd, area_id)
+        """, (passwords.ROUNDS, rid, nuevos, hashes, raw_db, [vistos[u][1] for u in nuevos]))
 
-        if row:
-            uid = int(row[0])
-            sets = ["rol_id=%s"]
-            params: List = [rid]
-            if raw_password:
-                sets.append("usuario_password_bcrypt = crypt(%s, gen_salt('bf'))")
-                params.append(raw_password)
-            if area_id is not None:
-                sets.append("usuario_area_id = %s")
-                params.append(int(area_id))
-            params.append(uid)
-            cur.execute(f"UPDATE inv.usuarios SET {', '.join(sets)} WHERE usuario_id=%s", params)
-        else:
-            cur.execute("""
-              INSERT INTO inv.usuarios(
-                usuario_username, usuario_password_bcrypt, rol_id, usuario_area_id, usuario_activo
-              ) VALUES (%s, crypt(%s, gen_salt('bf')), %s, %s, true)
-            """, (uname, raw_password or uname, rid, int(area_id) if area_id is not None else None))
+    invalidate_user(*[u for u, _, _ in upd], *nuevos)
+    return {"creados": len(nuevos), "actualizados": len(upd), "sin_cambios": len(existentes) - len(upd)}
@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, current_app
 from app.core.security import require_roles
 from app.jobs.notifs_job import send_pending_notifs
+from app.jobs import particiones_job
 
 bp = Blueprint("admin_jobs", __name__, url_prefix="/api/admin/jobs")
 
@@ -9,3 +10,19 @@ bp = Blueprint("admin_jobs", __name__, url_prefix="/api/admin/jobs")
 def run_send_notifs():
     n, ids = send_pending_notifs("admin-job")
     return jsonify({"sent": n, "ids": ids})
+
+@bp.get("/particiones")
+@require_roles(["ADMIN"])
+def list_particiones():
+    return jsonify(particiones_job.list_partitions(request.claims["username"]))
+
+@bp.post("/particiones")
+@require_roles(["ADMIN"])
+def run_particiones():
+    d = request.get_json(silent=True) or {}
+    res = particiones_job.run_maintenance(
+        particiones_job.archive_dir_for(current_app.instance_path),
+        app_user=request.claims["username"],
+        dry_run=bool(d.get("dry_run")),
+    )
+    return jsonify(res), (500 if res["retencion"]["errores"] else 200)
@@ -0,0 +1,50 @@
+from flask import Blueprint, Response, jsonify, request
+from app.core.security import require_roles
+from app.core import profiler, slow_queries
+
+bp = Blueprint("admin_perf", __name__, url_prefix="/api/admin")
+
+@bp.get("/slow-queries")
+@require_roles(["ADMIN"])
+def list_slow_queries():
+    limit = request.args.get("limit", default=50, type=int)
+    with_plan = request.args.get("plan", "1").lower() not in ("0", "false", "no")
+    return jsonify({**slow_queries.stats(), "items": slow_queries.recent(limit, with_plan)})
+
+@bp.delete("/slow-queries")
+@require_roles(["ADMIN"])
+def clear_slow_queries():
+    slow_queries.clear()
+    return jsonify({"ok": True})
+
+@bp.get("/profiles")
+@require_roles(["ADMIN"])
+def list_profiles():
+    return jsonify({"config": profiler.config(), "items": profiler.list_profiles()})
+
+@bp.get("/profiles/<endpoint>")
+@require_roles(["ADMIN"])
+def get_profile(endpoint):
+    folded = profiler.merged(endpoint)
+    if folded is None:
+        return jsonify({"error": "Sin perfil para ese endpoint"}), 404
+    return Response(folded, mimetype="text/plain",
+                    headers={"Content-Disposition": f'attachment; filename="{endpoint}.folded"'})
+
+@bp.post("/profiles/config")
+@require_roles(["ADMIN"])
+def set_profile_config():
+    d = request.get_json(silent=True) or {}
+    rate, endpoints = d.get("rate"), d.get("endpoints")
+    try:
+        rate = None if rate is None else float(rate)
+    except (TypeError, ValueError):
+        return jsonify({"error": "rate debe ser un número entre 0 y 1"}), 400
+    if endpoints is not None and not isinstance(endpoints, list):
+        return jsonify({"error": "endpoints debe ser una lista"}), 400
+    return jsonify(profiler.set_config(rate, endpoints))
+
+@bp.delete("/profiles")
+@require_roles(["ADMIN"])
+def clear_profiles():
+    return jsonify({"borrados": profiler.clear()})
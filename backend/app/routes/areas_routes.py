@@ -1,19 +1,23 @@
 from flask import Blueprint, jsonify, request
 from app.core.security import require_auth, require_admin
+from app.core.http_cache import etag_version
+from app.models.item_model import parse_fields
 from app.models.area_model import (
     list_areas, list_root_areas, list_area_items,
-    create_root_area, create_sub_area, get_area_info
+    create_root_area, create_sub_area, get_area_info, areas_version
 )
 
 bp = Blueprint("areas", __name__, url_prefix="/api/areas")
 
 @bp.get("")
 @require_auth
+@etag_version(areas_version)
 def get_areas():
     return jsonify(list_areas(request.claims["username"]))
 
 @bp.get("/roots")
 @require_auth
+@etag_version(areas_version)
 def get_roots():
     return jsonify(list_root_areas(request.claims["username"]))
 
@@ -27,10 +31,12 @@ def get_area_items(area_id: int):
     tipo  = request.args.get("tipo")            # nombre del tipo (p.ej. DISCO)
     fdes  = request.args.get("desde")           # YYYY-MM-DD
     fhas  = request.args.get("hasta")           # YYYY-MM-DD
+    fields = parse_fields(request.args.get("fields"))   # ficha,fotos (opcional)
 
     data = list_area_items(
         request.claims["username"],
-        area_id, clase, estado, page, size, tipo, fdes, fhas
+        area_id, clase, estado, page, size, tipo, fdes, fhas,
+        fields=fields,
     )
     return jsonify(data)
 
@@ -3,8 +3,10 @@ from app.core.security import require_auth, require_roles
 from app.models.equipo_model import (
     list_area_equipos_paged,
     get_equipo_detalle,
+    parse_expand,
     list_items_disponibles,
     create_equipo_con_items,
+    create_equipos_en_lote,
     assign_item_to_equipo,
     unassign_item,
     update_equipo_meta,
@@ -19,7 +21,9 @@ bp = Blueprint("equipos", __name__, url_prefix="/api")
 @bp.get("/equipos/<int:equipo_id>")
 @require_auth
 def equipo_detalle(equipo_id: int):
-    data = get_equipo_detalle(request.claims["username"], equipo_id)
+    # ?expand=ficha,fotos,prestamo (o all): todo en un solo round-trip
+    expand = parse_expand(request.args.get("expand"))
+    data = get_equipo_detalle(request.claims["username"], equipo_id, expand)
     if not data:
         return {"error": "No encontrado"}, 404
     return jsonify(data)
@@ -79,6 +83,47 @@ def crear_equipo(area_id: int):
     return {"equipo_id": equipo_id}
 
 
+@bp.post("/areas/<int:area_id>/equipos/lote")
+@require_roles(["ADMIN", "PRACTICANTE"])
+def crear_equipos_lote(area_id: int):
+    """
+    Body JSON:
+    {
+      "cantidad": 40,
+      "prefix": "LAB1-PC-", "pad": 3,
+      "nombre": "Laboratorio 1 · PC {n}",     // patrón: {codigo} {n} {num}
+      "estado": "USO", "usuario_final": null,
+      "login": "lab1-{num}", "password": "{codigo}",
+      "items": [[{"item_id": 10, "slot": "RAM1"}], ...],   // opcional, uno por PC
+      "picks": [{"tipo": "MEMORIA", "clase": "COMPONENTE", "cantidad": 2}]  // opcional
+    }
+    """
+    d = request.get_json(force=True) or {}
+    try:
+        cantidad = int(d.get("cantidad") or 0)
+        pad = int(d.get("pad") or 3)
+    except (TypeError, ValueError):
+        return {"error": "cantidad/pad inválidos"}, 400
+    nombre = (d.get("nombre") or "").strip()
+    if not nombre or cantidad < 1:
+        return {"error": "cantidad y nombre son requeridos"}, 400
+
+    resumen, err = create_equipos_en_lote(
+        request.claims["username"], area_id, cantidad, nombre,
+        prefix=d.get("prefix"),
+        pad=pad,
+        estado=(d.get("estado") or "USO").strip().upper(),
+        usuario_final=(d.get("usuario_final") or "").strip() or None,
+        login_patron=(d.get("login") or "").strip() or None,
+        password_patron=(d.get("password") or "").strip() or None,
+        items_por_equipo=d.get("items") or None,
+        picks=d.get("picks") or None,
+    )
+    if err:
+        return {"error": err}, 400
+    return jsonify(resumen)
+
+
 @bp.post("/equipos/<int:equipo_id>/items")
 @require_auth
 @require_roles(["ADMIN", "PRACTICANTE"])
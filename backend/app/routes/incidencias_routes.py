@@ -26,6 +26,7 @@ def crear():
         titulo, descripcion,
         int(equipo_id) if equipo_id else None,
         email or None,
+        usuario_area_id=request.claims.get("area_id"),
     )
     if err:
         return {"error": err}, 400
@@ -47,6 +48,7 @@ def listar():
         mine=mine, estado=estado,
         page=page, size=size,
         q=q, area_id=area_id,
+        rol=request.claims.get("rol"),
     )
     return jsonify(data)
 
@@ -102,5 +104,5 @@ def estado(incidencia_id: int):
 @require_auth
 def updates():
     since_id = request.args.get("since_id", type=int)
-    data = list_updates(request.claims["username"], since_id)
+    data = list_updates(request.claims["username"], since_id, rol=request.claims.get("rol"))
     return jsonify(data)
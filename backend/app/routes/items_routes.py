@@ -2,8 +2,10 @@
 import os
 from flask import Blueprint, request, jsonify, current_app
 from app.core.security import require_auth, require_roles
+from app.core.http_cache import etag_version
 from app.models.item_model import (
-    list_item_types, create_item_type, create_item_with_specs, get_item_detail,
+    list_item_types, item_types_version, create_item_type, get_item_fichas, parse_fields,
+    get_items_detail, ITEMS_BATCH_MAX, upsert_ficha, create_item_with_specs, get_item_detail,
     upsert_attribute_and_value, add_photo, suggest_next_code, remove_photo
 )
 from app.models.area_model import get_area_info
@@ -15,6 +17,7 @@ bp = Blueprint("items", __name__, url_prefix="/api")
 # =========================
 @bp.get("/item-types")
 @require_auth
+@etag_version(item_types_version)
 def item_types():
     clase = request.args.get("clase")
     return jsonify(list_item_types(request.claims["username"], clase))
@@ -70,6 +73,51 @@ def item_detail(item_id: int):
         return {"error": "No encontrado"}, 404
     return jsonify(data)
 
+def _parse_ids(raw) -> list[int]:
+    """'1,2,3' o [1, 2, 3] -> [1, 2, 3]; ignora valores no numéricos."""
+    if raw is None:
+        return []
+    parts = raw.split(",") if isinstance(raw, str) else raw
+    out = []
+    for x in parts:
+        try:
+            out.append(int(str(x).strip()))
+        except (TypeError, ValueError):
+            pass
+    return out
+
+# Detalle de varios ítems en una sola consulta (GET ?ids=1,2,3 o POST con lista larga)
+@bp.get("/items")
+@require_auth
+def items_detail_batch():
+    ids = _parse_ids(request.args.get("ids"))
+    if not ids:
+        return {"error": "ids requerido (ej: ?ids=1,2,3)"}, 400
+    if len(set(ids)) > ITEMS_BATCH_MAX:
+        return {"error": f"Máximo {ITEMS_BATCH_MAX} ids por consulta"}, 400
+    return jsonify(get_items_detail(request.claims["username"], ids))
+
+@bp.post("/items/batch")
+@require_auth
+def items_detail_batch_post():
+    d = request.get_json(force=True) or {}
+    ids = _parse_ids(d.get("ids"))
+    if not ids:
+        return {"error": "ids requerido"}, 400
+    if len(set(ids)) > ITEMS_BATCH_MAX:
+        return {"error": f"Máximo {ITEMS_BATCH_MAX} ids por consulta"}, 400
+    return jsonify(get_items_detail(request.claims["username"], ids))
+
+# Ficha/fotos bajo demanda para varios ítems (la grilla del área no las trae)
+@bp.get("/items/fichas")
+@require_auth
+def items_fichas():
+    ids = _parse_ids(request.args.get("ids"))
+    if not ids:
+        return {"error": "ids requerido (ej: ?ids=1,2,3)"}, 400
+    fields = parse_fields(request.args.get("fields"), default=("ficha",)) or ("ficha",)
+    return jsonify({"items": get_item_fichas(request.claims["username"], ids, fields)})
+
 # =========================
 # Specs (upsert)
 # =========================
@@ -92,6 +140,20 @@ def item_upsert_spec(item_id: int):
         return {"error": err}, 400
     return {"ok": True}
 
+# Ficha completa en un solo request: {"ficha": {"RAM": 16, "Marca": {"data_type": "text", "value": "HP"}}}
+@bp.put("/items/<int:item_id>/specs")
+@require_auth
+@require_roles(["ADMIN", "PRACTICANTE"])
+def item_upsert_ficha(item_id: int):
+    d = request.get_json(force=True) or {}
+    ficha = d.get("ficha")
+    if not isinstance(ficha, dict) or not ficha:
+        return {"error": "ficha requerida (objeto atributo -> valor)"}, 400
+    res, err = upsert_ficha(request.claims["username"], item_id, ficha)
+    if err:
+        return {"error": err}, 400
+    return {"ok": True, **res}
+
 # =========================
 # Fotos (atajos REST extras)
 # =========================
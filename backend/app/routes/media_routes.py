@@ -3,6 +3,7 @@ import os
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 from app.core.security import require_auth, require_roles
+from app.core import tracing
 from app.models.media_model import add_media, delete_media
 
 bp = Blueprint("item_media", __name__, url_prefix="/api/items")
@@ -63,7 +64,10 @@ def upload_item_media(item_id: int):
             i += 1
 
         # Guardar a disco
-        f.save(path_fs)
+        with tracing.span("fs.write", path=fname) as sp:
+            f.save(path_fs)
+            if sp is not None:
+                sp.set(bytes=os.path.getsize(path_fs))
 
         # Ruta pública servida por /uploads/<fname>
         rel = f"/uploads/{fname}"
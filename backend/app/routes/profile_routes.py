@@ -1,6 +1,7 @@
 # backend/app/routes/profile_routes.py
 from flask import Blueprint, request
 from app.core.security import require_auth
+from app.core.auth_context import user_state, invalidate_user
 from app.db import get_conn
 from app.utils.mailer import send_mail_safe
 
@@ -12,20 +13,14 @@ bp = Blueprint("profile", __name__, url_prefix="/api/profile")
 @require_auth
 def get_profile():
     """
-    Devuelve username, rol (del JWT) y email (desde BD).
+    Devuelve username, rol (claims) y email (estado cacheado del usuario, ver auth_context).
     """
     username = request.claims["username"]
     rol = request.claims.get("rol")
 
     email = None
     try:
-        with get_conn(username) as (conn, cur):
-            cur.execute(
-                "SELECT usuario_email FROM inv.usuarios WHERE usuario_username=%s",
-                (username,),
-            )
-            row = cur.fetchone()
-            email = row[0] if row and row[0] else None
+        email = user_state(username).email
     except Exception:
         email = None
 
@@ -56,6 +51,7 @@ def set_email():
                 """,
                 (email,),
             )
+        invalidate_user(username)
         return {"ok": True, "email": email}
     except Exception as e:
         # índice único case-insensitive sobre email
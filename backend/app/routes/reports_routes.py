@@ -9,7 +9,7 @@ bp = Blueprint("reports", __name__, url_prefix="/api/reports")
 @require_auth
 def counts():
     # Pasamos el username para auditoría (aunque sea solo lectura)
-    with get_conn(request.claims["username"]) as (conn, cur):
+    with get_conn(request.claims["username"], readonly=True) as (conn, cur):
         cur.execute("SELECT COUNT(*) FROM inv.areas")
         areas = cur.fetchone()[0]
         cur.execute("SELECT COUNT(*) FROM inv.equipos")
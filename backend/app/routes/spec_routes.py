@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.core.security import require_auth, require_roles
-from app.models.spec_model import get_attrs_for_type, define_attr
+from app.models.spec_model import get_attrs_for_type, define_attr, search_by_specs, parse_search_filters
+from app.models.item_model import parse_fields
 
 bp = Blueprint("spec", __name__, url_prefix="/api/spec")
 
@@ -30,3 +31,48 @@ def create_attr():
 
     define_attr(request.claims["username"], clase, tipo, nombre_attr, data_type)
     return {"ok": True}
+
+# =========================
+# Búsqueda por ficha
+#   GET  /api/spec/search?clase=COMPONENTE&tipo=RAM&area_id=3&f=Capacidad:gte:8&f=Tipo:in:DDR4|DDR5&facetas=Tipo
+#   POST /api/spec/search {"clase", "tipo", "area_id", "filtros": [{"attr", "op", "value"}], "facetas": [...]}
+# =========================
+def _search(d: dict, filtros: list, facetas: list):
+    clase = (d.get("clase") or "").upper()
+    tipo = (d.get("tipo") or "").strip()
+    if clase not in ("COMPONENTE","PERIFERICO") or not tipo:
+        return {"error":"clase y tipo requeridos"}, 400
+    try:
+        area_id = int(d["area_id"]) if d.get("area_id") not in (None, "") else None
+        page = int(d.get("page") or 1)
+        size = int(d.get("size") or 50)
+    except (TypeError, ValueError):
+        return {"error":"area_id/page/size inválidos"}, 400
+    subareas = str(d.get("subareas", "true")).lower() not in ("0", "false", "no")
+    fields = d.get("fields")
+    fields = parse_fields(",".join(fields) if isinstance(fields, list) else fields)
+
+    data, err = search_by_specs(
+        request.claims["username"], clase, tipo, filtros, facetas,
+        area_id=area_id, incluir_subareas=subareas, estado=(d.get("estado") or None),
+        page=page, size=size, fields=fields,
+    )
+    if err:
+        return {"error": err}, 400
+    return jsonify(data)
+
+@bp.get("/search")
+@require_auth
+def search_get():
+    facetas = [x.strip() for x in (request.args.get("facetas") or "").split(",") if x.strip()]
+    return _search(request.args, parse_search_filters(request.args.getlist("f")), facetas)
+
+@bp.post("/search")
+@require_auth
+def search_post():
+    d = request.get_json(force=True) or {}
+    filtros = d.get("filtros") or []
+    facetas = d.get("facetas") or []
+    if not isinstance(filtros, list) or not isinstance(facetas, list):
+        return {"error":"filtros y facetas deben ser listas"}, 400
+    return _search(d, [f for f in filtros if isinstance(f, dict)], facetas)
@@ -2,10 +2,13 @@
 import os
 import smtplib
 import ssl
+import time
 from email.message import EmailMessage
 from email.utils import formataddr
 from typing import Iterable, Optional, Dict, Any
 
+from app.core import metrics, tracing
+
 MAIL_HOST = os.getenv("MAIL_HOST", "smtp.gmail.com")
 MAIL_PORT = int(os.getenv("MAIL_PORT", "587"))
 
@@ -110,15 +113,21 @@ def send_mail_safe(
 
     if not (MAIL_HOST and MAIL_PORT and MAIL_USER and MAIL_PASS and MAIL_FROM and dest):
         print("[mailer] configuración SMTP incompleta; mensaje no enviado")
+        metrics.observe_mail("sin_config")
         return False
 
+    t0 = time.perf_counter()
     try:
         ctx = ssl.create_default_context()
-        with smtplib.SMTP(MAIL_HOST, MAIL_PORT, timeout=20) as s:
-            s.ehlo()
-            s.starttls(context=ctx)
-            s.ehlo()
-            s.login(MAIL_USER, MAIL_PASS)
+        with tracing.span("mail.connect", tracing.KIND_CLIENT, host=MAIL_HOST, port=MAIL_PORT):
+            s = smtplib.SMTP(MAIL_HOST, MAIL_PORT, timeout=20)
+        with s:
+            with tracing.span("mail.tls"):
+                s.ehlo()
+                s.starttls(context=ctx)
+                s.ehlo()
+            with tracing.span("mail.login"):
+                s.login(MAIL_USER, MAIL_PASS)
 
             msg = _build_message(
                 subject=subject,
@@ -132,8 +141,11 @@ def send_mail_safe(
             )
 
             all_rcpt = dest + cc_list + getattr(msg, "_bcc", [])
-            s.send_message(msg, from_addr=MAIL_FROM, to_addrs=all_rcpt)
+            with tracing.span("mail.send", rcpt=len(all_rcpt)):
+                s.send_message(msg, from_addr=MAIL_FROM, to_addrs=all_rcpt)
+        metrics.observe_mail("ok", time.perf_counter() - t0)
         return True
     except Exception as e:
         print(f"[mailer] error enviando correo: {e}")
+        metrics.observe_mail("error", time.perf_counter() - t0)
         return False
@@ -0,0 +1,6 @@
+# Entrada ASGI opcional (lecturas async + long-poll de incidencias).
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+# El modo WSGI (wsgi.py + gunicorn) sigue siendo el predeterminado.
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,133 @@
+# backend/bench/bench_asgi.py
+"""
+Compara throughput/latencia del modo sync (gunicorn + wsgi.py) contra el modo
+ASGI (uvicorn + asgi.py) sobre las mismas rutas de lectura. Solo stdlib.
+
+Ejemplo (dos servidores levantados contra la misma BD):
+  gunicorn -w 4 -b 127.0.0.1:5000 wsgi:app
+  uvicorn asgi:app --port 5001 --workers 1
+  python bench/bench_asgi.py --sync http://127.0.0.1:5000 --async http://127.0.0.1:5001 \
+      --user admin --password admin --concurrency 100 --duration 15 \
+      --path /api/areas --path "/api/movimientos?size=50"
+
+Con --longpoll N se abren además N clientes de /api/incidencias/updates?wait=25
+en paralelo (sólo tiene efecto real en modo ASGI) para medir cuánto se degrada
+el resto del tráfico con miles de clientes esperando.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+def login(base: str, user: str, password: str) -> str:
+    req = urllib.request.Request(
+        base + "/api/auth/login",
+        data=json.dumps({"username": user, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=30) as r:
+        return json.loads(r.read())["token"]
+
+
+async def http_get(base: str, path: str, token: str, timeout: float = 60.0) -> Tuple[int, int]:
+    """GET mínimo HTTP/1.1 (Connection: close). Devuelve (status, bytes)."""
+    u = urlsplit(base)
+    host, port = u.hostname, u.port or 80
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {token}\r\n"
+            f"Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status = int(data.split(b" ", 2)[1]) if data.startswith(b"HTTP/") else 0
+    return status, len(data)
+
+
+async def run_load(base: str, paths: List[str], token: str, concurrency: int, duration: float) -> Dict:
+    lat: List[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def worker(k: int):
+        nonlocal errors
+        i = k
+        while time.perf_counter() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                status, _ = await http_get(base, path, token)
+                if status != 200:
+                    errors += 1
+                    continue
+            except Exception:
+                errors += 1
+                continue
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda p: (lat[min(len(lat) - 1, int(p * len(lat)))] * 1000) if lat else float("nan")
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "rps": len(lat) / elapsed if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(lat) * 1000 if lat else float("nan"),
+    }
+
+
+async def bench_mode(name: str, base: str, args, token: str) -> Dict:
+    holders: List[asyncio.Task] = []
+    if args.longpoll:
+        path = "/api/incidencias/updates?since_id=2147483647&wait=25"
+        holders = [asyncio.create_task(http_get(base, path, token, timeout=90)) for _ in range(args.longpoll)]
+        await asyncio.sleep(1.0)
+    res = await run_load(base, args.path, token, args.concurrency, args.duration)
+    for t in holders:
+        t.cancel()
+    await asyncio.gather(*holders, return_exceptions=True)
+    res["mode"] = name
+    return res
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sync", help="URL base del modo WSGI")
+    ap.add_argument("--async", dest="async_", help="URL base del modo ASGI")
+    ap.add_argument("--user", default="admin")
+    ap.add_argument("--password", default="admin")
+    ap.add_argument("--path", action="append", help="ruta GET a medir (repetible)")
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--longpoll", type=int, default=0, help="clientes long-poll simultáneos")
+    args = ap.parse_args(argv)
+    args.path = args.path or ["/api/areas", "/api/item-types", "/api/movimientos?size=50"]
+
+    targets = [(n, b) for n, b in (("sync", args.sync), ("async", args.async_)) if b]
+    if not targets:
+        ap.error("indica --sync y/o --async")
+
+    print(f"{'modo':<6} {'req':>7} {'err':>5} {'rps':>9} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}")
+    for name, base in targets:
+        token = login(base, args.user, args.password)
+        r = asyncio.run(bench_mode(name, base, args, token))
+        print(f"{r['mode']:<6} {r['requests']:>7} {r['errors']:>5} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
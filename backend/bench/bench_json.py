@@ -0,0 +1,127 @@
+# backend/bench/bench_json.py
+"""
+Costo de serializar una página de GET /api/movimientos (sin BD): arma filas
+sintéticas con la misma forma que devuelve el cursor (datetimes con zona,
+mov_detalle/antes/despues JSONB) y compara:
+
+  antes    dict por fila (como el antiguo _row_to_mov) + DefaultJSONProvider de Flask
+  despues  RowSet + FastJSONProvider (orjson si está instalado)
+  stdlib   RowSet + json de la stdlib (lo que se usa si falta orjson)
+
+Ejemplo:
+  python bench/bench_json.py --size 200 --repeat 500
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app.core import json_provider  # noqa: E402
+from app.core.json_provider import FastJSONProvider, RowSet  # noqa: E402
+
+COLS = [
+    "mov_id", "mov_item_id", "item_codigo", "clase", "item_tipo", "mov_tipo", "mov_fecha",
+    "mov_origen_area_id", "origen_area_nombre", "mov_destino_area_id", "destino_area_nombre",
+    "mov_equipo_id", "equipo_codigo", "equipo_nombre", "mov_usuario_app", "mov_motivo",
+    "mov_detalle", "es_audit",
+]
+
+
+def synth_rows(n: int) -> List[tuple]:
+    tz = datetime.timezone(datetime.timedelta(hours=-5))
+    base = datetime.datetime(2025, 3, 1, 8, 0, tzinfo=tz)
+    rows = []
+    for i in range(n):
+        if i % 4 == 3:
+            detalle = {
+                "entidad": "items", "entidad_id": 1000 + i,
+                "antes": {"estado": "ALMACEN", "area_id": 3, "item_codigo": f"CPU-{i:05d}"},
+                "despues": {"estado": "EN_USO", "area_id": 3, "item_codigo": f"CPU-{i:05d}"},
+                "extra": {"proc": "equipos.asignar"},
+            }
+            rows.append((i, None, None, None, None, "UPDATE", base + datetime.timedelta(minutes=i),
+                         None, None, None, None, None, None, None, "admin", "equipos.asignar",
+                         detalle, True))
+        else:
+            rows.append((i, 1000 + i, f"CPU-{i:05d}", "COMPONENTE", "Procesador", "ASIGNACION",
+                         base + datetime.timedelta(minutes=i), 3, "Laboratorio 3", 3, "Laboratorio 3",
+                         50 + i % 20, f"PC-{i % 20:03d}", f"PC {i % 20}", "admin", None,
+                         {"slot": "CPU"}, False))
+    return rows
+
+
+def row_to_mov(r) -> Dict[str, Any]:
+    return {
+        "mov_id": r[0], "mov_item_id": r[1], "item_codigo": r[2], "clase": r[3],
+        "item_tipo": r[4], "mov_tipo": r[5], "mov_fecha": r[6],
+        "mov_origen_area_id": r[7], "origen_area_nombre": r[8],
+        "mov_destino_area_id": r[9], "destino_area_nombre": r[10],
+        "mov_equipo_id": r[11], "equipo_codigo": r[12], "equipo_nombre": r[13],
+        "mov_usuario_app": r[14], "mov_motivo": r[15], "mov_detalle": r[16],
+        "es_audit": bool(r[17]),
+    }
+
+
+def timeit(fn: Callable[[], bytes], repeat: int) -> Dict[str, Any]:
+    fn()  # calentamiento
+    lat = []
+    size = 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        size = len(fn())
+        lat.append(time.perf_counter() - t)
+    lat.sort()
+    return {
+        "p50_us": round(statistics.median(lat) * 1e6, 1),
+        "p95_us": round(lat[int(0.95 * (len(lat) - 1))] * 1e6, 1),
+        "bytes": size,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", type=int, default=200, help="filas por página")
+    ap.add_argument("--repeat", type=int, default=500)
+    args = ap.parse_args()
+
+    rows = synth_rows(args.size)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    def antes() -> bytes:
+        data = {"items": [row_to_mov(r) for r in rows], "total": 5000, "page": 1, "size": args.size}
+        return default.response(data).get_data()
+
+    def despues() -> bytes:
+        data = {"items": RowSet(COLS, rows), "total": 5000, "page": 1, "size": args.size}
+        return fast.response(data).get_data()
+
+    def stdlib() -> bytes:
+        data = {"items": RowSet(COLS, rows), "total": 5000, "page": 1, "size": args.size}
+        return json.dumps(data, default=json_provider._default, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    with app.app_context():
+        res = {
+            "filas": args.size,
+            "orjson": json_provider.HAVE_ORJSON,
+            "antes": timeit(antes, args.repeat),
+            "despues": timeit(despues, args.repeat),
+            "stdlib": timeit(stdlib, args.repeat),
+        }
+    res["speedup_p50"] = round(res["antes"]["p50_us"] / res["despues"]["p50_us"], 1)
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# backend/bench/bench_login.py
+"""
+Benchmark de login ("inicio de turno"): muchos usuarios haciendo POST
+/api/auth/login en pocos segundos. Solo stdlib.
+
+Ejemplo (API levantada; BCRYPT_ROUNDS igual al de los hashes para no medir re-hash):
+  python bench/bench_login.py --base http://127.0.0.1:5000 \
+      --user "lab{n}" --password "lab{n}" --count 200 --concurrency 50
+
+{n} se reemplaza por 1..count (mismo patrón que los logins de equipos en lote).
+Comparar la CPU de Postgres (pg_stat_statements / top) entre una corrida con el
+paquete bcrypt instalado y otra sin él (verificación con crypt() en la BD).
+
+Con --offline no se usa HTTP: mide hash/verify de app.core.passwords en este
+proceso con los hilos configurados (BCRYPT_WORKERS).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+
+def login(base: str, user: str, password: str, timeout: float) -> Tuple[int, float]:
+    req = urllib.request.Request(
+        base + "/api/auth/login",
+        data=json.dumps({"username": user, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            r.read()
+            status = r.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, time.perf_counter() - t0
+
+
+def pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))]
+
+
+def summary(lat: List[float], elapsed: float, statuses: Dict[int, int]) -> Dict:
+    return {
+        "logins": len(lat),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(lat) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(pct(lat, 50) * 1000, 1),
+        "p95_ms": round(pct(lat, 95) * 1000, 1),
+        "p99_ms": round(pct(lat, 99) * 1000, 1),
+        "max_ms": round(max(lat) * 1000, 1) if lat else 0,
+        "mean_ms": round(statistics.mean(lat) * 1000, 1) if lat else 0,
+        "status": statuses,
+    }
+
+
+def run_http(args) -> Dict:
+    creds = [(args.user.replace("{n}", str(n)), args.password.replace("{n}", str(n)))
+             for n in range(1, args.count + 1)]
+    creds = creds * args.rounds
+    lat: List[float] = []
+    statuses: Dict[int, int] = {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        for status, dt in ex.map(lambda c: login(args.base, c[0], c[1], args.timeout), creds):
+            lat.append(dt)
+            statuses[status] = statuses.get(status, 0) + 1
+    return summary(lat, time.perf_counter() - t0, statuses)
+
+
+def run_offline(args) -> Dict:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.core import passwords
+
+    if not passwords.HAVE_BCRYPT:
+        raise SystemExit("--offline requiere el paquete bcrypt")
+    hashed = passwords.hash_password("clave-de-prueba")
+    lat: List[float] = []
+
+    def one(_):
+        t = time.perf_counter()
+        ok = passwords.verify("clave-de-prueba", hashed)
+        return ok, time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    ok_count = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        for ok, dt in ex.map(one, range(args.count * args.rounds)):
+            lat.append(dt)
+            ok_count += 1 if ok else 0
+    out = summary(lat, time.perf_counter() - t0, {200: ok_count})
+    out["rounds"] = passwords.ROUNDS
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default="http://127.0.0.1:5000")
+    ap.add_argument("--user", default="lab{n}", help="patrón de usuario ({n} = 1..count)")
+    ap.add_argument("--password", default="lab{n}", help="patrón de clave ({n} = 1..count)")
+    ap.add_argument("--count", type=int, default=200, help="usuarios distintos")
+    ap.add_argument("--rounds", type=int, default=1, help="veces que loguea cada usuario")
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--offline", action="store_true", help="mide app.core.passwords sin HTTP")
+    args = ap.parse_args()
+
+    res = run_offline(args) if args.offline else run_http(args)
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# backend/bench/bench_models.py
+"""
+Micro-benchmarks de las funciones públicas de los modelos contra una BD
+sembrada (bench/seed.py), con línea base y chequeo de regresiones.
+
+Por cada caso:
+  - latencia p50/p95 de N llamadas (tras unas de calentamiento),
+  - cantidad de sentencias SQL por llamada (app.core.stmt_stats.collect),
+  - EXPLAIN (ANALYZE, BUFFERS) de cada SELECT que ejecutó: tiempo en la BD,
+    bloques leídos (shared hit + read) y Seq Scans.
+
+--guardar escribe la línea base (bench/baselines/models.json por defecto;
+generarla en la máquina de referencia con la misma escala de datos). Sin
+--guardar compara contra ella y sale con código 1 si algún caso:
+  - sube su p95 más de --umbral (fracción) y más de --min-ms,
+  - ejecuta más sentencias que en la base,
+  - lee más de --umbral-bloques más bloques (y al menos 100 más).
+
+Ejemplos:
+  python bench/seed.py --dsn postgresql://.../inv_bench --migrar --reset --escala 0.1
+  python bench/bench_models.py --dsn postgresql://.../inv_bench --guardar
+  python bench/bench_models.py --dsn postgresql://.../inv_bench --solo 'auditoria|incidencias' --n 50
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "models.json")
+_RX_SELECT = re.compile(r"^\s*(?:--[^\n]*\n\s*)*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+# ============================================================
+# Datos de la BD sembrada
+# ============================================================
+def fixtures(dsn: str) -> Dict[str, Any]:
+    with psycopg.connect(dsn) as conn:
+        cur = conn.cursor()
+
+        def uno(sql, params=()):
+            cur.execute(sql, params)
+            r = cur.fetchone()
+            return r[0] if r else None
+
+        fx: Dict[str, Any] = {}
+        fx["area"] = uno("SELECT area_id FROM inv.items GROUP BY area_id ORDER BY count(*) DESC LIMIT 1")
+        fx["equipo"] = uno("""
+          SELECT equipo_id FROM inv.equipo_items GROUP BY equipo_id ORDER BY count(*) DESC, equipo_id LIMIT 1
+        """)
+        fx["admin"] = uno("""
+          SELECT u.usuario_username FROM inv.usuarios u JOIN inv.roles r USING (rol_id)
+          WHERE r.rol_nombre = 'ADMIN' ORDER BY u.usuario_id LIMIT 1
+        """)
+        fx["reportante"] = uno("SELECT reportado_por FROM inv.incidencias GROUP BY 1 ORDER BY count(*) DESC LIMIT 1")
+        fx["practicante"] = uno("SELECT asignado_a FROM inv.incidencias WHERE asignado_a IS NOT NULL GROUP BY 1 ORDER BY count(*) DESC LIMIT 1")
+        fx["since_id"] = max(0, (uno("SELECT max(msg_id) FROM inv.incidencia_mensajes") or 0) - 200)
+        cur.execute("""
+          SELECT t.clase, t.nombre FROM inv.items i JOIN inv.item_tipos t USING (item_tipo_id)
+          WHERE i.area_id = %s GROUP BY 1, 2 ORDER BY count(*) DESC LIMIT 1
+        """, (fx["area"],))
+        fx["clase"], fx["tipo"] = cur.fetchone() or ("COMPONENTE", "RAM")
+        hasta = uno("SELECT max(mov_fecha)::date FROM inv.movimientos") or datetime.date.today()
+        fx["hasta"] = hasta.isoformat()
+        fx["desde"] = (hasta - datetime.timedelta(days=30)).isoformat()
+        # ítems libres del área para create_equipo_con_items
+        cur.execute("""
+          SELECT i.item_id FROM inv.items i
+          WHERE i.area_id = %s AND i.estado = 'ALMACEN'
+            AND NOT EXISTS (SELECT 1 FROM inv.equipo_items ei WHERE ei.item_id = i.item_id)
+          ORDER BY i.item_id LIMIT 3
+        """, (fx["area"],))
+        fx["libres"] = [r[0] for r in cur.fetchall()]
+        # huella del dataset (audit_log no: crece con cada corrida de los casos que escriben)
+        cur.execute("SELECT (SELECT count(*) FROM inv.items), (SELECT count(*) FROM inv.movimientos), "
+                    "(SELECT count(*) FROM inv.incidencias), current_setting('server_version')")
+        r = cur.fetchone()
+        fx["datos"] = {"items": r[0], "movimientos": r[1], "incidencias": r[2], "pg": r[3]}
+    if not fx["area"] or not fx["admin"]:
+        sys.exit("La BD no está sembrada: correr bench/seed.py primero")
+    return fx
+
+
+def _limpiar_equipo(dsn: str, equipo_id: Optional[int], items: List[int]):
+    """Deshace create_equipo_con_items para que cada iteración parta del mismo estado."""
+    if not equipo_id:
+        return
+    with psycopg.connect(dsn) as conn:
+        conn.execute("DELETE FROM inv.equipo_items WHERE equipo_id = %s", (equipo_id,))
+        conn.execute("DELETE FROM inv.movimientos WHERE mov_equipo_id = %s", (equipo_id,))
+        conn.execute("DELETE FROM inv.equipos WHERE equipo_id = %s", (equipo_id,))
+        conn.execute("UPDATE inv.items SET estado = 'ALMACEN' WHERE item_id = ANY(%s)", (items,))
+
+
+# ============================================================
+# Casos
+# ============================================================
+def casos(fx: Dict[str, Any], dsn: str) -> Dict[str, Tuple[Callable[[], Any], Optional[Callable[[Any], None]]]]:
+    """{nombre: (llamada, limpieza(resultado) | None)}"""
+    from app.models.area_model import list_area_items
+    from app.models.equipo_model import (
+        create_equipo_con_items, get_equipo_detalle, get_next_equipo_code, list_area_items_biview,
+    )
+    from app.models.incidencia_model import list_incidencias, list_updates
+    from app.models.item_model import suggest_next_code
+    from app.models.mov_model import list_auditoria_flexible
+
+    adm, area = fx["admin"], fx["area"]
+    c: Dict[str, Tuple[Callable[[], Any], Optional[Callable[[Any], None]]]] = {
+        "list_area_items": (lambda: list_area_items(adm, area, None, None, 1, 50), None),
+        "list_area_items.ficha": (lambda: list_area_items(adm, area, None, None, 1, 50, fields=("ficha",)), None),
+        "list_area_items.fechas": (lambda: list_area_items(adm, area, None, None, 1, 50, None,
+                                                           fx["desde"], fx["hasta"]), None),
+        "list_area_items_biview": (lambda: list_area_items_biview(adm, area, None, 1, 50), None),
+    }
+    for fuente in ("MOV", "AUDIT", "MIX"):
+        c[f"list_auditoria_flexible.{fuente}"] = (
+            lambda f=fuente: list_auditoria_flexible(adm, fuente=f, page=1, size=50), None)
+        c[f"list_auditoria_flexible.{fuente}.rango"] = (
+            lambda f=fuente: list_auditoria_flexible(adm, fuente=f, page=1, size=50,
+                                                     desde=fx["desde"], hasta=fx["hasta"]), None)
+        c[f"list_auditoria_flexible.{fuente}.q"] = (
+            lambda f=fuente: list_auditoria_flexible(adm, fuente=f, page=1, size=50, q="RAM"), None)
+    c["list_incidencias.admin"] = (lambda: list_incidencias(adm, page=1, size=20, rol="ADMIN"), None)
+    if fx["reportante"]:
+        c["list_incidencias.usuario"] = (
+            lambda: list_incidencias(fx["reportante"], page=1, size=20, rol="USUARIOS"), None)
+    if fx["practicante"]:
+        c["list_updates.practicante"] = (
+            lambda: list_updates(fx["practicante"], fx["since_id"], rol="PRACTICANTE"), None)
+    c["list_updates.admin"] = (lambda: list_updates(adm, fx["since_id"], rol="ADMIN"), None)
+    if fx["equipo"]:
+        c["get_equipo_detalle"] = (lambda: get_equipo_detalle(adm, fx["equipo"]), None)
+        c["get_equipo_detalle.expand"] = (
+            lambda: get_equipo_detalle(adm, fx["equipo"], expand=("ficha", "fotos", "prestamo")), None)
+    c["suggest_next_code"] = (lambda: suggest_next_code(adm, fx["clase"], fx["tipo"], area), None)
+    c["get_next_equipo_code"] = (lambda: get_next_equipo_code(adm, area), None)
+    if fx["libres"]:
+        items = [{"item_id": i, "slot": f"s{k}"} for k, i in enumerate(fx["libres"])]
+        c["create_equipo_con_items"] = (
+            lambda: create_equipo_con_items(adm, area, "BENCH-001", "bench", "USO", None, None, None, items),
+            lambda res: _limpiar_equipo(dsn, res[0] if res else None, fx["libres"]),
+        )
+    return c
+
+
+# ============================================================
+# Medición
+# ============================================================
+def _plan_resumen(plan: Dict[str, Any], seq: List[str]):
+    if plan.get("Node Type") == "Seq Scan":
+        seq.append(f"{plan.get('Relation Name')} ({plan.get('Actual Rows', 0) * plan.get('Actual Loops', 1)} filas)")
+    for p in plan.get("Plans", []):
+        _plan_resumen(p, seq)
+
+
+def explain(dsn: str, app_user: str, statements) -> Dict[str, Any]:
+    """EXPLAIN (ANALYZE, BUFFERS) de los SELECT capturados, en una transacción que se descarta."""
+    res: Dict[str, Any] = {"sentencias": 0, "db_ms": 0.0, "bloques": 0, "seq_scans": [], "peor": None}
+    peor_ms = -1.0
+    with psycopg.connect(dsn) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT set_config('app.user', %s, true)", (app_user,))
+        for sql, params, _ in statements:
+            if not _RX_SELECT.match(sql) or "set_config(" in sql:
+                continue
+            cur.execute("SAVEPOINT bench")
+            try:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+            except psycopg.Error:
+                cur.execute("ROLLBACK TO SAVEPOINT bench")
+                continue
+            out = cur.fetchone()[0][0]
+            plan = out["Plan"]
+            ms = out.get("Execution Time", 0.0)
+            res["sentencias"] += 1
+            res["db_ms"] += ms
+            res["bloques"] += plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+            _plan_resumen(plan, res["seq_scans"])
+            if ms > peor_ms:
+                peor_ms = ms
+                res["peor"] = {"ms": round(ms, 2), "sql": " ".join(sql.split())[:200]}
+        conn.rollback()
+    res["db_ms"] = round(res["db_ms"], 2)
+    return res
+
+
+def medir(nombre: str, fn: Callable[[], Any], limpieza: Optional[Callable[[Any], None]],
+          n: int, warmup: int, dsn: str, app_user: str) -> Dict[str, Any]:
+    from app.core.stmt_stats import collect
+
+    def una(keep_sql: bool = False):
+        with collect(keep_sql=keep_sql) as st:
+            t0 = time.perf_counter()
+            r = fn()
+            ms = (time.perf_counter() - t0) * 1000
+        if limpieza:
+            limpieza(r)
+        return ms, st
+
+    for _ in range(warmup):
+        una()
+    tiempos, cuentas = [], []
+    for _ in range(n):
+        ms, st = una()
+        tiempos.append(ms)
+        cuentas.append(st.count)
+    _, st = una(keep_sql=True)
+    tiempos.sort()
+    q = statistics.quantiles(tiempos, n=20) if len(tiempos) >= 2 else tiempos * 19
+    return {
+        "n": n,
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(q[18], 3),
+        "min_ms": round(tiempos[0], 3),
+        "sentencias": max(cuentas),
+        "explain": explain(dsn, app_user, st.statements),
+    }
+
+
+# ============================================================
+# Línea base
+# ============================================================
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], umbral: float, min_ms: float,
+             umbral_bloques: float) -> List[str]:
+    fallas = []
+    for nombre, r in actual.items():
+        b = base.get(nombre)
+        if not b:
+            continue
+        if r["p95_ms"] > b["p95_ms"] * (1 + umbral) and r["p95_ms"] - b["p95_ms"] > min_ms:
+            fallas.append(f"{nombre}: p95 {b['p95_ms']} -> {r['p95_ms']} ms")
+        if r["sentencias"] > b["sentencias"]:
+            fallas.append(f"{nombre}: sentencias {b['sentencias']} -> {r['sentencias']}")
+        bb, rb = b["explain"]["bloques"], r["explain"]["bloques"]
+        if rb > bb * (1 + umbral_bloques) and rb - bb >= 100:
+            fallas.append(f"{nombre}: bloques {bb} -> {rb}")
+    return fallas
+
+
+def _delta(actual: float, base: Optional[float]) -> str:
+    if not base:
+        return ""
+    return f"{(actual - base) / base * 100:+.0f}%"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # sin default (ni DATABASE_URL): create_equipo_con_items escribe (y se deshace con DELETE)
+    ap.add_argument("--dsn", required=True, help="BD de pruebas sembrada")
+    ap.add_argument("--n", type=int, default=30, help="llamadas medidas por caso")
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--solo", default=None, help="regex sobre el nombre del caso")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--guardar", action="store_true", help="escribe la línea base con esta corrida")
+    ap.add_argument("--umbral", type=float, default=0.25, help="subida tolerada del p95 (0.25 = 25%%)")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="subidas de p95 menores a esto se ignoran")
+    ap.add_argument("--umbral-bloques", type=float, default=0.5)
+    ap.add_argument("--json", default=None, help="guarda el resultado completo en este archivo")
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = args.dsn
+    fx = fixtures(args.dsn)
+    todos = casos(fx, args.dsn)
+    if args.solo:
+        rx = re.compile(args.solo)
+        todos = {k: v for k, v in todos.items() if rx.search(k)}
+
+    base: Dict[str, Any] = {}
+    if os.path.exists(args.baseline) and not args.guardar:
+        with open(args.baseline, encoding="utf-8") as f:
+            base_doc = json.load(f)
+        base = base_doc.get("casos", {})
+        if base_doc.get("datos") != fx["datos"]:
+            print(f"AVISO: la línea base se tomó con otros datos: {base_doc.get('datos')} vs {fx['datos']}",
+                  file=sys.stderr)
+
+    resultados: Dict[str, Any] = {}
+    print(f"{'caso':<42}{'p50':>9}{'p95':>9}{'Δp95':>7}{'sql':>5}{'db_ms':>9}{'bloques':>9}  seq scans")
+    for nombre, (fn, limpieza) in todos.items():
+        r = medir(nombre, fn, limpieza, args.n, args.warmup, args.dsn, fx["admin"])
+        resultados[nombre] = r
+        b = base.get(nombre, {})
+        ex = r["explain"]
+        print(f"{nombre:<42}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{_delta(r['p95_ms'], b.get('p95_ms')):>7}"
+              f"{r['sentencias']:>5}{ex['db_ms']:>9.2f}{ex['bloques']:>9}  {', '.join(ex['seq_scans'][:3])}")
+
+    doc = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "datos": fx["datos"],
+        "casos": resultados,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, default=str)
+    if args.guardar:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previo = json.load(f)
+            if previo.get("datos") == fx["datos"]:
+                doc["casos"] = dict(previo.get("casos", {}), **resultados)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, default=str)
+        print(f"Línea base guardada en {args.baseline}")
+        return
+
+    fallas = comparar(resultados, base, args.umbral, args.min_ms, args.umbral_bloques)
+    if not base:
+        print("Sin línea base: correr con --guardar para crearla", file=sys.stderr)
+    for f in fallas:
+        print("REGRESIÓN " + f, file=sys.stderr)
+    if fallas:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# backend/bench/loadtest.py
+"""
+Prueba de carga con la mezcla de tráfico real, al estilo locust pero sólo con
+stdlib: N usuarios virtuales (hilos) que se loguean y repiten escenarios
+elegidos por peso, con una pausa exponencial entre pedidos.
+
+Escenarios (peso por defecto):
+  grilla_area      30  GET /api/areas/<id>/items?size=50&fields=ficha (áreas "calientes" más seguido)
+  equipo_detalle   20  GET /api/equipos/<id>
+  incidencias_poll 30  GET /api/incidencias/updates?since_id=<último visto>
+  auditoria        10  GET /api/movimientos?fuente=both&q=..&desde&hasta
+  asignar_item     10  POST /api/equipos/<id>/items + DELETE (sólo practicantes; deja el dato igual)
+
+Los ids salen de la BD (--dsn) al arrancar, así que la BD debe estar sembrada
+con bench/seed.py (usuarios usuarioN / practicanteN con --password).
+
+Sin --base corre "offline": la app en este mismo proceso (create_app + test
+client) contra la BD de --dsn, sin servidor HTTP; mide app + BD. --dsn es
+obligatorio (no se toma DATABASE_URL): asignar_item escribe.
+Con --base mide contra un servidor levantado (gunicorn / uvicorn).
+
+Ejemplos:
+  python bench/loadtest.py --dsn postgresql://.../inv_bench --users 20 --duration 60
+  python bench/loadtest.py --dsn postgresql://.../inv_bench --base http://127.0.0.1:5000 --users 200 --ramp 20 \
+      --weights grilla_area=50,auditoria=50 --json resultados.json
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg  # noqa: E402
+
+PESOS = {"grilla_area": 30, "equipo_detalle": 20, "incidencias_poll": 30, "auditoria": 10, "asignar_item": 10}
+SOLO_STAFF = {"asignar_item"}
+BUSQUEDAS = ("RAM", "TRASLADO", "PC-0", "equipos", "Préstamo", "admin1")
+
+
+# ============================================================
+# Transporte
+# ============================================================
+class ClienteHTTP:
+    """Una conexión keep-alive por usuario virtual."""
+
+    def __init__(self, base: str, timeout: float):
+        u = urlsplit(base)
+        cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+        self._nueva = lambda: cls(u.hostname, u.port, timeout=timeout)
+        self.conn = self._nueva()
+        self.token: Optional[str] = None
+
+    def request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        headers = {"Accept-Encoding": "gzip"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for intento in (0, 1):
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                r = self.conn.getresponse()
+                return r.status, r.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = self._nueva()
+                if intento:
+                    raise
+        raise RuntimeError("inalcanzable")
+
+
+class ClienteLocal:
+    """Flask test client: la app corre en este proceso (sin servidor)."""
+    _app = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        with ClienteLocal._lock:
+            if ClienteLocal._app is None:
+                from app import create_app
+                ClienteLocal._app = create_app()
+        self.client = ClienteLocal._app.test_client()
+        self.token: Optional[str] = None
+
+    def request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        r = self.client.open(path, method=method, json=body, headers=headers)
+        return r.status_code, r.get_data()
+
+
+# ============================================================
+# Datos de la BD sembrada
+# ============================================================
+class Datos:
+    def __init__(self, dsn: str, rng: random.Random, max_filas: int = 20_000):
+        with psycopg.connect(dsn) as conn:
+            cur = conn.cursor()
+            # áreas con ítems, las más pobladas primero (peso ~ cantidad)
+            cur.execute("""
+              SELECT area_id, count(*) FROM inv.items GROUP BY area_id ORDER BY 2 DESC LIMIT %s
+            """, (max_filas,))
+            filas = cur.fetchall()
+            self.areas = [r[0] for r in filas]
+            self.areas_cum = list(_acumular(r[1] for r in filas))
+            cur.execute("SELECT equipo_id FROM inv.equipos TABLESAMPLE SYSTEM (10) LIMIT %s", (max_filas,))
+            self.equipos = [r[0] for r in cur.fetchall()] or [1]
+            # ítems libres con un equipo en su misma área
+            cur.execute("""
+              SELECT i.item_id, e.equipo_id
+              FROM inv.items i
+              JOIN LATERAL (SELECT equipo_id FROM inv.equipos e WHERE e.equipo_area_id = i.area_id LIMIT 1) e ON true
+              WHERE i.estado = 'ALMACEN'
+                AND NOT EXISTS (SELECT 1 FROM inv.equipo_items ei WHERE ei.item_id = i.item_id)
+              LIMIT %s
+            """, (max_filas,))
+            self.libres: List[Tuple[int, int]] = cur.fetchall()
+            rng.shuffle(self.libres)
+            cur.execute("SELECT min(mov_fecha)::date, max(mov_fecha)::date FROM inv.movimientos")
+            self.fecha_min, self.fecha_max = cur.fetchone()
+            cur.execute("SELECT COALESCE(max(msg_id), 0) FROM inv.incidencia_mensajes")
+            self.ultimo_msg = int(cur.fetchone()[0])
+        self._lock = threading.Lock()
+
+    def tomar_libre(self) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            return self.libres.pop() if self.libres else None
+
+    def devolver_libre(self, par: Tuple[int, int]):
+        with self._lock:
+            self.libres.insert(0, par)
+
+
+def _acumular(vals):
+    acc = 0
+    for v in vals:
+        acc += v
+        yield acc
+
+
+# ============================================================
+# Escenarios
+# ============================================================
+class Usuario(threading.Thread):
+    def __init__(self, n: int, cliente, username: str, password: str, staff: bool, datos: Datos,
+                 pesos: Dict[str, int], think: float, fin: float, registro: "Registro", seed: int):
+        super().__init__(daemon=True, name=f"vu-{n}")
+        self.cliente = cliente
+        self.username, self.password, self.staff = username, password, staff
+        self.datos = datos
+        self.escenarios = [(k, v) for k, v in pesos.items() if v > 0 and (staff or k not in SOLO_STAFF)]
+        self.cum = list(_acumular(v for _, v in self.escenarios))
+        self.think, self.fin, self.registro = think, fin, registro
+        self.rng = random.Random(seed)
+        self.since_id = datos.ultimo_msg
+
+    def _medir(self, nombre: str, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        t0 = time.perf_counter()
+        try:
+            status, data = self.cliente.request(method, path, body)
+        except Exception as e:
+            self.registro.add(nombre, 0, (time.perf_counter() - t0) * 1000, str(e))
+            return 0, b""
+        self.registro.add(nombre, status, (time.perf_counter() - t0) * 1000)
+        return status, data
+
+    def login(self) -> bool:
+        status, data = self._medir("login", "POST", "/api/auth/login",
+                                   {"username": self.username, "password": self.password})
+        if status != 200:
+            return False
+        self.cliente.token = json.loads(data)["token"]
+        return True
+
+    def grilla_area(self):
+        d = self.datos
+        area = self.rng.choices(d.areas, cum_weights=d.areas_cum)[0]
+        self._medir("grilla_area", "GET", f"/api/areas/{area}/items?page={self.rng.randint(1, 3)}&size=50&fields=ficha")
+
+    def equipo_detalle(self):
+        self._medir("equipo_detalle", "GET", f"/api/equipos/{self.rng.choice(self.datos.equipos)}")
+
+    def incidencias_poll(self):
+        status, data = self._medir("incidencias_poll", "GET", f"/api/incidencias/updates?since_id={self.since_id}")
+        if status == 200:
+            try:
+                self.since_id = max(self.since_id, int(json.loads(data).get("last_id") or 0))
+            except (ValueError, AttributeError):
+                pass
+
+    def auditoria(self):
+        d = self.datos
+        q = self.rng.choice(BUSQUEDAS)
+        path = f"/api/movimientos?fuente=both&size=50&q={q}"
+        if d.fecha_max and self.rng.random() < 0.7:
+            hasta = d.fecha_max - datetime.timedelta(days=self.rng.randint(0, 60))
+            desde = hasta - datetime.timedelta(days=self.rng.choice((1, 7, 30)))
+            path += f"&desde={desde}&hasta={hasta}"
+        self._medir("auditoria", "GET", path)
+
+    def asignar_item(self):
+        par = self.datos.tomar_libre()
+        if par is None:
+            return
+        item_id, equipo_id = par
+        status, _ = self._medir("asignar_item", "POST", f"/api/equipos/{equipo_id}/items",
+                                {"item_id": item_id, "slot": "bench"})
+        if status == 200:
+            self._medir("retirar_item", "DELETE", f"/api/equipos/{equipo_id}/items/{item_id}")
+        self.datos.devolver_libre(par)
+
+    def run(self):
+        if not self.login():
+            return
+        while time.time() < self.fin:
+            nombre = self.rng.choices(self.escenarios, cum_weights=self.cum)[0][0]
+            getattr(self, nombre)()
+            if self.think > 0:
+                time.sleep(min(self.rng.expovariate(1.0 / self.think), self.think * 5))
+
+
+# ============================================================
+# Resultados
+# ============================================================
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ms: Dict[str, List[float]] = {}
+        self.status: Dict[str, Dict[int, int]] = {}
+        self.errores: Dict[str, str] = {}
+
+    def add(self, nombre: str, status: int, ms: float, error: Optional[str] = None):
+        with self._lock:
+            self.ms.setdefault(nombre, []).append(ms)
+            st = self.status.setdefault(nombre, {})
+            st[status] = st.get(status, 0) + 1
+            if error:
+                self.errores[nombre] = error
+
+    def resumen(self, segundos: float) -> Dict[str, Any]:
+        out = {}
+        for nombre, ms in sorted(self.ms.items()):
+            ms = sorted(ms)
+            q = statistics.quantiles(ms, n=100) if len(ms) >= 2 else ms * 99
+            st = self.status[nombre]
+            out[nombre] = {
+                "n": len(ms),
+                "rps": round(len(ms) / segundos, 1),
+                "err": sum(v for k, v in st.items() if not 200 <= k < 400),
+                "p50": round(q[49], 1),
+                "p95": round(q[94], 1),
+                "p99": round(q[98], 1),
+                "max": round(ms[-1], 1),
+                "status": st,
+            }
+            if nombre in self.errores:
+                out[nombre]["ultimo_error"] = self.errores[nombre]
+        return out
+
+
+def _pesos(raw: Optional[str]) -> Dict[str, int]:
+    pesos = dict(PESOS)
+    if raw:
+        pesos = {k: 0 for k in PESOS}
+        for parte in raw.split(","):
+            k, _, v = parte.partition("=")
+            if k.strip() not in PESOS:
+                sys.exit(f"Escenario desconocido: {k} (válidos: {', '.join(PESOS)})")
+            pesos[k.strip()] = int(v or 1)
+    return pesos
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default=None, help="URL del API; sin esto corre en proceso")
+    # sin default (ni DATABASE_URL): asignar_item escribe en la BD
+    ap.add_argument("--dsn", required=True, help="BD de pruebas sembrada (de ahí salen los ids)")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--staff-ratio", type=float, default=0.2, help="fracción de usuarios practicantes")
+    ap.add_argument("--duration", type=float, default=60)
+    ap.add_argument("--ramp", type=float, default=5, help="segundos para arrancar a todos los usuarios")
+    ap.add_argument("--think", type=float, default=1.0, help="pausa media entre pedidos (seg)")
+    ap.add_argument("--weights", default=None, help="p.ej. grilla_area=30,auditoria=10")
+    ap.add_argument("--password", default="bench")
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default=None, help="guarda el resumen en este archivo")
+    args = ap.parse_args()
+    if not args.base:
+        os.environ["DATABASE_URL"] = args.dsn   # la app en proceso usa la misma BD
+
+    rng = random.Random(args.seed)
+    datos = Datos(args.dsn, rng)
+    pesos = _pesos(args.weights)
+    registro = Registro()
+    n_staff = max(1 if pesos.get("asignar_item") else 0, round(args.users * args.staff_ratio))
+
+    inicio = time.time()
+    fin = inicio + args.ramp + args.duration
+    hilos = []
+    for n in range(args.users):
+        staff = n < n_staff
+        username = f"practicante{n + 1}" if staff else f"usuario{n - n_staff + 1}"
+        cliente = ClienteHTTP(args.base, args.timeout) if args.base else ClienteLocal()
+        u = Usuario(n, cliente, username, args.password, staff, datos, pesos, args.think, fin, registro,
+                    args.seed * 1000 + n)
+        u.start()
+        hilos.append(u)
+        if args.ramp > 0:
+            time.sleep(args.ramp / args.users)
+    for u in hilos:
+        u.join(timeout=max(0.0, fin - time.time()) + args.timeout)
+
+    segundos = max(time.time() - inicio, 0.001)
+    res = {
+        "modo": args.base or "en proceso",
+        "usuarios": args.users,
+        "staff": n_staff,
+        "segundos": round(segundos, 1),
+        "pesos": pesos,
+        "escenarios": registro.resumen(segundos),
+    }
+    print(f"{'escenario':<18}{'n':>8}{'rps':>8}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for nombre, r in res["escenarios"].items():
+        print(f"{nombre:<18}{r['n']:>8}{r['rps']:>8}{r['err']:>6}{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}{r['max']:>9}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+# backend/bench/seed.py
+"""
+Siembra un esquema inv sintético a escala de producción (sólo para pruebas
+locales de rendimiento): árbol de áreas profundo, ítems con ficha, equipos con
+sus componentes, millones de movimientos y auditoría, incidencias con hilos.
+
+Todo se carga con COPY (texto TSV armado en Python, por lotes), con los
+triggers de auditoría apagados durante la carga; al final se ajustan las
+secuencias y se corre ANALYZE. Con la misma --seed los datos son idénticos.
+
+Tamaños por defecto (escala 1.0):
+  áreas 3000 (8 sedes, 6 niveles) · ítems 500k · equipos 50k
+  movimientos 3M · auditoría 2M · incidencias 100k (~4 mensajes c/u)
+  usuarios 2000 (+50 practicantes, 5 admin)
+
+Ejemplos:
+  python bench/seed.py --dsn postgresql://.../inv_bench --migrar --reset --escala 0.05
+  python bench/seed.py --dsn postgresql://.../inv_bench --reset --items 1000000 --movimientos 10000000
+
+--dsn es obligatorio: no se toma DATABASE_URL para no sembrar (ni vaciar con
+--reset) la BD de la app por accidente.
+
+Los usuarios sembrados son admin1..N, practicante1..N y usuario1..N, todos con
+--password (default "bench"); los usa bench/loadtest.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg  # noqa: E402
+
+# Tablas en orden de carga (TRUNCATE con --reset en orden inverso vía CASCADE)
+TABLAS = (
+    "areas", "usuarios", "item_tipos", "spec_atributos", "items", "spec_valores",
+    "item_media", "equipos", "equipo_items", "movimientos", "audit_log",
+    "incidencias", "incidencia_mensajes", "notificaciones",
+)
+# Tablas con trigger de auditoría (migrations/0000)
+AUDITADAS = ("areas", "usuarios", "items", "spec_valores", "equipos", "equipo_items", "incidencias")
+
+NIVELES = ("Sede", "Edificio", "Piso", "Oficina", "Laboratorio", "Sala", "Puesto", "Rack")
+
+# (clase, tipo) -> [(atributo, data_type, generador)]
+FICHAS: Dict[Tuple[str, str], List[Tuple[str, str, Any]]] = {
+    ("COMPONENTE", "RAM"): [
+        ("Capacidad GB", "int", lambda r: r.choice((4, 8, 8, 16, 16, 32, 64))),
+        ("Tipo", "text", lambda r: r.choice(("DDR3", "DDR4", "DDR4", "DDR5"))),
+        ("Velocidad MHz", "int", lambda r: r.choice((1600, 2400, 2666, 3200, 4800))),
+        ("ECC", "bool", lambda r: r.random() < 0.1),
+    ],
+    ("COMPONENTE", "DISCO"): [
+        ("Capacidad GB", "int", lambda r: r.choice((120, 240, 256, 480, 500, 512, 1000, 2000))),
+        ("Tecnología", "text", lambda r: r.choice(("HDD", "SSD", "SSD", "NVMe"))),
+        ("Marca", "text", lambda r: r.choice(("Kingston", "Samsung", "WD", "Seagate", "Crucial"))),
+        ("Fecha compra", "date", lambda r: datetime.date(2016, 1, 1) + datetime.timedelta(days=r.randrange(3500))),
+    ],
+    ("COMPONENTE", "CPU"): [
+        ("Modelo", "text", lambda r: r.choice(("i3-10100", "i5-10400", "i5-12400", "i7-12700", "Ryzen 5 5600G"))),
+        ("Núcleos", "int", lambda r: r.choice((4, 6, 8, 12))),
+        ("Frecuencia GHz", "numeric", lambda r: round(r.uniform(2.4, 4.8), 1)),
+    ],
+    ("COMPONENTE", "FUENTE"): [
+        ("Potencia W", "int", lambda r: r.choice((350, 450, 500, 650, 750))),
+        ("Certificación", "text", lambda r: r.choice(("80+", "80+ Bronze", "80+ Gold"))),
+    ],
+    ("COMPONENTE", "PLACA"): [
+        ("Socket", "text", lambda r: r.choice(("LGA1200", "LGA1700", "AM4"))),
+        ("Slots RAM", "int", lambda r: r.choice((2, 4))),
+    ],
+    ("PERIFERICO", "MONITOR"): [
+        ("Pulgadas", "numeric", lambda r: r.choice((19.5, 21.5, 23.8, 24, 27))),
+        ("Resolución", "text", lambda r: r.choice(("1366x768", "1920x1080", "2560x1440"))),
+        ("Marca", "text", lambda r: r.choice(("LG", "Samsung", "Dell", "HP", "AOC"))),
+    ],
+    ("PERIFERICO", "TECLADO"): [
+        ("Conexión", "text", lambda r: r.choice(("USB", "USB", "Inalámbrico"))),
+        ("Distribución", "text", lambda r: r.choice(("ES", "LATAM", "US"))),
+    ],
+    ("PERIFERICO", "MOUSE"): [
+        ("Conexión", "text", lambda r: r.choice(("USB", "USB", "Inalámbrico"))),
+    ],
+    ("PERIFERICO", "IMPRESORA"): [
+        ("Tecnología", "text", lambda r: r.choice(("Láser", "Tinta", "Térmica"))),
+        ("Color", "bool", lambda r: r.random() < 0.3),
+        ("PPM", "int", lambda r: r.choice((20, 30, 40))),
+    ],
+}
+# peso relativo de cada tipo entre los ítems
+PESO_TIPO = {"RAM": 14, "DISCO": 12, "CPU": 8, "FUENTE": 8, "PLACA": 8,
+             "MONITOR": 16, "TECLADO": 16, "MOUSE": 16, "IMPRESORA": 2}
+
+TITULOS = ("No enciende", "Pantalla en negro", "Lentitud general", "Sin red", "Teclado no responde",
+           "Ruido en el ventilador", "No imprime", "Se reinicia solo", "Actualizar software",
+           "Cambio de mouse", "Disco lleno", "Pide contraseña de BIOS")
+MENSAJES = ("Revisado en sitio", "Se reemplazó el cable", "Pendiente repuesto", "Ya funciona, gracias",
+            "¿Pueden pasar hoy?", "Se escaló a proveedor", "Reiniciado, en observación", "Cerrado por inactividad")
+
+
+# ============================================================
+# Escala
+# ============================================================
+DEFAULTS = {
+    "areas": 3000, "sedes": 8, "niveles": 6,
+    "items": 500_000, "equipos": 50_000,
+    "movimientos": 3_000_000, "auditoria": 2_000_000,
+    "incidencias": 100_000, "mensajes_por_incidencia": 4,
+    "usuarios": 2000, "practicantes": 50, "admins": 5,
+    "notificaciones": 5000, "anios": 3,
+}
+_NO_ESCALAN = {"sedes", "niveles", "mensajes_por_incidencia", "anios", "admins"}
+
+
+def escala(args) -> Dict[str, int]:
+    out = {}
+    for k, v in DEFAULTS.items():
+        val = getattr(args, k)
+        if val is None:
+            val = v if k in _NO_ESCALAN else max(1, int(v * args.escala))
+        out[k] = val
+    out["sedes"] = min(out["sedes"], out["areas"])
+    return out
+
+
+# ============================================================
+# COPY
+# ============================================================
+def _tsv(v: Any) -> str:
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, (dict, list)):
+        v = json.dumps(v, ensure_ascii=False)
+    elif isinstance(v, (datetime.date, datetime.datetime)):
+        return v.isoformat()
+    else:
+        v = str(v)
+    return v.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def copy_rows(cur, tabla: str, cols: Sequence[str], rows: Iterable[Sequence[Any]], lote: int = 20_000) -> int:
+    n = 0
+    buf: List[str] = []
+    with cur.copy(f"COPY inv.{tabla} ({', '.join(cols)}) FROM STDIN") as cp:
+        for r in rows:
+            buf.append("\t".join(_tsv(v) for v in r))
+            n += 1
+            if len(buf) >= lote:
+                cp.write("\n".join(buf) + "\n")
+                buf.clear()
+        if buf:
+            cp.write("\n".join(buf) + "\n")
+    return n
+
+
+def _fechas(rng: random.Random, n: int, desde: datetime.datetime, hasta: datetime.datetime):
+    """n instantes crecientes entre desde y hasta (ids en el mismo orden que las fechas)."""
+    span = (hasta - desde).total_seconds()
+    paso = span / max(n, 1)
+    for i in range(n):
+        yield desde + datetime.timedelta(seconds=i * paso + rng.random() * paso)
+
+
+def _pesos_zipf(n: int, s: float = 0.8) -> List[float]:
+    """Pesos acumulados: pocas áreas concentran muchos ítems (como en producción)."""
+    acc, out = 0.0, []
+    for k in range(1, n + 1):
+        acc += 1.0 / (k ** s)
+        out.append(acc)
+    return out
+
+
+# ============================================================
+# Generadores
+# ============================================================
+class Sembrador:
+    def __init__(self, cur, esc: Dict[str, int], rng: random.Random, password_hash: str):
+        self.cur = cur
+        self.esc = esc
+        self.rng = rng
+        self.password_hash = password_hash
+        self.ahora = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self.inicio = self.ahora - datetime.timedelta(days=365 * esc["anios"])
+        self.tiempos: Dict[str, Dict[str, Any]] = {}
+
+    def _carga(self, tabla: str, cols: Sequence[str], rows: Iterable[Sequence[Any]]):
+        t = time.perf_counter()
+        n = copy_rows(self.cur, tabla, cols, rows)
+        self.tiempos[tabla] = {"filas": n, "s": round(time.perf_counter() - t, 1)}
+        print(f"  {tabla:<20} {n:>10,} filas  {self.tiempos[tabla]['s']:>6}s", file=sys.stderr)
+
+    # ---------- áreas ----------
+    def areas(self):
+        e, rng = self.esc, self.rng
+        total, sedes, niveles = e["areas"], e["sedes"], max(1, e["niveles"])
+        # tamaño por nivel: sedes * b^k, con b tal que la suma llegue a total
+        b = 1.0
+        while sum(sedes * b ** k for k in range(niveles)) < total and b < 1000:
+            b *= 1.05
+        tam = [max(1, round(sedes * b ** k)) for k in range(niveles)]
+        tam[0] = sedes
+        self.area_nivel: List[int] = []
+        self.area_padre: List[Optional[int]] = []
+        por_nivel: List[List[int]] = []
+        rows = []
+        aid = 0
+        for k in range(niveles):
+            ids = []
+            n_k = tam[k] if k < niveles - 1 else total - aid
+            for _ in range(max(0, min(n_k, total - aid))):
+                aid += 1
+                padre = None if k == 0 else rng.choice(por_nivel[k - 1])
+                ids.append(aid)
+                self.area_nivel.append(k)
+                self.area_padre.append(padre)
+                rows.append((aid, f"{NIVELES[k % len(NIVELES)]} {aid}", padre, self.inicio))
+            por_nivel.append(ids)
+            if aid >= total:
+                break
+        self._carga("areas", ("area_id", "area_nombre", "area_padre_id", "created_at"), rows)
+        # ítems y equipos viven en las áreas de nivel >= 2 (o en las que haya)
+        self.hojas = [a for a in range(1, aid + 1) if self.area_nivel[a - 1] >= min(2, niveles - 1)]
+        rng.shuffle(self.hojas)
+        self.hojas_cum = _pesos_zipf(len(self.hojas))
+        self.n_areas = aid
+
+    def area_al_azar(self) -> int:
+        return self.rng.choices(self.hojas, cum_weights=self.hojas_cum)[0]
+
+    # ---------- usuarios ----------
+    def usuarios(self):
+        e = self.esc
+        self.cur.execute("SELECT rol_nombre, rol_id FROM inv.roles")
+        roles = dict(self.cur.fetchall())
+        rows = []
+        uid = 0
+        self.admins, self.practicantes, self.usuarios_app = [], [], []
+        for rol, n, pref, lista in (("ADMIN", e["admins"], "admin", self.admins),
+                                    ("PRACTICANTE", e["practicantes"], "practicante", self.practicantes),
+                                    ("USUARIOS", e["usuarios"], "usuario", self.usuarios_app)):
+            for i in range(1, n + 1):
+                uid += 1
+                nombre = f"{pref}{i}"
+                lista.append(nombre)
+                rows.append((uid, nombre, self.password_hash, roles[rol], self.area_al_azar(),
+                             f"{nombre}@bench.local", True))
+        self.usuario_ids = uid
+        self._carga("usuarios", ("usuario_id", "usuario_username", "usuario_password_bcrypt", "rol_id",
+                                 "usuario_area_id", "usuario_email", "usuario_activo"), rows)
+        self.staff = self.admins + self.practicantes
+
+    # ---------- tipos y atributos ----------
+    def tipos(self):
+        tipos, attrs = [], []
+        self.tipo_id: Dict[str, int] = {}
+        self.attrs_tipo: Dict[str, List[Tuple[int, str, Any]]] = {}
+        aid = 0
+        for tid, ((clase, tipo), defs) in enumerate(FICHAS.items(), start=1):
+            tipos.append((tid, clase, tipo))
+            self.tipo_id[tipo] = tid
+            self.attrs_tipo[tipo] = []
+            for orden, (nombre, dt, gen) in enumerate(defs, start=1):
+                aid += 1
+                attrs.append((aid, tid, nombre, dt, orden))
+                self.attrs_tipo[tipo].append((aid, dt, gen))
+        self._carga("item_tipos", ("item_tipo_id", "clase", "nombre"), tipos)
+        self._carga("spec_atributos", ("attr_id", "item_tipo_id", "nombre_attr", "data_type", "orden"), attrs)
+
+    # ---------- equipos ----------
+    def equipos(self):
+        e, rng = self.esc, self.rng
+        por_area: Dict[int, int] = {}
+        self.equipo_area: List[int] = []
+        rows = []
+        fechas = _fechas(rng, e["equipos"], self.inicio, self.ahora)
+        for eid in range(1, e["equipos"] + 1):
+            area = self.area_al_azar()
+            por_area[area] = por_area.get(area, 0) + 1
+            self.equipo_area.append(area)
+            f = next(fechas)
+            rows.append((eid, f"PC-{por_area[area]:03d}", f"Equipo {eid}", area,
+                         "USO" if rng.random() < 0.9 else "ALMACEN",
+                         rng.choice(self.usuarios_app) if rng.random() < 0.7 else None,
+                         f"lab{eid}" if rng.random() < 0.2 else None, None, f, f))
+        self._carga("equipos", ("equipo_id", "equipo_codigo", "equipo_nombre", "equipo_area_id",
+                                "equipo_estado", "equipo_usuario_final", "equipo_login",
+                                "equipo_password", "created_at", "updated_at"), rows)
+
+    # ---------- ítems, fichas, fotos y asignaciones ----------
+    def items(self):
+        e, rng = self.esc, self.rng
+        tipos = list(PESO_TIPO)
+        cum, acc = [], 0
+        for t in tipos:
+            acc += PESO_TIPO[t]
+            cum.append(acc)
+        n_eq = len(self.equipo_area)
+        self.item_area: List[int] = []
+        self.item_estado: List[str] = []
+        asignados: List[Tuple[int, int, str]] = []
+        contador: Dict[str, int] = {}
+        items_rows, valores, media = [], [], []
+        fechas = _fechas(rng, e["items"], self.inicio, self.ahora)
+        for iid in range(1, e["items"] + 1):
+            tipo = rng.choices(tipos, cum_weights=cum)[0]
+            contador[tipo] = contador.get(tipo, 0) + 1
+            p = rng.random()
+            if n_eq and p < 0.55:
+                eq = rng.randrange(n_eq)
+                area, estado = self.equipo_area[eq], "EN_USO"
+                asignados.append((eq + 1, iid, tipo))
+            else:
+                area = self.area_al_azar()
+                estado = "PRESTAMO" if p > 0.98 else "ALMACEN"
+            self.item_area.append(area)
+            self.item_estado.append(estado)
+            items_rows.append((iid, f"{tipo}{contador[tipo]:06d}", self.tipo_id[tipo], area, estado, next(fechas)))
+            for attr_id, dt, gen in self.attrs_tipo[tipo]:
+                if rng.random() < 0.9:
+                    v = gen(rng)
+                    valores.append((iid, attr_id,
+                                    v if dt == "text" else None, v if dt == "int" else None,
+                                    v if dt == "numeric" else None, v if dt == "bool" else None,
+                                    v if dt == "date" else None))
+            if rng.random() < 0.15:
+                for k in range(rng.randint(1, 3)):
+                    media.append((iid, f"items/{iid}/{k + 1}.jpg", k == 0, k + 1))
+        self._carga("items", ("item_id", "item_codigo", "item_tipo_id", "area_id", "estado", "creado_en"), items_rows)
+        del items_rows
+        self._carga("spec_valores", ("item_id", "attr_id", "val_text", "val_int", "val_numeric",
+                                     "val_bool", "val_date"), valores)
+        del valores
+        self._carga("item_media", ("item_id", "path", "principal", "orden"), media)
+        self._carga("equipo_items", ("equipo_id", "item_id", "slot_o_ubicacion"),
+                    ((eq, iid, f"{tipo.lower()}-{iid % 4 + 1}") for eq, iid, tipo in asignados))
+
+    # ---------- historial ----------
+    def _particiones(self, tabla: str):
+        self.cur.execute("SELECT to_regprocedure('inv.fn_crear_particiones_mes(text,date,date)') IS NOT NULL "
+                         "AND EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+                         (f"inv.{tabla}",))
+        if self.cur.fetchone()[0]:
+            self.cur.execute("SELECT inv.fn_crear_particiones_mes(%s, %s, %s)",
+                             (tabla, self.inicio.date(), self.ahora.date() + datetime.timedelta(days=92)))
+
+    def movimientos(self):
+        e, rng = self.esc, self.rng
+        self._particiones("movimientos")
+        n_items, n_eq = len(self.item_area), len(self.equipo_area)
+
+        def filas():
+            for mid, f in enumerate(_fechas(rng, e["movimientos"], self.inicio, self.ahora), start=1):
+                iid = rng.randrange(n_items) + 1
+                area = self.item_area[iid - 1]
+                p = rng.random()
+                if p < 0.4 and n_eq:
+                    eq = rng.randrange(n_eq) + 1
+                    yield (mid, iid, "ASIGNACION", f, area, area, eq, rng.choice(self.staff), None,
+                           {"slot": f"slot-{rng.randint(1, 4)}"})
+                elif p < 0.6 and n_eq:
+                    eq = rng.randrange(n_eq) + 1
+                    yield (mid, iid, "RETIRO", f, area, area, eq, rng.choice(self.staff), "Retiro", None)
+                else:
+                    destino = self.area_al_azar()
+                    prestamo = rng.random() < 0.1
+                    yield (mid, iid, "TRASLADO", f, area, destino, None, rng.choice(self.staff),
+                           "Préstamo" if prestamo else "Traslado", {"es_prestamo": prestamo})
+
+        self._carga("movimientos", ("mov_id", "mov_item_id", "mov_tipo", "mov_fecha", "mov_origen_area_id",
+                                    "mov_destino_area_id", "mov_equipo_id", "mov_usuario_app",
+                                    "mov_motivo", "mov_detalle"), filas())
+
+    def auditoria(self):
+        e, rng = self.esc, self.rng
+        self._particiones("audit_log")
+        entidades = (("items", len(self.item_area)), ("equipos", len(self.equipo_area)),
+                     ("equipo_items", len(self.item_area)), ("spec_valores", len(self.item_area)),
+                     ("areas", self.n_areas), ("usuarios", self.usuario_ids))
+        procs = ("sp_asignar_item_a_equipo", "sp_crear_item_con_ficha_en_area_id", "upsert_ficha", None, None)
+
+        def filas():
+            for aid, f in enumerate(_fechas(rng, e["auditoria"], self.inicio, self.ahora), start=1):
+                entidad, n = rng.choice(entidades)
+                eid = rng.randrange(max(n, 1)) + 1
+                accion = rng.choices(("INSERT", "UPDATE", "DELETE"), cum_weights=(30, 90, 100))[0]
+                antes = None if accion == "INSERT" else {"id": eid, "estado": rng.choice(("ALMACEN", "EN_USO"))}
+                despues = None if accion == "DELETE" else {"id": eid, "estado": rng.choice(("ALMACEN", "EN_USO"))}
+                proc = rng.choice(procs)
+                yield (aid, f, rng.choice(self.staff), accion, entidad, str(eid), antes, despues,
+                       {"proc": proc} if proc else None)
+
+        self._carga("audit_log", ("audit_id", "created_at", "actor_user", "accion", "entidad",
+                                  "entidad_id", "antes", "despues", "extra"), filas())
+
+    # ---------- incidencias ----------
+    def incidencias(self):
+        e, rng = self.esc, self.rng
+        n_eq = len(self.equipo_area)
+        incs, msgs = [], []
+        mid = 0
+        for iid, f in enumerate(_fechas(rng, e["incidencias"], self.inicio, self.ahora), start=1):
+            eq = rng.randrange(n_eq) + 1 if n_eq else None
+            area = self.equipo_area[eq - 1] if eq else self.area_al_azar()
+            reporta = rng.choice(self.usuarios_app)
+            reciente = (self.ahora - f).days < 30
+            estado = rng.choices(("ABIERTA", "EN_PROCESO", "CERRADA"),
+                                 cum_weights=(40, 70, 100) if reciente else (3, 6, 100))[0]
+            asignado = rng.choice(self.practicantes) if self.practicantes and (estado != "ABIERTA" or rng.random() < 0.3) else None
+            incs.append((iid, eq, area, reporta, rng.choice(TITULOS), "Detalle de la incidencia", estado, asignado, f))
+            for k in range(min(20, int(rng.expovariate(1.0 / max(e["mensajes_por_incidencia"], 0.001))))):
+                mid += 1
+                staff = asignado is not None and k % 2 == 0
+                msgs.append((mid, iid, (asignado if staff else reporta), rng.choice(MENSAJES),
+                             staff and rng.random() < 0.15,
+                             min(self.ahora, f + datetime.timedelta(minutes=30 * (k + 1) + rng.randrange(600)))))
+        self._carga("incidencias", ("inc_id", "equipo_id", "area_id", "reportado_por", "titulo",
+                                    "descripcion", "estado", "asignado_a", "created_at"), incs)
+        self._carga("incidencia_mensajes", ("msg_id", "inc_id", "usuario", "mensaje", "solo_staff", "created_at"), msgs)
+
+    def notificaciones(self):
+        e, rng = self.esc, self.rng
+
+        def filas():
+            for nid, f in enumerate(_fechas(rng, e["notificaciones"], self.inicio, self.ahora), start=1):
+                pendiente = rng.random() < 0.05
+                yield (nid, rng.randrange(self.usuario_ids) + 1, "Actualización de incidencia",
+                       "Hay novedades en una incidencia.", f, None if pendiente else f)
+
+        self._carga("notificaciones", ("notif_id", "destinatario_usuario_id", "subject", "body",
+                                       "created_at", "sent_at"), filas())
+
+
+# ============================================================
+# Preparación / cierre
+# ============================================================
+def _hash_password(cur, raw: str) -> str:
+    from app.core.passwords import hash_password
+    h = hash_password(raw)
+    if h is None:
+        cur.execute("SELECT crypt(%s, gen_salt('bf'))", (raw,))
+        h = cur.fetchone()[0]
+    return h
+
+
+def _triggers(cur, activar: bool) -> str:
+    """Apaga/enciende los triggers de usuario (auditoría) durante la carga."""
+    try:
+        with cur.connection.transaction():
+            cur.execute(f"SET session_replication_role = {'origin' if activar else 'replica'}")
+        return "session_replication_role"
+    except psycopg.errors.InsufficientPrivilege:
+        for t in AUDITADAS:
+            cur.execute(f"ALTER TABLE inv.{t} {'ENABLE' if activar else 'DISABLE'} TRIGGER USER")
+        return "alter_table"
+
+
+def _secuencias(cur):
+    for t in TABLAS:
+        cur.execute("""
+          SELECT a.attname, pg_get_serial_sequence(format('inv.%%I', %s::text), a.attname)
+          FROM pg_attribute a
+          WHERE a.attrelid = to_regclass(format('inv.%%I', %s::text)) AND a.attnum > 0 AND NOT a.attisdropped
+        """, (t, t))
+        for col, seq in cur.fetchall():
+            if seq:
+                cur.execute(f"SELECT setval(%s, COALESCE((SELECT max({col}) FROM inv.{t}), 0) + 1, false)", (seq,))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # sin default (ni DATABASE_URL): escribe y con --reset vacía inv; la BD se nombra a propósito
+    ap.add_argument("--dsn", required=True, help="BD de pruebas donde sembrar")
+    ap.add_argument("--escala", type=float, default=1.0, help="multiplica los tamaños por defecto")
+    for k in DEFAULTS:
+        ap.add_argument("--" + k.replace("_", "-"), dest=k, type=int, default=None)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--password", default="bench")
+    ap.add_argument("--migrar", action="store_true", help="aplica backend/migrations antes de sembrar")
+    ap.add_argument("--reset", action="store_true", help="vacía las tablas de inv antes de sembrar")
+    args = ap.parse_args()
+    esc = escala(args)
+
+    if args.migrar:
+        os.environ["MIGRATIONS_DATABASE_URL"] = args.dsn
+        from app.core.migrations import migrate
+        print(json.dumps(migrate(), default=str), file=sys.stderr)
+
+    t0 = time.perf_counter()
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT EXISTS (SELECT 1 FROM inv.items) OR EXISTS (SELECT 1 FROM inv.areas)")
+        if cur.fetchone()[0]:
+            if not args.reset:
+                sys.exit("inv ya tiene datos: usar --reset para vaciarlo (sólo en una BD de pruebas)")
+            cur.execute("TRUNCATE " + ", ".join(f"inv.{t}" for t in TABLAS) + " RESTART IDENTITY CASCADE")
+
+        modo = _triggers(cur, activar=False)
+        try:
+            s = Sembrador(cur, esc, random.Random(args.seed), _hash_password(cur, args.password))
+            print(f"Sembrando ({json.dumps(esc)})", file=sys.stderr)
+            s.areas()
+            s.usuarios()
+            s.tipos()
+            s.equipos()
+            s.items()
+            s.movimientos()
+            s.auditoria()
+            s.incidencias()
+            s.notificaciones()
+        finally:
+            _triggers(cur, activar=True)
+        _secuencias(cur)
+        t = time.perf_counter()
+        cur.execute("ANALYZE " + ", ".join(f"inv.{x}" for x in TABLAS))
+        s.tiempos["analyze"] = {"s": round(time.perf_counter() - t, 1)}
+
+    print(json.dumps({
+        "escala": esc,
+        "seed": args.seed,
+        "triggers": modo,
+        "tablas": s.tiempos,
+        "total_s": round(time.perf_counter() - t0, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# backend/gunicorn.conf.py
+"""
+Ganchos de gunicorn para las métricas Prometheus multiproceso (app/core/metrics.py).
+
+gunicorn lo lee solo si se arranca desde backend/ (o con -c gunicorn.conf.py);
+bind, workers, etc. se siguen pasando por línea de comandos.
+"""
+import glob
+import os
+
+# Directorio compartido por los workers; se define aquí para que exista antes
+# de que la app (o --preload) importe prometheus_client.
+MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "prometheus"),
+)
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def on_starting(server):
+    # Archivos de una corrida anterior: valores de PIDs que ya no existen
+    for f in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+def child_exit(server, worker):
+    # Saca de los gauges "live*" (en curso, pool, cachés) al worker que terminó
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
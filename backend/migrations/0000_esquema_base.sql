@@ -0,0 +1,483 @@
+-- 0000_esquema_base.sql
+-- Esquema base de inv: tablas, vista de fichas, procedimientos y auditoría que
+-- usa el backend. Hasta ahora vivía sólo en la BD de producción.
+--
+-- Es segura sobre una BD existente: las tablas van con IF NOT EXISTS y los
+-- procedimientos, funciones, vistas y triggers se crean sólo si faltan (bloques
+-- DO), así nunca se pisa una definición que ya está en producción. Los cambios
+-- a estos objetos van en migraciones nuevas con CREATE OR REPLACE.
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+CREATE SCHEMA IF NOT EXISTS inv;
+
+-- ============================================================
+-- Catálogos
+-- ============================================================
+CREATE TABLE IF NOT EXISTS inv.roles (
+  rol_id      serial PRIMARY KEY,
+  rol_nombre  text NOT NULL UNIQUE
+);
+INSERT INTO inv.roles(rol_nombre) VALUES ('ADMIN'), ('PRACTICANTE'), ('USUARIOS')
+ON CONFLICT (rol_nombre) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS inv.areas (
+  area_id        bigserial PRIMARY KEY,
+  area_nombre    text NOT NULL,
+  area_padre_id  bigint REFERENCES inv.areas(area_id),
+  created_at     timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_areas_padre ON inv.areas (area_padre_id);
+
+CREATE TABLE IF NOT EXISTS inv.usuarios (
+  usuario_id               bigserial PRIMARY KEY,
+  usuario_username         text NOT NULL UNIQUE,
+  usuario_password_bcrypt  text NOT NULL,
+  rol_id                   integer NOT NULL REFERENCES inv.roles(rol_id),
+  usuario_area_id          bigint REFERENCES inv.areas(area_id),
+  usuario_email            text,
+  usuario_activo           boolean NOT NULL DEFAULT true,
+  usuario_ultimo_login     timestamptz,
+  usuario_creado_en        timestamptz NOT NULL DEFAULT now(),
+  usuario_actualizado_en   timestamptz
+);
+
+-- ============================================================
+-- Ítems y fichas técnicas
+-- ============================================================
+CREATE TABLE IF NOT EXISTS inv.item_tipos (
+  item_tipo_id  bigserial PRIMARY KEY,
+  clase         text NOT NULL CHECK (clase IN ('COMPONENTE', 'PERIFERICO')),
+  nombre        text NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS inv.items (
+  item_id       bigserial PRIMARY KEY,
+  item_codigo   text NOT NULL UNIQUE,
+  item_tipo_id  bigint NOT NULL REFERENCES inv.item_tipos(item_tipo_id),
+  area_id       bigint NOT NULL REFERENCES inv.areas(area_id),
+  estado        text NOT NULL DEFAULT 'ALMACEN',
+  creado_en     timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS inv.spec_atributos (
+  attr_id       bigserial PRIMARY KEY,
+  item_tipo_id  bigint NOT NULL REFERENCES inv.item_tipos(item_tipo_id) ON DELETE CASCADE,
+  nombre_attr   text NOT NULL,
+  data_type     text NOT NULL DEFAULT 'text'
+                CHECK (data_type IN ('text', 'int', 'numeric', 'bool', 'date')),
+  orden         integer
+);
+
+-- Únicos por nombre sin distinguir mayúsculas (los usan los ON CONFLICT de
+-- spec_model y de los procedimientos). En producción ya existen con otro
+-- nombre: se crean sólo si no hay uno equivalente.
+DO $do$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_index x
+    WHERE x.indrelid = 'inv.item_tipos'::regclass AND x.indisunique
+      AND pg_get_indexdef(x.indexrelid) ILIKE '%(clase, lower(nombre))%'
+  ) THEN
+    CREATE UNIQUE INDEX ux_item_tipos_clase_nombre ON inv.item_tipos (clase, lower(nombre));
+  END IF;
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_index x
+    WHERE x.indrelid = 'inv.spec_atributos'::regclass AND x.indisunique
+      AND pg_get_indexdef(x.indexrelid) ILIKE '%(item_tipo_id, lower(nombre_attr))%'
+  ) THEN
+    CREATE UNIQUE INDEX ux_spec_atributos_tipo_nombre ON inv.spec_atributos (item_tipo_id, lower(nombre_attr));
+  END IF;
+END
+$do$;
+
+CREATE TABLE IF NOT EXISTS inv.spec_valores (
+  item_id      bigint NOT NULL REFERENCES inv.items(item_id) ON DELETE CASCADE,
+  attr_id      bigint NOT NULL REFERENCES inv.spec_atributos(attr_id) ON DELETE CASCADE,
+  val_text     text,
+  val_int      bigint,
+  val_numeric  numeric,
+  val_bool     boolean,
+  val_date     date,
+  PRIMARY KEY (item_id, attr_id)
+);
+
+CREATE TABLE IF NOT EXISTS inv.item_media (
+  media_id    bigserial PRIMARY KEY,
+  item_id     bigint NOT NULL REFERENCES inv.items(item_id) ON DELETE CASCADE,
+  path        text NOT NULL,
+  principal   boolean NOT NULL DEFAULT false,
+  orden       integer,
+  created_at  timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_item_media_item ON inv.item_media (item_id);
+
+-- ============================================================
+-- Equipos
+-- ============================================================
+CREATE TABLE IF NOT EXISTS inv.equipos (
+  equipo_id             bigserial PRIMARY KEY,
+  equipo_codigo         text NOT NULL,
+  equipo_nombre         text,
+  equipo_area_id        bigint NOT NULL REFERENCES inv.areas(area_id),
+  equipo_estado         text NOT NULL DEFAULT 'USO',
+  equipo_usuario_final  text,
+  equipo_login          text,
+  equipo_password       text,
+  created_at            timestamptz NOT NULL DEFAULT now(),
+  updated_at            timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS inv.equipo_items (
+  equipo_id         bigint NOT NULL REFERENCES inv.equipos(equipo_id) ON DELETE CASCADE,
+  item_id           bigint NOT NULL REFERENCES inv.items(item_id),
+  slot_o_ubicacion  text,
+  created_at        timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (equipo_id, item_id)
+);
+
+-- ============================================================
+-- Historial (0002 las convierte en particionadas por mes)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS inv.movimientos (
+  mov_id               bigserial PRIMARY KEY,
+  mov_item_id          bigint REFERENCES inv.items(item_id),
+  mov_tipo             text NOT NULL,
+  mov_fecha            timestamptz NOT NULL DEFAULT now(),
+  mov_origen_area_id   bigint REFERENCES inv.areas(area_id),
+  mov_destino_area_id  bigint REFERENCES inv.areas(area_id),
+  mov_equipo_id        bigint,
+  mov_usuario_app      text,
+  mov_motivo           text,
+  mov_detalle          jsonb
+);
+
+CREATE TABLE IF NOT EXISTS inv.audit_log (
+  audit_id    bigserial PRIMARY KEY,
+  created_at  timestamptz NOT NULL DEFAULT now(),
+  actor_user  text,
+  accion      text NOT NULL,
+  entidad     text NOT NULL,
+  entidad_id  text,
+  antes       jsonb,
+  despues     jsonb,
+  extra       jsonb
+);
+
+-- ============================================================
+-- Incidencias y notificaciones
+-- ============================================================
+CREATE TABLE IF NOT EXISTS inv.incidencias (
+  inc_id         bigserial PRIMARY KEY,
+  equipo_id      bigint REFERENCES inv.equipos(equipo_id) ON DELETE SET NULL,
+  area_id        bigint REFERENCES inv.areas(area_id),
+  reportado_por  text NOT NULL,
+  titulo         text NOT NULL,
+  descripcion    text,
+  estado         text NOT NULL DEFAULT 'ABIERTA',
+  asignado_a     text,
+  created_at     timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS inv.incidencia_mensajes (
+  msg_id      bigserial PRIMARY KEY,
+  inc_id      bigint NOT NULL REFERENCES inv.incidencias(inc_id) ON DELETE CASCADE,
+  usuario     text NOT NULL,
+  mensaje     text NOT NULL,
+  solo_staff  boolean NOT NULL DEFAULT false,
+  created_at  timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS inv.notificaciones (
+  notif_id                 bigserial PRIMARY KEY,
+  destinatario_usuario_id  bigint REFERENCES inv.usuarios(usuario_id) ON DELETE CASCADE,
+  subject                  text NOT NULL,
+  body                     text,
+  created_at               timestamptz NOT NULL DEFAULT now(),
+  sent_at                  timestamptz
+);
+
+-- ============================================================
+-- Vistas
+-- ============================================================
+DO $do$
+BEGIN
+  IF to_regclass('inv.item_fotos') IS NULL THEN
+    -- compatibilidad: item_model.remove_photo borra por url/path
+    CREATE VIEW inv.item_fotos AS
+      SELECT media_id AS foto_id, item_id, path, path AS url, principal, orden, created_at
+      FROM inv.item_media;
+  END IF;
+
+  IF to_regclass('inv.vw_items_con_ficha_y_fotos') IS NULL THEN
+    CREATE VIEW inv.vw_items_con_ficha_y_fotos AS
+      SELECT
+        i.item_id,
+        i.item_codigo,
+        t.clase,
+        t.nombre AS tipo,
+        i.estado,
+        i.area_id,
+        a.area_nombre,
+        COALESCE((
+          SELECT jsonb_object_agg(sa.nombre_attr, CASE sa.data_type
+                   WHEN 'int'     THEN to_jsonb(sv.val_int)
+                   WHEN 'numeric' THEN to_jsonb(sv.val_numeric)
+                   WHEN 'bool'    THEN to_jsonb(sv.val_bool)
+                   WHEN 'date'    THEN to_jsonb(sv.val_date)
+                   ELSE to_jsonb(sv.val_text)
+                 END)
+          FROM inv.spec_valores sv
+          JOIN inv.spec_atributos sa ON sa.attr_id = sv.attr_id
+          WHERE sv.item_id = i.item_id
+        ), '{}'::jsonb) AS ficha,
+        COALESCE((
+          SELECT jsonb_agg(jsonb_build_object(
+                   'path', m.path, 'principal', m.principal,
+                   'orden', m.orden, 'created_at', m.created_at)
+                 ORDER BY m.principal DESC, m.orden NULLS LAST, m.media_id)
+          FROM inv.item_media m
+          WHERE m.item_id = i.item_id
+        ), '[]'::jsonb) AS fotos,
+        i.creado_en AS created_at
+      FROM inv.items i
+      JOIN inv.item_tipos t ON t.item_tipo_id = i.item_tipo_id
+      JOIN inv.areas a ON a.area_id = i.area_id;
+  END IF;
+END
+$do$;
+
+-- ============================================================
+-- Procedimientos (sólo si no existen)
+-- ============================================================
+DO $do$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_proc WHERE proname = 'sp_definir_atributo' AND pronamespace = 'inv'::regnamespace
+  ) THEN
+    CREATE PROCEDURE inv.sp_definir_atributo(
+      p_clase text, p_tipo text, p_nombre text, p_data_type text, p_orden integer
+    )
+    LANGUAGE plpgsql AS $sp$
+    DECLARE
+      v_tipo_id bigint;
+    BEGIN
+      INSERT INTO inv.item_tipos(clase, nombre) VALUES (upper(p_clase), trim(p_tipo))
+      ON CONFLICT (clase, lower(nombre)) DO NOTHING;
+      SELECT item_tipo_id INTO v_tipo_id
+      FROM inv.item_tipos WHERE clase = upper(p_clase) AND lower(nombre) = lower(trim(p_tipo));
+
+      INSERT INTO inv.spec_atributos(item_tipo_id, nombre_attr, data_type, orden)
+      VALUES (
+        v_tipo_id, trim(p_nombre), COALESCE(lower(p_data_type), 'text'),
+        COALESCE(p_orden, (SELECT COALESCE(max(orden), 0) + 1 FROM inv.spec_atributos WHERE item_tipo_id = v_tipo_id))
+      )
+      ON CONFLICT (item_tipo_id, lower(nombre_attr)) DO NOTHING;
+    END
+    $sp$;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_proc WHERE proname = 'sp_crear_item_con_ficha_en_area_id' AND pronamespace = 'inv'::regnamespace
+  ) THEN
+    CREATE PROCEDURE inv.sp_crear_item_con_ficha_en_area_id(
+      p_codigo text, p_clase text, p_tipo text, p_area_id bigint, p_ficha jsonb
+    )
+    LANGUAGE plpgsql AS $sp$
+    DECLARE
+      v_tipo_id bigint;
+      v_item_id bigint;
+      v_attr record;
+      kv record;
+      v_dt text;
+    BEGIN
+      INSERT INTO inv.item_tipos(clase, nombre) VALUES (upper(p_clase), trim(p_tipo))
+      ON CONFLICT (clase, lower(nombre)) DO NOTHING;
+      SELECT item_tipo_id INTO v_tipo_id
+      FROM inv.item_tipos WHERE clase = upper(p_clase) AND lower(nombre) = lower(trim(p_tipo));
+
+      INSERT INTO inv.items(item_codigo, item_tipo_id, area_id, estado)
+      VALUES (trim(p_codigo), v_tipo_id, p_area_id, 'ALMACEN')
+      RETURNING item_id INTO v_item_id;
+
+      FOR kv IN SELECT key, value FROM jsonb_each(COALESCE(p_ficha, '{}'::jsonb))
+                WHERE jsonb_typeof(value) <> 'null'
+      LOOP
+        v_dt := CASE jsonb_typeof(kv.value)
+                  WHEN 'boolean' THEN 'bool'
+                  WHEN 'number'  THEN CASE WHEN kv.value::text ~ '^-?[0-9]+$' THEN 'int' ELSE 'numeric' END
+                  ELSE 'text'
+                END;
+        CALL inv.sp_definir_atributo(p_clase, p_tipo, kv.key, v_dt, NULL);
+        SELECT attr_id, data_type INTO v_attr
+        FROM inv.spec_atributos WHERE item_tipo_id = v_tipo_id AND lower(nombre_attr) = lower(trim(kv.key));
+
+        INSERT INTO inv.spec_valores(item_id, attr_id, val_text, val_int, val_numeric, val_bool, val_date)
+        VALUES (
+          v_item_id, v_attr.attr_id,
+          CASE WHEN v_attr.data_type = 'text'    THEN kv.value #>> '{}' END,
+          CASE WHEN v_attr.data_type = 'int'     THEN (kv.value #>> '{}')::bigint END,
+          CASE WHEN v_attr.data_type = 'numeric' THEN (kv.value #>> '{}')::numeric END,
+          CASE WHEN v_attr.data_type = 'bool'    THEN (kv.value #>> '{}')::boolean END,
+          CASE WHEN v_attr.data_type = 'date'    THEN (kv.value #>> '{}')::date END
+        )
+        ON CONFLICT (item_id, attr_id) DO NOTHING;
+      END LOOP;
+    END
+    $sp$;
+  END IF;
+
+  -- por nombre (como lo busca el backend): si producción ya tiene uno con
+  -- otros tipos no se crea una segunda sobrecarga que vuelva ambiguo el CALL
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_proc
+     WHERE proname = 'sp_asignar_item_a_equipo' AND pronamespace = 'inv'::regnamespace
+  ) THEN
+    -- mismos efectos que el fallback de equipo_model.create_equipo_con_items:
+    -- vínculo, estado EN_USO y movimiento ASIGNACION
+    CREATE PROCEDURE inv.sp_asignar_item_a_equipo(p_equipo_id bigint, p_item_id bigint, p_slot text)
+    LANGUAGE plpgsql AS $sp$
+    DECLARE
+      v_area_item   bigint;
+      v_area_equipo bigint;
+    BEGIN
+      IF EXISTS (SELECT 1 FROM inv.equipo_items WHERE item_id = p_item_id AND equipo_id <> p_equipo_id) THEN
+        RAISE EXCEPTION 'El ítem % ya está asignado a otro equipo', p_item_id;
+      END IF;
+      SELECT area_id INTO v_area_item FROM inv.items WHERE item_id = p_item_id;
+      SELECT equipo_area_id INTO v_area_equipo FROM inv.equipos WHERE equipo_id = p_equipo_id;
+
+      INSERT INTO inv.equipo_items(equipo_id, item_id, slot_o_ubicacion)
+      VALUES (p_equipo_id, p_item_id, p_slot)
+      ON CONFLICT (equipo_id, item_id) DO UPDATE SET slot_o_ubicacion = EXCLUDED.slot_o_ubicacion;
+
+      UPDATE inv.items SET estado = 'EN_USO' WHERE item_id = p_item_id;
+
+      INSERT INTO inv.movimientos(
+        mov_item_id, mov_tipo, mov_origen_area_id, mov_destino_area_id,
+        mov_equipo_id, mov_usuario_app, mov_detalle
+      ) VALUES (
+        p_item_id, 'ASIGNACION', v_area_item, v_area_equipo, p_equipo_id,
+        current_setting('app.user', true),
+        CASE WHEN p_slot IS NULL THEN NULL ELSE jsonb_build_object('slot', p_slot) END
+      );
+    END
+    $sp$;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_proc WHERE proname = 'sp_area_upsert_any' AND pronamespace = 'inv'::regnamespace
+  ) THEN
+    CREATE PROCEDURE inv.sp_area_upsert_any(p_area_id bigint, p_nombre text, p_padre_id bigint)
+    LANGUAGE plpgsql AS $sp$
+    BEGIN
+      IF p_area_id IS NULL THEN
+        IF NOT EXISTS (
+          SELECT 1 FROM inv.areas
+          WHERE area_padre_id IS NOT DISTINCT FROM p_padre_id AND lower(area_nombre) = lower(trim(p_nombre))
+        ) THEN
+          INSERT INTO inv.areas(area_nombre, area_padre_id) VALUES (trim(p_nombre), p_padre_id);
+        END IF;
+      ELSE
+        UPDATE inv.areas SET area_nombre = trim(p_nombre), area_padre_id = p_padre_id
+        WHERE area_id = p_area_id;
+        IF NOT FOUND THEN
+          RAISE EXCEPTION 'No existe el área %', p_area_id;
+        END IF;
+      END IF;
+    END
+    $sp$;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_proc WHERE proname = 'sp_item_agregar_foto' AND pronamespace = 'inv'::regnamespace
+  ) THEN
+    CREATE PROCEDURE inv.sp_item_agregar_foto(p_item_codigo text, p_path text, p_principal boolean, p_orden integer)
+    LANGUAGE plpgsql AS $sp$
+    DECLARE
+      v_item_id bigint;
+    BEGIN
+      SELECT item_id INTO v_item_id FROM inv.items WHERE item_codigo = p_item_codigo;
+      IF v_item_id IS NULL THEN
+        RAISE EXCEPTION 'No existe el ítem %', p_item_codigo;
+      END IF;
+      IF COALESCE(p_principal, false) THEN
+        UPDATE inv.item_media SET principal = false WHERE item_id = v_item_id AND principal;
+      END IF;
+      INSERT INTO inv.item_media(item_id, path, principal, orden)
+      VALUES (v_item_id, p_path, COALESCE(p_principal, false), p_orden);
+    END
+    $sp$;
+  END IF;
+END
+$do$;
+
+-- ============================================================
+-- Auditoría: INSERT/UPDATE/DELETE -> inv.audit_log
+-- Actor y procedimiento vienen de set_config('app.user' / 'app.proc') (app.db).
+-- ============================================================
+DO $do$
+BEGIN
+  IF to_regprocedure('inv.fn_audit()') IS NULL THEN
+    CREATE FUNCTION inv.fn_audit() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+      v_antes jsonb;
+      v_despues jsonb;
+    BEGIN
+      IF TG_OP <> 'INSERT' THEN
+        v_antes := to_jsonb(OLD) - 'usuario_password_bcrypt' - 'equipo_password';
+      END IF;
+      IF TG_OP <> 'DELETE' THEN
+        v_despues := to_jsonb(NEW) - 'usuario_password_bcrypt' - 'equipo_password';
+      END IF;
+      IF TG_OP = 'UPDATE' AND v_antes = v_despues THEN
+        RETURN NULL;
+      END IF;
+      INSERT INTO inv.audit_log(actor_user, accion, entidad, entidad_id, antes, despues, extra)
+      VALUES (
+        NULLIF(current_setting('app.user', true), ''),
+        TG_OP,
+        TG_TABLE_NAME,
+        COALESCE(v_despues, v_antes) ->> TG_ARGV[0],
+        v_antes,
+        v_despues,
+        jsonb_strip_nulls(jsonb_build_object('proc', NULLIF(current_setting('app.proc', true), '')))
+      );
+      RETURN NULL;
+    END
+    $fn$;
+  END IF;
+END
+$do$;
+
+-- En producción las tablas ya se auditan con triggers de otro nombre. Crear
+-- tg_audit_<tabla> además duplicaría cada fila de audit_log, así que se
+-- crea sólo si la tabla no tiene ningún trigger propio que escriba en
+-- audit_log ni ningún trigger FOR EACH ROW (tgtype & 1): si ya hay uno no
+-- se puede saber con seguridad que no audita, y se deja como está.
+DO $do$
+DECLARE
+  t record;
+BEGIN
+  FOR t IN
+    SELECT * FROM (VALUES
+      ('areas', 'area_id'), ('usuarios', 'usuario_id'), ('items', 'item_id'),
+      ('spec_valores', 'item_id'), ('equipos', 'equipo_id'), ('equipo_items', 'item_id'),
+      ('incidencias', 'inc_id')
+    ) AS v(tabla, pk)
+  LOOP
+    IF NOT EXISTS (
+      SELECT 1 FROM pg_trigger g
+      JOIN pg_proc f ON f.oid = g.tgfoid
+      WHERE g.tgrelid = format('inv.%I', t.tabla)::regclass AND NOT g.tgisinternal
+        AND (g.tgtype & 1 = 1 OR f.prosrc ILIKE '%audit_log%')
+    ) THEN
+      EXECUTE format(
+        'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON inv.%I '
+        'FOR EACH ROW EXECUTE FUNCTION inv.fn_audit(%L)',
+        'tg_audit_' || t.tabla, t.tabla, t.pk
+      );
+    END IF;
+  END LOOP;
+END
+$do$;
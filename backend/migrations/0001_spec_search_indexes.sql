@@ -0,0 +1,27 @@
+-- 0001_spec_search_indexes.sql
+-- Índices para la búsqueda por ficha (GET/POST /api/spec/search).
+-- Cada filtro es "sv.attr_id = X AND sv.val_<tipo> <op> valor": un rango dentro
+-- de (attr_id, valor) que devuelve item_id sin leer la tabla (index-only).
+-- Parciales: cada fila sólo tiene poblada la columna de su data_type.
+-- CONCURRENTLY: no bloquea escrituras; no puede ir dentro de una transacción.
+-- migrate:no-transaction
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spec_valores_attr_int
+    ON inv.spec_valores (attr_id, val_int, item_id) WHERE val_int IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spec_valores_attr_numeric
+    ON inv.spec_valores (attr_id, val_numeric, item_id) WHERE val_numeric IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spec_valores_attr_date
+    ON inv.spec_valores (attr_id, val_date, item_id) WHERE val_date IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spec_valores_attr_bool
+    ON inv.spec_valores (attr_id, val_bool, item_id) WHERE val_bool IS NOT NULL;
+
+-- texto: igualdad / IN sin distinguir mayúsculas (lower(val_text) = ...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_spec_valores_attr_text_lower
+    ON inv.spec_valores (attr_id, lower(val_text), item_id) WHERE val_text IS NOT NULL;
+
+-- alcance de la búsqueda: tipo + área (+ estado)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_tipo_area_estado
+    ON inv.items (item_tipo_id, area_id, estado);
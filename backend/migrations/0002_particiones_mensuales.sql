@@ -0,0 +1,220 @@
+-- 0002_particiones_mensuales.sql
+-- inv.movimientos (mov_fecha) e inv.audit_log (created_at) pasan a tablas
+-- particionadas por RANGE mensual: inv.<tabla>_pAAAAMM + inv.<tabla>_pdefault.
+--
+-- Las consultas por rango de fechas (sin cast sobre la columna) sólo leen las
+-- particiones del rango, y la retención (app/jobs/particiones_job.py) archiva y
+-- elimina meses completos con DETACH + DROP en vez de DELETE masivos.
+--
+-- La conversión corre en una sola transacción con ACCESS EXCLUSIVE sobre cada
+-- tabla (copia todas las filas): programar en una ventana de mantenimiento.
+-- Es idempotente: si la tabla ya está particionada no hace nada.
+
+-- ------------------------------------------------------------
+-- Crea las particiones mensuales que falten entre dos fechas.
+-- Los límites son fechas en la zona horaria del servidor.
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION inv.fn_crear_particiones_mes(p_tabla text, p_desde date, p_hasta date)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  m date := date_trunc('month', p_desde)::date;
+  nombre text;
+  n integer := 0;
+BEGIN
+  WHILE m <= p_hasta LOOP
+    nombre := format('%s_p%s', p_tabla, to_char(m, 'YYYYMM'));
+    IF to_regclass(format('inv.%I', nombre)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE inv.%I PARTITION OF inv.%I FOR VALUES FROM (%L) TO (%L)',
+        nombre, p_tabla, m::text, (m + interval '1 month')::date::text
+      );
+      n := n + 1;
+    END IF;
+    m := (m + interval '1 month')::date;
+  END LOOP;
+
+  IF to_regclass(format('inv.%I', p_tabla || '_pdefault')) IS NULL THEN
+    -- red de seguridad: una fila fuera de rango nunca hace fallar el INSERT
+    EXECUTE format('CREATE TABLE inv.%I PARTITION OF inv.%I DEFAULT', p_tabla || '_pdefault', p_tabla);
+  END IF;
+  RETURN n;
+END
+$$;
+
+-- ------------------------------------------------------------
+-- Convierte inv.<p_tabla> en particionada por mes sobre p_columna.
+-- Conserva: datos, defaults/secuencias (serial o identity), NOT NULL/CHECK,
+-- FKs salientes, índices, triggers, permisos y vistas dependientes.
+-- La PK pasa a incluir la columna de partición (requisito de Postgres);
+-- índices UNIQUE que no la incluyan se omiten con un NOTICE.
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION inv.fn_particionar_por_mes(p_tabla text, p_columna text, p_meses_adelante integer DEFAULT 3)
+RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+  rel regclass := to_regclass(format('inv.%I', p_tabla));
+  legacy text := left(p_tabla, 55) || '_legacy';
+  legacy_rel regclass;
+  part_attnum smallint;
+  r record;
+  v_nombres text[] := '{}';
+  v_defs text[] := '{}';
+  v_grants text[] := '{}';
+  ix_defs text[] := '{}';
+  tg_defs text[] := '{}';
+  fk_defs text[] := '{}';
+  grants text[] := '{}';
+  pk_cols text;
+  cols text;
+  desde date;
+  seq text;
+  s text;
+  i integer;
+BEGIN
+  IF rel IS NULL THEN
+    RAISE EXCEPTION 'No existe inv.%', p_tabla;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = rel) THEN
+    RETURN format('inv.%s ya está particionada', p_tabla);
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_constraint WHERE confrelid = rel AND contype = 'f') THEN
+    RAISE EXCEPTION 'inv.% es referenciada por claves foráneas; particionar a mano', p_tabla;
+  END IF;
+
+  SELECT attnum INTO part_attnum
+  FROM pg_attribute WHERE attrelid = rel AND attname = p_columna AND NOT attisdropped;
+  IF part_attnum IS NULL THEN
+    RAISE EXCEPTION 'inv.% no tiene la columna %', p_tabla, p_columna;
+  END IF;
+
+  EXECUTE format('LOCK TABLE inv.%I IN ACCESS EXCLUSIVE MODE', p_tabla);
+
+  -- 1) capturar definiciones ANTES de renombrar (referencian inv.<p_tabla>)
+  FOR r IN
+    SELECT DISTINCT v.oid, n.nspname, v.relname, v.relkind
+    FROM pg_depend d
+    JOIN pg_rewrite w ON w.oid = d.objid
+    JOIN pg_class v ON v.oid = w.ev_class
+    JOIN pg_namespace n ON n.oid = v.relnamespace
+    WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = rel AND v.oid <> rel
+  LOOP
+    IF r.relkind <> 'v' THEN
+      RAISE EXCEPTION 'La vista materializada %.% depende de inv.%', r.nspname, r.relname, p_tabla;
+    END IF;
+    v_nombres := v_nombres || format('%I.%I', r.nspname, r.relname);
+    v_defs := v_defs || pg_get_viewdef(r.oid);
+    SELECT COALESCE(array_agg(format('GRANT %s ON %I.%I TO %s', g.privilege_type, r.nspname, r.relname,
+                                     CASE WHEN g.grantee = 'PUBLIC' THEN 'PUBLIC' ELSE quote_ident(g.grantee) END)), '{}')
+      INTO grants
+    FROM information_schema.role_table_grants g
+    WHERE g.table_schema = r.nspname AND g.table_name = r.relname
+      AND g.grantee <> pg_get_userbyid((SELECT relowner FROM pg_class WHERE oid = r.oid));
+    v_grants := v_grants || grants;
+  END LOOP;
+
+  SELECT COALESCE(array_agg(format('GRANT %s ON inv.%I TO %s', g.privilege_type, p_tabla,
+                                   CASE WHEN g.grantee = 'PUBLIC' THEN 'PUBLIC' ELSE quote_ident(g.grantee) END)), '{}')
+    INTO grants
+  FROM information_schema.role_table_grants g
+  WHERE g.table_schema = 'inv' AND g.table_name = p_tabla
+    AND g.grantee <> pg_get_userbyid((SELECT relowner FROM pg_class WHERE oid = rel));
+
+  FOR r IN
+    SELECT x.indexrelid, x.indisunique, (part_attnum = ANY(x.indkey::smallint[])) AS con_part
+    FROM pg_index x
+    WHERE x.indrelid = rel AND NOT x.indisprimary
+  LOOP
+    IF r.indisunique AND NOT r.con_part THEN
+      RAISE NOTICE 'Índice único % omitido: no incluye %', r.indexrelid::regclass, p_columna;
+    ELSE
+      ix_defs := ix_defs || pg_get_indexdef(r.indexrelid);
+    END IF;
+  END LOOP;
+
+  SELECT COALESCE(array_agg(pg_get_triggerdef(t.oid)), '{}') INTO tg_defs
+  FROM pg_trigger t WHERE t.tgrelid = rel AND NOT t.tgisinternal;
+
+  SELECT COALESCE(array_agg(format('ALTER TABLE inv.%I ADD CONSTRAINT %I %s', p_tabla, c.conname, pg_get_constraintdef(c.oid))), '{}')
+    INTO fk_defs
+  FROM pg_constraint c WHERE c.conrelid = rel AND c.contype = 'f';
+
+  SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY k.ord) INTO pk_cols
+  FROM pg_index x
+  CROSS JOIN LATERAL unnest(x.indkey::smallint[]) WITH ORDINALITY AS k(attnum, ord)
+  JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+  WHERE x.indrelid = rel AND x.indisprimary AND k.attnum <> part_attnum;
+
+  SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO cols
+  FROM pg_attribute WHERE attrelid = rel AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+  -- 2) apartar la tabla vieja (vistas, nombres de índices)
+  FOR i IN 1 .. COALESCE(array_length(v_nombres, 1), 0) LOOP
+    EXECUTE format('DROP VIEW %s', v_nombres[i]);
+  END LOOP;
+
+  FOR r IN SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid WHERE x.indrelid = rel LOOP
+    EXECUTE format('ALTER INDEX inv.%I RENAME TO %I', r.relname, left(r.relname, 59) || '_old');
+  END LOOP;
+
+  EXECUTE format('ALTER TABLE inv.%I RENAME TO %I', p_tabla, legacy);
+  legacy_rel := rel;
+
+  -- 3) tabla particionada con la misma forma
+  EXECUTE format(
+    'CREATE TABLE inv.%I (LIKE inv.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED '
+    'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE (%I)',
+    p_tabla, legacy, p_columna
+  );
+
+  -- secuencias: serial -> se traspasa; identity -> secuencia nueva en el valor actual
+  FOR r IN
+    SELECT a.attname, a.attidentity
+    FROM pg_attribute a
+    WHERE a.attrelid = legacy_rel AND a.attnum > 0 AND NOT a.attisdropped
+  LOOP
+    seq := pg_get_serial_sequence(format('inv.%I', legacy), r.attname);
+    CONTINUE WHEN seq IS NULL;
+    IF r.attidentity <> '' THEN
+      s := format('inv.%I', left(p_tabla || '_' || r.attname, 57) || '_pseq');
+      EXECUTE format('CREATE SEQUENCE %s', s);
+      EXECUTE format('SELECT setval(%L, COALESCE((SELECT max(%I) FROM inv.%I), 0) + 1, false)', s, r.attname, legacy);
+      EXECUTE format('ALTER TABLE inv.%I ALTER COLUMN %I SET DEFAULT nextval(%L::regclass)', p_tabla, r.attname, s);
+      EXECUTE format('ALTER SEQUENCE %s OWNED BY inv.%I.%I', s, p_tabla, r.attname);
+    ELSE
+      EXECUTE format('ALTER SEQUENCE %s OWNED BY inv.%I.%I', seq, p_tabla, r.attname);
+    END IF;
+  END LOOP;
+
+  IF pk_cols IS NOT NULL THEN
+    EXECUTE format('ALTER TABLE inv.%I ADD PRIMARY KEY (%s, %I)', p_tabla, pk_cols, p_columna);
+  END IF;
+
+  EXECUTE format('SELECT date_trunc(''month'', min(%I))::date FROM inv.%I', p_columna, legacy) INTO desde;
+  PERFORM inv.fn_crear_particiones_mes(
+    p_tabla,
+    COALESCE(desde, current_date),
+    (current_date + make_interval(months => GREATEST(p_meses_adelante, 0)))::date
+  );
+
+  -- 4) datos y objetos asociados
+  EXECUTE format('INSERT INTO inv.%I (%s) SELECT %s FROM inv.%I', p_tabla, cols, cols, legacy);
+
+  FOREACH s IN ARRAY ix_defs LOOP EXECUTE s; END LOOP;
+  FOREACH s IN ARRAY fk_defs LOOP EXECUTE s; END LOOP;
+  FOREACH s IN ARRAY tg_defs LOOP EXECUTE s; END LOOP;
+  FOREACH s IN ARRAY grants LOOP EXECUTE s; END LOOP;
+
+  EXECUTE format('DROP TABLE inv.%I', legacy);
+
+  FOR i IN 1 .. COALESCE(array_length(v_nombres, 1), 0) LOOP
+    EXECUTE format('CREATE VIEW %s AS %s', v_nombres[i], v_defs[i]);
+  END LOOP;
+  FOREACH s IN ARRAY v_grants LOOP EXECUTE s; END LOOP;
+
+  RETURN format('inv.%s particionada por %s', p_tabla, p_columna);
+END
+$$;
+
+SELECT inv.fn_particionar_por_mes('movimientos', 'mov_fecha', 3);
+SELECT inv.fn_particionar_por_mes('audit_log', 'created_at', 3);
@@ -0,0 +1,49 @@
+-- 0003_indices_fechas.sql
+-- Índices para los filtros desde/hasta (app/core/date_range.py: col >= d AND col < h+1)
+-- y el orden "más reciente primero" de cada listado.
+-- migrate:no-transaction
+--
+-- inv.movimientos / inv.audit_log son particionadas (0002) y Postgres no admite
+-- CONCURRENTLY sobre la tabla padre; un CREATE INDEX común sobre el padre
+-- bloquearía las escrituras de todas las particiones mientras dure. Por eso:
+--   1) CREATE INDEX ... ON ONLY padre: sólo el catálogo, queda INVALID;
+--   2) CREATE INDEX CONCURRENTLY en cada partición (generado con
+--      `-- migrate:gexec`, ver app/core/migrations.py);
+--   3) ALTER INDEX padre ATTACH PARTITION: al adjuntar la última el índice
+--      del padre pasa a válido.
+-- Las particiones que se creen después (fn_crear_particiones_mes) lo heredan.
+-- Todo es idempotente: si algo falla, la próxima corrida retoma.
+
+CREATE INDEX IF NOT EXISTS ix_movimientos_fecha
+    ON ONLY inv.movimientos (mov_fecha DESC, mov_id DESC);
+
+-- migrate:gexec
+SELECT format('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON inv.%I (mov_fecha DESC, mov_id DESC)',
+              left(c.relname, 50) || '_fecha', c.relname),
+       format('ALTER INDEX inv.ix_movimientos_fecha ATTACH PARTITION inv.%I',
+              left(c.relname, 50) || '_fecha')
+  FROM pg_inherits h
+  JOIN pg_class c ON c.oid = h.inhrelid
+ WHERE h.inhparent = 'inv.movimientos'::regclass
+ ORDER BY c.relname;
+
+CREATE INDEX IF NOT EXISTS ix_audit_log_created_at
+    ON ONLY inv.audit_log (created_at DESC, audit_id DESC);
+
+-- migrate:gexec
+SELECT format('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON inv.%I (created_at DESC, audit_id DESC)',
+              left(c.relname, 50) || '_created_at', c.relname),
+       format('ALTER INDEX inv.ix_audit_log_created_at ATTACH PARTITION inv.%I',
+              left(c.relname, 50) || '_created_at')
+  FROM pg_inherits h
+  JOIN pg_class c ON c.oid = h.inhrelid
+ WHERE h.inhparent = 'inv.audit_log'::regclass
+ ORDER BY c.relname;
+
+-- GET /api/areas/<id>/equipos?desde&hasta (ORDER BY created_at DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_equipos_area_created
+    ON inv.equipos (equipo_area_id, created_at DESC);
+
+-- GET /api/areas/<id>/items?desde&hasta
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_area_creado
+    ON inv.items (area_id, creado_en);
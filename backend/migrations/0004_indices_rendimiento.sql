@@ -0,0 +1,45 @@
+-- 0004_indices_rendimiento.sql
+-- Índices que piden las consultas actuales y que el esquema base no tiene.
+-- migrate:no-transaction
+--
+-- CONCURRENTLY: no bloquea escrituras mientras se construye. Si falla, el
+-- runner (app/core/migrations.py) borra el índice INVALID y lo reintenta en
+-- la próxima corrida. inv.movimientos es particionada (0002) y no admite
+-- CONCURRENTLY sobre la tabla padre: mismo esquema que 0003 (ON ONLY en el
+-- padre, CONCURRENTLY en cada partición, ATTACH PARTITION).
+
+-- Último TRASLADO de un ítem (préstamo activo: equipo_model._queue_active_loan
+-- y expand=prestamo): WHERE mov_item_id = X AND mov_tipo = 'TRASLADO'
+-- ORDER BY mov_id DESC LIMIT 1 -> una sola entrada del índice por partición.
+CREATE INDEX IF NOT EXISTS ix_movimientos_item_tipo
+    ON ONLY inv.movimientos (mov_item_id, mov_tipo, mov_id DESC);
+
+-- migrate:gexec
+SELECT format('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON inv.%I (mov_item_id, mov_tipo, mov_id DESC)',
+              left(c.relname, 50) || '_item_tipo', c.relname),
+       format('ALTER INDEX inv.ix_movimientos_item_tipo ATTACH PARTITION inv.%I',
+              left(c.relname, 50) || '_item_tipo')
+  FROM pg_inherits h
+  JOIN pg_class c ON c.oid = h.inhrelid
+ WHERE h.inhparent = 'inv.movimientos'::regclass
+ ORDER BY c.relname;
+
+-- EXISTS/LEFT JOIN por item_id y DELETE ... WHERE item_id (la PK empieza por equipo_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_equipo_items_item
+    ON inv.equipo_items (item_id);
+
+-- Hilo de una incidencia: WHERE inc_id = X ORDER BY created_at
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_incidencia_mensajes_inc
+    ON inv.incidencia_mensajes (inc_id, created_at);
+
+-- Ítems de un área por estado (conteos del área, disponibles en ALMACEN)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_area_estado
+    ON inv.items (area_id, estado);
+
+-- Cola del mailer (notifs_job): sólo las pendientes
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notificaciones_pendientes
+    ON inv.notificaciones (notif_id) WHERE sent_at IS NULL;
+
+-- FK de incidencias -> equipos (ON DELETE SET NULL) y filtro por equipo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_incidencias_equipo
+    ON inv.incidencias (equipo_id);
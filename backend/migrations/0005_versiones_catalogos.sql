@@ -0,0 +1,43 @@
+-- 0005_versiones_catalogos.sql
+-- Sello de versión de los catálogos (ETag de /api/areas y /api/item-types).
+--
+-- count(*) + max(xmin) no es monótono: borrar una fila y crear otra deja el
+-- mismo count, y max(xmin) baja si se borra la última fila escrita (o da la
+-- vuelta con el wraparound). Un contador por tabla que suben triggers de
+-- sentencia sólo crece: cada escritura confirmada da un sello nuevo.
+-- Los triggers son FOR EACH STATEMENT: una carga masiva suma 1, no N.
+
+CREATE TABLE IF NOT EXISTS inv.catalogo_versiones (
+  tabla    text PRIMARY KEY,
+  version  bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO inv.catalogo_versiones(tabla) VALUES ('areas'), ('item_tipos')
+ON CONFLICT (tabla) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION inv.fn_catalogo_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE inv.catalogo_versiones SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+  RETURN NULL;
+END
+$$;
+
+DO $do$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['areas', 'item_tipos'] LOOP
+    IF NOT EXISTS (
+      SELECT 1 FROM pg_trigger
+      WHERE tgrelid = format('inv.%I', t)::regclass AND tgname = 'tg_version_' || t
+    ) THEN
+      EXECUTE format(
+        'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON inv.%I '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inv.fn_catalogo_version()',
+        'tg_version_' || t, t
+      );
+    END IF;
+  END LOOP;
+END
+$do$;
@@ -0,0 +1,34 @@
+-- 0006_traslados_retenidos.sql
+-- Préstamos abiertos a salvo de la retención de particiones.
+--
+-- El préstamo activo de un ítem es su último TRASLADO con es_prestamo
+-- (equipo_model). Si ese TRASLADO cae en un mes que la retención
+-- (app/jobs/particiones_job.py) separa y elimina, el préstamo desaparecería.
+-- Antes del DETACH/DROP el job copia aquí esos movimientos; esta tabla no se
+-- particiona ni se purga salvo cuando un TRASLADO más nuevo del mismo ítem la
+-- deja obsoleta.
+--
+-- inv.vw_traslados es lo que leen las consultas de préstamos: los TRASLADO de
+-- inv.movimientos más los retenidos.
+
+CREATE TABLE IF NOT EXISTS inv.traslados_retenidos (
+  mov_id               bigint PRIMARY KEY,
+  mov_item_id          bigint NOT NULL,
+  mov_fecha            timestamptz NOT NULL,
+  mov_origen_area_id   bigint,
+  mov_destino_area_id  bigint,
+  mov_equipo_id        bigint,
+  mov_detalle          jsonb,
+  retenido_en          timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_traslados_retenidos_item
+    ON inv.traslados_retenidos (mov_item_id, mov_id DESC);
+
+CREATE OR REPLACE VIEW inv.vw_traslados AS
+  SELECT mov_id, mov_item_id, mov_fecha, mov_origen_area_id, mov_destino_area_id, mov_equipo_id, mov_detalle
+    FROM inv.movimientos
+   WHERE mov_tipo = 'TRASLADO'
+  UNION ALL
+  SELECT mov_id, mov_item_id, mov_fecha, mov_origen_area_id, mov_destino_area_id, mov_equipo_id, mov_detalle
+    FROM inv.traslados_retenidos;